@@ -4,18 +4,39 @@ app
 The module to make the app.
 """
 
+from typing import Optional
+
 from flask import Flask
 from swautomatic.object import SWAObject
+from swautomatic.watcher import SWAWatcher
 
 
+# The only instance of `SWAObject` in the app, it is shared by views and
+# forms. It does not connect to the database until it is used.
 swa_object = SWAObject()
 
 class Config(object):
     SECRET_KEY = swa_object.settings.secret_key or 'you-will-never-guess'
 
 
+# Keeps `is_installed` and `time_local` of records current, so views do not
+# walk the directories of assets. It is started by `start_watcher()`, not on
+# import.
+watcher: Optional[SWAWatcher] = None
+
+
+def start_watcher() -> Optional[SWAWatcher]:
+    """Starts the watcher if the setting `watch_files` is `True`. Call it
+    once in the process serving the app (see `run.py`)."""
+
+    global watcher  # pylint: disable=global-statement
+    if watcher is None and swa_object.settings.watch_files:
+        watcher = SWAWatcher().start()
+    return watcher
+
+
 config = Config()
 app = Flask(__name__)
 app.config.from_object(config)
 
-from . import views
+from . import views, api
@@ -0,0 +1,245 @@
+"""
+app > `api`
+===========
+JSON API of the library for scripts and automation.
+
+-   `GET /api/assets`: a page of assets. Parameters of the filter are the
+    same as of `/library` (`all`, `any`, `not`, `need_upd`, `installed`),
+    `fields` selects fields (comma separated), `limit` is the size of the
+    page and `after` is the Steam ID of the last asset of the previous page
+    (the field `next` of the response).
+-   `GET /api/assets/<steam_id>`: one asset.
+-   `GET /api/assets/export`: every asset matching the filter as NDJSON (a
+    JSON object per line), streamed from the storage.
+-   `GET /api/tags`: tags, with counts of assets by tag if `counts=1`.
+-   `GET /api/statistics`: statistics of the library.
+-   `POST /api/operations/<name>`: runs an operation of the library toolbar
+    (see `OPERATIONS`) and returns its result.
+-   `POST /api/assets/batch`: runs an action (`download`, `update`,
+    `refresh` or `delete`) for a list of Steam IDs, the body is
+    `{"action": ..., "steamids": [...]}`.
+-   `GET /api/progress`: Server-Sent Events of progress of running
+    operations (see ~swautomatic.progress.`SWAProgress`), an event is a
+    JSON object with `done`, `total`, `bytes`, `rate` and `eta`.
+"""
+
+import json
+import queue
+import re
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from flask import Response, request
+
+from app.filter import LibraryFilter
+from swautomatic import metrics
+from swautomatic.asset import BATCH_ACTIONS
+from swautomatic.progress import progress
+
+from . import app, swa_object
+
+MAX_LIMIT = 500
+'The largest page of `/api/assets`.'
+EXPORT_BATCH = 1000
+'The number of records read from the storage at a time by the export.'
+HEARTBEAT = 15.0
+'Seconds between comments keeping an idle event stream open.'
+RETRY = 3000
+'Milliseconds browsers wait before reconnecting to the event stream.'
+OPERATIONS = {
+    'check_updates': lambda: swa_object.assets.check_updates(),
+    'audit': lambda: swa_object.assets.audit(),
+    'dedupe': lambda: swa_object.assets.dedupe(),
+    'update_tags': lambda: swa_object.tags.update_tags(),
+    'update_database': lambda: swa_object.update_database(),
+}
+_FIELD = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+class APIError(Exception):
+    """An error returned to the client with the HTTP status."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, set):
+        return sorted(value)
+    if is_dataclass(value):
+        return asdict(value)
+    if hasattr(value, '__dict__'):
+        return vars(value)
+    return str(value)
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, default=_default, ensure_ascii=False)
+
+
+def _json(data: Any, status: int = 200) -> Response:
+    return Response(_dumps(data), status=status, mimetype='application/json')
+
+
+def _record(record: dict) -> dict:
+    # MongoDB returns its own `_id` unless fields are selected.
+    record.pop('_id', None)
+    return record
+
+
+def _fields() -> Optional[list[str]]:
+    """Returns fields selected by the parameter `fields`."""
+
+    value = request.args.get('fields', default='', type=str)
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    for field in fields:
+        if not _FIELD.fullmatch(field):
+            raise APIError(f'Invalid field: {field}')
+    return list(dict.fromkeys(['steamid', *fields]))
+
+
+def _filter() -> LibraryFilter:
+    return LibraryFilter.from_args(request.args)
+
+
+@app.errorhandler(APIError)
+def api_error(error: APIError):
+    return _json({'error': error.message}, status=error.status)
+
+
+@app.route('/api/assets')
+@metrics.timed('api_assets')
+def api_assets():
+    fltr = _filter()
+    fields = _fields()
+    limit = request.args.get('limit', default=swa_object.settings.per_page
+                             or 20, type=int)
+    limit = min(max(limit, 1), MAX_LIMIT)
+    after = request.args.get('after', default=None, type=int)
+
+    storage_fltr = fltr.to_dict()
+    if after is not None:
+        storage_fltr['steamid'] = dict(storage_fltr.get('steamid', {}),
+                                       **{'$gt': after})
+    try:
+        # One more record tells if there is the next page.
+        records = [_record(record) for record in
+                   swa_object.storage.find_assets(storage_fltr,
+                                                  limit=limit + 1,
+                                                  fields=fields,
+                                                  sort='steamid')]
+    except ValueError as error:
+        raise APIError(str(error)) from error
+    next_after = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_after = records[-1]['steamid']
+    return _json({
+        'count': swa_object.assets.count_assets(**fltr.kwargs()),
+        'assets': records,
+        'next': next_after,
+    })
+
+
+@app.route('/api/assets/<int:steam_id>')
+def api_asset(steam_id):
+    fields = _fields()
+    records = list(swa_object.storage.find_assets({'steamid': steam_id},
+                                                  limit=1, fields=fields))
+    if not records:
+        raise APIError(f'Asset {steam_id} is not found', status=404)
+    return _json(_record(records[0]))
+
+
+@app.route('/api/assets/export')
+def api_export():
+    # The request is read before streaming, the generator runs after the
+    # view returns.
+    storage_fltr = _filter().to_dict()
+    fields = _fields()
+
+    def lines():
+        with metrics.time('api_export'):
+            for record in swa_object.storage.iter_assets(
+                    storage_fltr, fields=fields, batch_size=EXPORT_BATCH):
+                metrics.inc('api_exported')
+                yield _dumps(_record(record)) + '\n'
+
+    return Response(lines(), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename=library.ndjson'})
+
+
+@app.route('/api/assets/batch', methods=['POST'])
+def api_batch():
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    steamids = data.get('steamids')
+    if action not in BATCH_ACTIONS:
+        raise APIError(f'Unknown action: {action}')
+    if not isinstance(steamids, list) or not steamids:
+        raise APIError('`steamids` must be a non-empty list')
+    try:
+        steamids = [int(steamid) for steamid in steamids]
+    except (TypeError, ValueError) as error:
+        raise APIError('`steamids` must be Steam IDs') from error
+    result = swa_object.assets.batch(action, steamids)
+    return _json(result, status=200 if getattr(result, 'status_bool', True)
+                 else 500)
+
+
+@app.route('/api/tags')
+def api_tags():
+    data: dict[str, Any] = {'tags': sorted(swa_object.tags.list_tags())}
+    if request.args.get('counts', default=0, type=int):
+        data['counts'] = swa_object.assets.count_by_tag(
+            **_filter().kwargs())
+    return _json(data)
+
+
+@app.route('/api/statistics')
+def api_statistics():
+    return _json(swa_object.get_statistics())
+
+
+@app.route('/api/operations/<name>', methods=['POST'])
+def api_operation(name):
+    operation = OPERATIONS.get(name)
+    if operation is None:
+        raise APIError(f'Unknown operation: {name}', status=404)
+    result = operation()
+    return _json(result, status=200 if getattr(result, 'status_bool', True)
+                 else 500)
+
+
+def _event(event: dict) -> str:
+    return f'event: progress\ndata: {_dumps(event)}\n\n'
+
+
+@app.route('/api/progress')
+def api_progress():
+    def stream():
+        events = progress.subscribe()
+        try:
+            yield f'retry: {RETRY}\n\n'
+            # A new client gets the state of running tasks first.
+            for event in progress.active():
+                yield _event(event)
+            while True:
+                try:
+                    event = events.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield _event(event)
+        finally:
+            progress.unsubscribe(events)
+
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -2,57 +2,127 @@
 The module for the Library Filter.
 """
 
-from typing import Any
+import json
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
 
 
+def _names(values: Optional[Iterable[str]]) -> tuple[str, ...]:
+    if isinstance(values, str):
+        values = [values]
+    return tuple(sorted({str(value) for value in values or () if value}))
+
+
+@dataclass(frozen=True)
 class LibraryFilter:
-    """Constant filter for the library."""
-    fltr = {}
-    steam_ids = None
-    tag = None
-    need_update = None
-    is_installed = None
-    other_fltr = None
+    """
+    An immutable filter of the library, built for every request. Tags are
+    kept sorted without duplicates and the single `tag` is one of `tags`,
+    so equal filters are equal objects with the same hash and `key`.
+    """
+    steam_ids: Optional[tuple[int, ...]] = None
+    tags: tuple[str, ...] = ()
+    any_tags: tuple[str, ...] = ()
+    exclude_tags: tuple[str, ...] = ()
+    need_update: Optional[bool] = None
+    is_installed: Optional[bool] = None
+    tag: Optional[str] = field(default=None, compare=False, repr=False)
 
-    def __init__(self, **kwargs: Any) -> None:
-        steam_ids = kwargs.get('steam_ids')
-        tag = kwargs.get('tag')
-        need_update = kwargs.get('need_update')
-        is_installed = kwargs.get('is_installed')
-        other_fltr = kwargs.get('other_fltr')
-
-        if isinstance(steam_ids, (list, set)):
-            type(self).steam_ids = steam_ids
-            self.fltr.update({'steamid': {'$in': steam_ids}})
-        if isinstance(tag, str):
-            type(self).tag = tag
-            self.fltr.update({'tags': tag})
-        if isinstance(need_update, bool):
-            type(self).need_update = need_update
-            self.fltr.update({'need_update': need_update})
-        if isinstance(is_installed, bool):
-            type(self).is_installed = is_installed
-            self.fltr.update({'is_installed': is_installed})
-        if isinstance(other_fltr, dict):
-            type(self).other_fltr = other_fltr
-            self.fltr.update(other_fltr)
-
-    def to_dict(self):
-        """Returns a dictionary instance of the filter."""
-        return self.fltr
+    def __post_init__(self) -> None:
+        # The dataclass is frozen, fields are normalized once here.
+        if self.steam_ids is not None:
+            object.__setattr__(self, 'steam_ids', tuple(
+                sorted({int(steam_id) for steam_id in self.steam_ids})))
+        tags = list(self.tags or ())
+        if self.tag:
+            tags.append(self.tag)
+        object.__setattr__(self, 'tag', None)
+        object.__setattr__(self, 'tags', _names(tags))
+        object.__setattr__(self, 'any_tags', _names(self.any_tags))
+        object.__setattr__(self, 'exclude_tags', _names(self.exclude_tags))
+        for name in ('need_update', 'is_installed'):
+            value = getattr(self, name)
+            if not isinstance(value, bool):
+                object.__setattr__(self, name, None)
+        # `need_update=False` is not a filter in the library.
+        if not self.need_update:
+            object.__setattr__(self, 'need_update', None)
+
+    @property
+    def key(self) -> str:
+        """The canonical string of the filter, a key of cached results."""
+        return json.dumps(self.kwargs(), sort_keys=True,
+                          separators=(',', ':'))
+
+    @property
+    def applied(self) -> bool:
+        """`True` if the filter selects not every asset."""
+        return any(self.kwargs().values())
+
+    def kwargs(self) -> dict[str, Any]:
+        """Returns keyword arguments of ~asset.ISWAAssets.`get_assets()`
+        and `count_assets()`."""
+
+        return {
+            'steam_ids': list(self.steam_ids) if self.steam_ids is not None
+            else None,
+            'tags': list(self.tags) or None,
+            'any_tags': list(self.any_tags) or None,
+            'exclude_tags': list(self.exclude_tags) or None,
+            'need_update': self.need_update,
+            'is_installed': self.is_installed,
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns a dictionary instance of the filter (a storage filter)."""
+
+        fltr: dict[str, Any] = {}
+        if self.steam_ids is not None:
+            fltr['steamid'] = {'$in': list(self.steam_ids)}
+        operators = {'$all': self.tags, '$in': self.any_tags,
+                     '$nin': self.exclude_tags}
+        if list(operators.values()) == [self.tags, (), ()] and \
+                len(self.tags) == 1:
+            fltr['tags'] = self.tags[0]
+        elif any(operators.values()):
+            fltr['tags'] = {key: list(value) for key, value
+                            in operators.items() if value}
+        if self.need_update is not None:
+            fltr['need_update'] = self.need_update
+        if self.is_installed is not None:
+            fltr['is_installed'] = self.is_installed
+        return fltr
+
+    def to_args(self) -> dict[str, Any]:
+        """Returns query parameters of `/library` selecting the filter, see
+        `from_args()`."""
+
+        args: dict[str, Any] = {}
+        for name, values in (('all', self.tags), ('any', self.any_tags),
+                             ('not', self.exclude_tags)):
+            if values:
+                args[name] = list(values)
+        if self.need_update:
+            args['need_upd'] = 1
+        if self.is_installed is not None:
+            args['installed'] = 1 if self.is_installed else 2
+        return args
 
     @classmethod
-    def reset(cls):
-        """Cleans the filter."""
-        cls.fltr.clear()
-        cls.steam_ids = None
-        cls.tag = None
-        cls.need_update = None
-        cls.is_installed = None
-        cls.other_fltr = None
-
-    def __eq__(self, __value: object) -> bool:
-        return self.fltr == getattr(__value, 'fltr')
+    def from_args(cls, args, tag: Optional[str] = None,
+                  installed: int = 0, need_update: int = 0) -> 'LibraryFilter':
+        """Builds the filter from query parameters `args` (a `MultiDict`);
+        `tag`, `installed` and `need_update` come from forms and override
+        the parameters."""
+
+        installed = installed or args.get('installed', default=0, type=int)
+        need_update = need_update or args.get('need_upd', default=0, type=int)
+        return cls(tags=tuple(args.getlist('all')),
+                   any_tags=tuple(args.getlist('any')),
+                   exclude_tags=tuple(args.getlist('not')),
+                   need_update=True if need_update == 1 else None,
+                   is_installed=None if not installed else installed == 1,
+                   tag=tag or args.get('tag') or None)
 
 
 class FilterMonitor:
@@ -16,7 +16,6 @@ __all__ = ['TagsForm',
            'PerPageForm',
            ]
 
-tags = sorted(list(swa_object.tags.list_tags()))
 timeout_choices = [5.0, 10.0, 15.0, 20.0, 25.0, 30.0, 50.0]
 longtimeout_choices = [20.0, 25.0, 30.0, 50.0, 100.0, 150.0, 200.0]
 per_page_choices = [10, 20, 30, 50, 100]
@@ -27,65 +26,73 @@ class TagsForm(FlaskForm):
     app > forms > `TagsForm`
     ------------------------
     Description.
+
+    The choices are given by the view (`tags` parameter), so the tags are
+    not queried when the module is imported.
     """
-    tag_choices = RadioField(choices=tags, coerce=str)
+    tag_choices = RadioField(choices=[], coerce=str)
     tag_submit = SubmitField()
 
+    def __init__(self, *args, tags: list[str] | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tag_choices.choices = tags or []
+
 
 class SettingsForm(FlaskForm):
     """
     app > forms > `SettingsForm`
     ----------------------------
-    The form for settings of the app.
+    The form for settings of the app. Defaults are callables, they read the
+    settings when the form is created.
     """
     common_path       = FileField(label='Common path',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.common_path)
+                                  default=lambda: swa_object.settings.common_path)
     authmechanism     = StringField(label='Authmechanism',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.authmechanism)
+                                  default=lambda: swa_object.settings.authmechanism)
     authsource        = StringField(label='Authsource',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.authsource)
+                                  default=lambda: swa_object.settings.authsource)
     appid             = IntegerField(label='App ID',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.appid)
+                                  default=lambda: swa_object.settings.appid)
     database_name     = StringField(label='Database name',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.database_name)
+                                  default=lambda: swa_object.settings.database_name)
     app_path          = StringField(label='App path',
                                   validators=[InputRequired()],
-                                  default=swa_object.settings.app_path)
+                                  default=lambda: swa_object.settings.app_path)
     common_path       = FileField(label='Common path',
                                   validators=[],
-                                  default=swa_object.settings.common_path)
+                                  default=lambda: swa_object.settings.common_path)
     user_url_profiles = URLField(label='User URL Profiles',
                                   validators=[InputRequired(), URL()],
-                                  default=swa_object.settings.user_url_profiles)
+                                  default=lambda: swa_object.settings.user_url_profiles)
     user_url_id       = URLField(label='User URL ID',
                                   validators=[InputRequired(), URL()],
-                                  default=swa_object.settings.user_url_id)
+                                  default=lambda: swa_object.settings.user_url_id)
     asset_url         = URLField(label='Asset URL',
                                   validators=[InputRequired(), URL()],
-                                  default=swa_object.settings.asset_url)
+                                  default=lambda: swa_object.settings.asset_url)
     user_favs_url     = URLField(label='User Favourites URL',
                                   validators=[InputRequired(), URL()],
-                                  default=swa_object.settings.user_favs_url)
+                                  default=lambda: swa_object.settings.user_favs_url)
     previews_path     = FileField(label='Prviews path',
                                   validators=[],
-                                  default=swa_object.settings.previews_path)
+                                  default=lambda: swa_object.settings.previews_path)
     steam_api_url     = URLField(label='Steam API URL',
                                   validators=[InputRequired(), URL()],
-                                  default=swa_object.settings.steam_api_url)
+                                  default=lambda: swa_object.settings.steam_api_url)
     timeout           = SelectField(label='Timeout',
                                   choices=timeout_choices,
-                                  default=swa_object.settings.timeout)
+                                  default=lambda: swa_object.settings.timeout)
     longtimeout       = SelectField(label='Long timeout',
                                   choices=longtimeout_choices,
-                                  default=swa_object.settings.longtimeout)
+                                  default=lambda: swa_object.settings.longtimeout)
     per_page          = SelectField(label='Cards per page',
                                   choices=per_page_choices,
-                                  default=swa_object.settings.per_page)
+                                  default=lambda: swa_object.settings.per_page)
 
 
 class PerPageForm(FlaskForm):
@@ -95,4 +102,4 @@ class PerPageForm(FlaskForm):
     Description.
     """
     per_page_selector = SelectField(
-        default=swa_object.settings.per_page, choices=per_page_choices)
+        default=lambda: swa_object.settings.per_page, choices=per_page_choices)
@@ -1,14 +1,23 @@
 """Here must be the string"""
-from flask import (render_template, request, send_from_directory,  # redirect,
-                   url_for)
+import hashlib
+import os
+from dataclasses import replace
+
+from flask import (Response, render_template, request,  # redirect,
+                   send_from_directory, url_for)
 from app.filter import LibraryFilter, FilterMonitor
 
-from swautomatic import SWAObject, find_preview, get_size_format
+from swautomatic import find_preview, get_size_format, metrics
+from swautomatic.asset import BATCH_ACTIONS
+from swautomatic.catalog import SORT_FIELDS
+from swautomatic.memo import memo
+from swautomatic.storage import ASSETS
 
-from . import app
-from .forms import PerPageForm, SettingsForm, TagsForm
+PREVIEW_MAX_AGE = 24 * 60 * 60
+'Seconds browsers keep previews without asking the server.'
 
-swa_object = SWAObject()
+from . import app, swa_object
+from .forms import PerPageForm, SettingsForm, TagsForm
 
 
 @app.route('/')
@@ -24,31 +33,50 @@ def index():
 
 
 @app.route('/library', methods=['GET', 'POST'])
+@metrics.timed('view_library')
 def library():
     title = 'Swautomatic | Library'
     result = None
     per_page_form = PerPageForm(request.form)
-    tags_form = TagsForm(request.form)
 
     page_num = request.args.get('p', default=1, type=int)
-    tag_name = request.args.get('tag', default='', type=str)
     per_page = swa_object.settings.per_page or 20
-    need_upd = request.form.get('need_upd', default=0, type=int) or request.args.get(
-        'need_upd', default=0, type=int)
-    library_filter = request.form.get(
-        'library_filters_choices', default=0, type=int)
+    # Sorting is offered only with the catalog, the storage sorts without
+    # indexes.
+    sort_fields = SORT_FIELDS if swa_object.settings.catalog else ()
+    sort = request.args.get('sort', default=None, type=str)
+    sort = sort if sort in sort_fields else None
+    desc = 1 if sort and request.args.get('desc', default=0, type=int) else 0
+    # Search by name, pages are selected by the cursor `after`.
+    search_query = request.args.get('q', default='', type=str).strip()
+    after = request.args.get('after', default=None, type=str)
 
     if per_page_form.per_page_selector.data:
         per_page = int(per_page_form.per_page_selector.data)
         if per_page != swa_object.settings.per_page:
             swa_object.settings.update('per_page', per_page)
 
-    tags = sorted(list(swa_object.tags.list_tags()))  # TODO: Cash it.
-    tag = tags_form.tag_choices.data or tag_name or request.form.get('tag')
+    tags = sorted(list(swa_object.tags.list_tags()))
+    tags_form = TagsForm(request.form, tags=tags)
+    tag = tags_form.tag_choices.data or request.form.get('tag')
+    # The filter is built from the request only, so requests never share
+    # it. Tag expressions: every tag of `all`, any tag of `any`, none of
+    # `not`.
+    fltr = LibraryFilter.from_args(
+        request.args, tag=str(tag) if tag else None,
+        installed=request.form.get('library_filters_choices', default=0,
+                                   type=int),
+        need_update=request.form.get('need_upd', default=0, type=int))
 
     # Update status
     if request.form.get('check_updates', 'false') == 'true':
         result = swa_object.assets.check_updates()
+    # Check directories and fix flags in the database
+    if request.form.get('audit', 'false') == 'true':
+        result = swa_object.assets.audit()
+    # Hardlink identical files of installed assets
+    if request.form.get('dedupe', 'false') == 'true':
+        result = swa_object.assets.dedupe()
     # DANGER ZONE FULL UPDATE
     if request.form.get('total_reset', 'false') == 'true':
         result = swa_object.total_reset()
@@ -58,54 +86,72 @@ def library():
     # Update database with downloading previews
     if request.form.get('update_database', 'false') == 'true':
         result = swa_object.update_database()
+    # Download, update, refresh or delete selected assets
+    if request.form.get('batch') in BATCH_ACTIONS:
+        result = swa_object.assets.batch(request.form['batch'],
+                                         request.form.getlist('selected'))
 
-    is_installed = None if not library_filter else library_filter == 1
+    need_upd = 1 if fltr.need_update else 0
     no_need_upd = 0 if need_upd == 1 else 1
+    need_upd_args = replace(fltr, need_update=not fltr.need_update).to_args()
 
     statistics = swa_object.get_statistics()
 
-    if (tag or need_upd != 0 or is_installed is not None or page_num != 1):
-        fltr = LibraryFilter(tag=str(tag) if tag else None,
-                             need_update=True if need_upd else None,
-                             is_installed=is_installed)
+    # The page depends only on the request, data versions and statistics,
+    # so repeated views are answered with 304 before anything is rendered.
+    response = Response()
+    response.cache_control.no_cache = True
+    if request.method == 'GET':
+        # The ETag is the only validator, a time of change would differ
+        # between processes.
+        response.set_etag(_library_etag(statistics, per_page))
+        response.make_conditional(request)
+        if response.status_code == 304:
+            metrics.inc('library_not_modified')
+            return response
+
+    next_cursor = None
+    if search_query:
+        found = swa_object.assets.search(search_query, limit=per_page,
+                                         after=after)
+        assets_count = found.count
+        datalist = _datalist(found.assets)
+        next_cursor = found.next
+        last_page = page_num + 1 if next_cursor else page_num
     else:
-        fltr = LibraryFilter()
-        fltr.reset()
-
-    assets_count = swa_object.assets.count_assets(tag=fltr.tag,
-                                                  need_update=fltr.need_update,
-                                                  is_installed=fltr.is_installed,
-                                                  )
-
-    assets_cl_list = swa_object.assets.get_assets(tag=fltr.tag,
-                                                  need_update=fltr.need_update,
-                                                  is_installed=fltr.is_installed,
-                                                  skip=(page_num-1)*per_page,
-                                                  limit=per_page
-                                                  )
-    last_page = assets_count // per_page + 1
-    datalist = []
-
-    for asset in assets_cl_list:
-        datalist.append({
-            'steamid': str(asset.steamid),
-            'name': str(asset.name),
-            'is_installed': asset.is_installed,
-            'file_size': get_size_format(asset.file_size),
-            'author_steamID': str(asset.author.steam_id),
-            'author_avatarIcon': str(asset.author.avatar_icon),
-        })
-
+        # Equal filters have equal keys, so pages are cached per filter
+        # until assets are written.
+        assets_count, datalist = memo.get(
+            f'library:{fltr.key}:{sort}:{desc}:{page_num}:{per_page}',
+            lambda: _library_page(fltr, page_num, per_page, sort, desc),
+            kinds=(ASSETS,))
+        last_page = assets_count // per_page + 1
+
+    # Counts of assets by tag within the filter are bitwise operations in
+    # the catalog, the storage would need a query per tag.
+    tag_counts = {}
+    if swa_object.settings.catalog:
+        tag_counts = memo.get(
+            f'tag_counts:{fltr.key}',
+            lambda: swa_object.assets.count_by_tag(**fltr.kwargs()),
+            kinds=(ASSETS,))
+        tags_form.tag_choices.choices = [
+            (name, f'{name} ({tag_counts.get(name, 0)})') for name in tags]
+
+    tag_expression = ' and '.join(
+        list(fltr.tags) +
+        ([' or '.join(fltr.any_tags)] if fltr.any_tags else []) +
+        [f'not {name}' for name in fltr.exclude_tags])
     filter_monitor = FilterMonitor(
-        tag_message=fltr.tag if fltr.tag else 'Tag filter is not applied',
-        tag_applied=fltr.tag is not None,
+        tag_message=tag_expression or 'Tag filter is not applied',
+        tag_applied=bool(tag_expression),
         need_update_message='Assets which need update' if fltr.need_update else 'Filter is not applied',
         need_update_applied=fltr.need_update != 0 and fltr.need_update is not None,
         is_installed_message='Installed assets' if fltr.is_installed else 'Filter is not applied',
         is_installed_applied=fltr.is_installed is not None,
     )
 
-    return render_template('library.html',
+    html = render_template('library.html',
                            title=title,
                            datalist=datalist,
                            page_num=page_num,
@@ -117,10 +163,78 @@ def library():
                            selected_tag=tag,
                            need_upd=need_upd,
                            no_need_upd=no_need_upd,
+                           need_upd_args=need_upd_args,
+                           filter_args=fltr.to_args(),
                            statistics=statistics,
                            result=result,
                            filter_monitor=filter_monitor,
+                           sort=sort,
+                           desc=desc,
+                           sort_fields=sort_fields,
+                           tag_counts=tag_counts,
+                           all_tags=fltr.tags,
+                           any_tags=fltr.any_tags,
+                           exclude_tags=fltr.exclude_tags,
+                           search_query=search_query,
+                           next_cursor=next_cursor,
                            )
+    response.set_data(html)
+    return response
+
+
+def _library_etag(statistics, per_page: int) -> str:
+    """Returns the validator of the library page for the request. The
+    counter of writes is kept by the storage, so every process sends the
+    same validator for the same data. If the watcher does not write the
+    state of installs, `is_installed` is read from the disk: directories of
+    assets are added and removed by renames, which change the times of
+    modification of the roots."""
+
+    settings = swa_object.settings
+    disk = None
+    if not settings.watch_files:
+        disk = []
+        for root in (settings.assets_path, settings.mods_path):
+            try:
+                disk.append(os.stat(root).st_mtime_ns)
+            except OSError:
+                disk.append(None)
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.full_path, per_page, settings.catalog,
+                 swa_object.storage.revision(), disk, statistics):
+        digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+def _library_page(fltr: LibraryFilter, page_num: int, per_page: int,
+                  sort, desc) -> tuple:
+    """Returns the number of assets matching the filter and data of assets
+    of the page."""
+
+    assets_count = swa_object.assets.count_assets(**fltr.kwargs())
+    assets_cl_list = swa_object.assets.get_assets(**fltr.kwargs(),
+                                                  skip=(page_num-1)*per_page,
+                                                  limit=per_page,
+                                                  sort=sort,
+                                                  reverse=bool(desc),
+                                                  )
+    return assets_count, _datalist(assets_cl_list)
+
+
+def _datalist(assets_cl_list) -> list[dict]:
+    """Returns data of assets shown by cards of the library."""
+
+    datalist = []
+    for asset in assets_cl_list:
+        datalist.append({
+            'steamid': str(asset.steamid),
+            'name': str(asset.name),
+            'is_installed': asset.is_installed,
+            'file_size': get_size_format(asset.file_size),
+            'author_steamID': str(asset.author.steam_id),
+            'author_avatarIcon': str(asset.author.avatar_icon),
+        })
+    return datalist
 
 
 @app.route('/library/<int:steam_id>', methods=['GET', 'POST'])
@@ -165,6 +279,12 @@ def library_page(steam_id):
 #     return redirect(url_for(f'library/{steam_id}'))
 
 
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.to_prometheus(),
+                    mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/about')
 def about():
     title = 'Swautomatic | About'
@@ -183,9 +303,15 @@ def previews(assetid):
         path = find_preview(swa_object.settings.previews_path, assetid)
     else:
         path = None
+    # Previews are validated by the modification time and the size of the
+    # file. The placeholder is revalidated on every view, the preview may be
+    # downloaded later.
+    max_age = PREVIEW_MAX_AGE
     if path is None:
         path = 'empty.jpg'
-    return send_from_directory(f'../{swa_object.settings.previews_path}', path)
+        max_age = 0
+    return send_from_directory(f'../{swa_object.settings.previews_path}', path,
+                               max_age=max_age)
 
 
 @app.route('/settings', methods=['GET', 'POST'])
@@ -0,0 +1,6 @@
+"""
+benchmarks
+==========
+Benchmarks of Swautomatic project. Every module can be run as a script, for
+example `python -m benchmarks.import_time`.
+"""
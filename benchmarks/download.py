@@ -0,0 +1,207 @@
+"""
+benchmarks > `download`
+=======================
+Measures the install throughput and the tail latency of
+~swautomatic.asset.SWAAsset.`download()` under different mirror conditions
+(see ~benchmarks.`mirror`): a clean mirror, slow links, server errors,
+truncated bodies, wrong content types, missing archives and a mix of them.
+
+For every scenario the items are registered in an SQLite database (the
+Steam stand-in from ~benchmarks.`steam_stub` answers the API), then every
+item is installed in a separate interpreter and the duration of every
+install is recorded. Failed installs (`False` or an exception) are counted
+per error type.
+
+Usage
+-----
+```powershell
+python -m benchmarks.download --items 100 --concurrency 1 4
+python -m benchmarks.download --scenarios clean hostile --compare old.json
+```
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .mirror import MirrorProfile, MirrorSimulator
+from .report import ROOT, compare_reports, load_report, write_report
+from .steam_stub import SteamStub
+from .workshop import FIRST_ID, Workshop
+
+MB = 1024 * 1024
+
+SCENARIOS: dict[str, list[MirrorProfile]] = {
+    'clean': [MirrorProfile()],
+    'slow': [MirrorProfile(latency=0.05, bandwidth=8 * MB)],
+    'errors': [MirrorProfile(error_rate=0.3), MirrorProfile(latency=0.02)],
+    'truncated': [MirrorProfile(truncate_rate=0.2), MirrorProfile()],
+    'wrong_type': [MirrorProfile(wrong_type_rate=0.3), MirrorProfile()],
+    'missing': [MirrorProfile(missing=True), MirrorProfile(missing=True),
+                MirrorProfile()],
+    'hostile': [MirrorProfile(latency=0.02, error_rate=0.2),
+                MirrorProfile(truncate_rate=0.1, bandwidth=16 * MB),
+                MirrorProfile(wrong_type_rate=0.2),
+                MirrorProfile(latency=0.05, bandwidth=8 * MB)],
+}
+'Mirrors of every scenario, in the order they are tried.'
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'download.json')
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """Returns the percentile of sorted `values` (the nearest rank)."""
+
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def worker(items: int, concurrency: int) -> dict:
+    """Registers `items` items and installs all of them from the mirrors set
+    in `settings.json` of the current working directory."""
+
+    # pylint: disable=import-outside-toplevel
+    from swautomatic import SWAAsset, SWAObject, metrics
+
+    swa_object = SWAObject()
+    ids = list(range(FIRST_ID, FIRST_ID + items))
+    swa_object.assets.insert_assets(ids)
+    metrics.reset()
+
+    def install(steamid: int) -> tuple[float, str | None]:
+        asset = SWAAsset(steamid=steamid)
+        start = time.perf_counter()
+        try:
+            error = None if asset.download() else 'failed'
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            error = type(exc).__name__
+        return time.perf_counter() - start, error
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(install, ids))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(duration for duration, _ in results)
+    errors: dict[str, int] = {}
+    for _, error in results:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    totals = metrics.totals()
+    downloaded = totals.get('counters', {}).get('download_bytes', 0)
+    installed = len(results) - sum(errors.values())
+    return {
+        'timings': {
+            'wall': wall,
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'installed': installed,
+        'errors': errors,
+        'installs_per_second': installed / wall if wall else 0.0,
+        'mb_per_second': downloaded / MB / wall if wall else 0.0,
+        'download_bytes': downloaded,
+        'metrics': totals,
+    }
+
+
+def run(scenario: str, items: int, concurrency: int, files: int,
+        file_size: int, seed: int = 0, keep: bool = False) -> dict:
+    """Runs the scenario in a new interpreter."""
+
+    root = tempfile.mkdtemp(prefix=f'swautomatic-download-{scenario}-')
+    workshop = Workshop(root, items, installed_ratio=0)
+    profiles = [MirrorProfile(**{**profile.__dict__, 'stats': {}})
+                for profile in SCENARIOS[scenario]]
+    with SteamStub(workshop.ids) as stub, \
+            MirrorSimulator(profiles, workshop.ids, files, file_size,
+                            seed=seed) as simulator:
+        workshop.create(stub.url, mirrors=simulator.mirrors)
+        env = dict(os.environ, PYTHONPATH=ROOT,
+                   NO_PROXY='127.0.0.1,localhost', no_proxy='127.0.0.1,localhost')
+        process = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.download', '--worker',
+             '--items', str(items), '--concurrency', str(concurrency)],
+            cwd=root, env=env, capture_output=True, text=True, check=False)
+        mirrors = simulator.stats()
+    if not keep:
+        shutil.rmtree(root, ignore_errors=True)
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f'The scenario {scenario} failed.')
+    result = json.loads(process.stdout.splitlines()[-1])
+    result.update({
+        'case': f'{scenario}-c{concurrency}',
+        'scenario': scenario,
+        'items': items,
+        'concurrency': concurrency,
+        'archive_bytes': len(simulator.archive(FIRST_ID)),
+        'profiles': [{key: value for key, value in profile.__dict__.items()
+                      if key != 'stats'} for profile in profiles],
+        'mirrors': mirrors,
+        'directory': root if keep else None,
+    })
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Measures installs of items from simulated mirrors.')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS),
+                        default=list(SCENARIOS))
+    parser.add_argument('--items', type=int, default=100,
+                        help='items installed in every scenario')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1],
+                        help='numbers of parallel installs')
+    parser.add_argument('--files', type=int, default=20,
+                        help='files in every archive')
+    parser.add_argument('--file-size', type=int, default=32 * 1024,
+                        help='the size of every file in archives')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of mirror failures')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='a path to write the JSON report')
+    parser.add_argument('--compare', help='a report to compare with')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep generated libraries')
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.items, args.concurrency[0])))
+        return 0
+
+    runs = []
+    for scenario in args.scenarios:
+        for concurrency in args.concurrency:
+            print(f'Scenario {scenario}, concurrency {concurrency}...',
+                  flush=True)
+            result = run(scenario, args.items, concurrency, args.files,
+                         args.file_size, args.seed, args.keep)
+            timings = result['timings']
+            print(f"  installed {result['installed']}/{args.items}, "
+                  f"{result['installs_per_second']:.1f} items/s, "
+                  f"{result['mb_per_second']:.1f} MB/s, "
+                  f"p50 {timings['p50'] * 1000:.1f} ms, "
+                  f"p99 {timings['p99'] * 1000:.1f} ms, "
+                  f"errors {result['errors'] or '-'}")
+            runs.append(result)
+    report = write_report(args.output, 'download', runs)
+    print(f'The report is written to {args.output}')
+    if args.compare:
+        compare_reports(load_report(args.compare), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
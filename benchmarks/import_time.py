@@ -0,0 +1,94 @@
+"""
+benchmarks > `import_time`
+==========================
+Measures the time of `import swautomatic` in fresh interpreters and checks
+that the import has no side effects: it must not import heavy third-party
+packages, open a log file or connect to the database. The web application
+(`app`) is not measured, it reads `settings.json` and opens the database
+when it is imported.
+
+Usage
+-----
+```powershell
+python -m benchmarks.import_time --repeat 20
+```
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['pymongo', 'requests', 'bs4', 'PIL', 'dotenv']
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure(module: str, repeat: int) -> dict:
+    """Imports `module` `repeat` times in new interpreters, each time in an
+    empty working directory, and returns the statistics."""
+
+    timings = []
+    heavy = set()
+    side_effects = set()
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='1')
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cwd:
+            output = subprocess.run(
+                [sys.executable, '-c',
+                 SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                cwd=cwd, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            data = json.loads(output.splitlines()[-1])
+            timings.append(data['seconds'])
+            heavy.update(data['heavy'])
+            side_effects.update(os.listdir(cwd))
+    return {
+        'module': module,
+        'repeat': repeat,
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'heavy_modules': sorted(heavy),
+        'created_files': sorted(side_effects),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[3])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--json', help='a path to write the JSON report')
+    args = parser.parse_args()
+
+    report = [measure('swautomatic', args.repeat)]
+    for item in report:
+        print(f"{item['module']}: median {item['median_ms']:.1f} ms, "
+              f"min {item['min_ms']:.1f} ms, max {item['max_ms']:.1f} ms")
+        if item['heavy_modules']:
+            print(f"  imported eagerly: {', '.join(item['heavy_modules'])}")
+        if item['created_files']:
+            print(f"  created files: {', '.join(item['created_files'])}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    clean = all(not item['heavy_modules'] and not item['created_files']
+                for item in report)
+    return 0 if clean else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+benchmarks > `library`
+======================
+Times the main operations of Swautomatic on synthetic libraries without
+touching Steam: `update_database` (first run inserts every item, second run
+updates them), `check_updates`, `get_statistics`, `get_assets`,
+`count_assets` and rendering of `/library`.
+
+For every size a library is generated in a temporary directory
+(see ~benchmarks.`workshop`), the Steam stand-in is started in this process
+(see ~benchmarks.`steam_stub`) and the operations run in a separate
+interpreter with SQLite storage, so the stand-in does not share the GIL with
+the measured code.
+
+Usage
+-----
+```powershell
+python -m benchmarks.library --sizes 1000 10000 100000 --output report.json
+python -m benchmarks.library --compare old.json --output new.json
+```
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from .report import ROOT, compare_reports, load_report, write_report
+from .steam_stub import SteamStub
+from .workshop import Workshop
+
+SIZES = [1000, 10000, 100000]
+'The sizes of libraries measured by default.'
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results', 'library.json')
+
+
+def _measure(func: Callable, repeat: int = 1) -> float:
+    """Returns the median duration of `func` in seconds."""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def worker(repeat: int) -> dict:
+    """Runs the operations in the current working directory, which must
+    contain the generated library and `settings.json`."""
+
+    # pylint: disable=import-outside-toplevel
+    from app import app, swa_object
+    from swautomatic import metrics
+
+    timings = {}
+    timings['update_database_insert'] = _measure(swa_object.update_database)
+    timings['update_database_update'] = _measure(swa_object.update_database)
+    timings['check_updates'] = _measure(swa_object.assets.check_updates)
+    timings['get_statistics'] = _measure(swa_object.get_statistics, repeat)
+    per_page = swa_object.settings.per_page
+    timings['get_assets_page'] = _measure(
+        lambda: swa_object.assets.get_assets(skip=per_page, limit=per_page),
+        repeat)
+    timings['get_assets_tag_page'] = _measure(
+        lambda: swa_object.assets.get_assets(tag='Mod', limit=per_page),
+        repeat)
+    timings['count_assets'] = _measure(swa_object.assets.count_assets, repeat)
+    timings['get_assets_all'] = _measure(swa_object.assets.get_assets)
+
+    client = app.test_client()
+
+    def render():
+        response = client.get('/library')
+        assert response.status_code == 200, response.status_code
+
+    timings['library_render'] = _measure(render, repeat)
+    return {
+        'timings': timings,
+        'count': swa_object.assets.count_assets(),
+        'metrics': metrics.totals(),
+    }
+
+
+def run(size: int, repeat: int, keep: bool = False) -> dict:
+    """Generates the library of `size` items and measures it in a new
+    interpreter."""
+
+    root = tempfile.mkdtemp(prefix=f'swautomatic-bench-{size}-')
+    workshop = Workshop(root, size)
+    with SteamStub(workshop.ids, workshop.need_update) as stub:
+        start = time.perf_counter()
+        workshop.create(stub.url)
+        generate = time.perf_counter() - start
+        env = dict(os.environ, PYTHONPATH=ROOT,
+                   NO_PROXY='127.0.0.1,localhost', no_proxy='127.0.0.1,localhost')
+        process = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.library', '--worker',
+             '--repeat', str(repeat)],
+            cwd=root, env=env, capture_output=True, text=True, check=False)
+        requests = dict(stub.requests)
+    if process.returncode != 0:
+        sys.stderr.write(process.stderr)
+        raise RuntimeError(f'The benchmark of {size} items failed.')
+    result = json.loads(process.stdout.splitlines()[-1])
+    if not keep:
+        import shutil  # pylint: disable=import-outside-toplevel
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        'case': str(size),
+        'size': size,
+        'installed': len(workshop.installed),
+        'need_update': len(workshop.need_update),
+        'generate_seconds': generate,
+        'timings': result['timings'],
+        'count': result['count'],
+        'metrics': result['metrics'],
+        'requests': requests,
+        'directory': root if keep else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Times Swautomatic operations on synthetic libraries.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='repeats of fast operations, the median is used')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='a path to write the JSON report')
+    parser.add_argument('--compare', help='a report to compare with')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep generated libraries')
+    parser.add_argument('--worker', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.repeat)))
+        return 0
+
+    runs = []
+    for size in args.sizes:
+        print(f'Library of {size} items...', flush=True)
+        result = run(size, args.repeat, args.keep)
+        for name, value in result['timings'].items():
+            print(f'  {name:<28} {value:>10.4f} s')
+        runs.append(result)
+    report = write_report(args.output, 'library', runs)
+    print(f'The report is written to {args.output}')
+    if args.compare:
+        compare_reports(load_report(args.compare), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
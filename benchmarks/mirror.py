@@ -0,0 +1,220 @@
+"""
+benchmarks > `mirror`
+=====================
+A local simulator of download mirrors. It serves generated zip archives
+(see ~benchmarks.workshop.`make_archive()`) from several mirrors at once,
+every mirror has its own behaviour: latency, bandwidth, error rate, truncated
+bodies and wrong content types.
+
+Mirror `i` is available at `<url>/m<i>/`, so the list `simulator.mirrors`
+can be used as the setting `mirrors` of Swautomatic.
+
+Example
+-------
+```python
+profiles = [MirrorProfile(error_rate=0.5), MirrorProfile(latency=0.05)]
+with MirrorSimulator(profiles, ids) as simulator:
+    print(simulator.mirrors)
+```
+"""
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+from urllib.parse import urlsplit
+
+from .workshop import make_archive
+
+__all__ = [
+    'MirrorProfile',
+    'MirrorSimulator',
+]
+
+CHUNK_SIZE = 16 * 1024
+
+
+@dataclass
+class MirrorProfile:
+    """
+    benchmarks > mirror > `MirrorProfile`
+    -------------------------------------
+    The behaviour of one simulated mirror.
+
+    Attributes
+    ----------
+    -   `latency` (float): seconds before every response.
+    -   `bandwidth` (int): bytes per second of every response body, `0` means
+        unlimited.
+    -   `error_rate` (float): a part of requests answered with `503`.
+    -   `truncate_rate` (float): a part of archives whose body is cut in the
+        middle (the connection is closed).
+    -   `wrong_type_rate` (float): a part of responses with the content type
+        `text/html`, like a mirror showing an error page.
+    -   `missing` (bool): the mirror does not have any archive (`404`).
+    """
+
+    latency: float = 0.0
+    bandwidth: int = 0
+    error_rate: float = 0.0
+    truncate_rate: float = 0.0
+    wrong_type_rate: float = 0.0
+    missing: bool = False
+    stats: dict = field(default_factory=dict, compare=False)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _count(self, index: int, name: str) -> None:
+        simulator = self.server.simulator
+        with simulator.lock:
+            stats = simulator.profiles[index].stats
+            stats[name] = stats.get(name, 0) + 1
+
+    def _serve(self, head: bool) -> None:
+        simulator = self.server.simulator
+        match = re.fullmatch(r'/m(\d+)/(\d+)\.zip', urlsplit(self.path).path)
+        if not match or int(match.group(1)) >= len(simulator.profiles):
+            self._reply(404, b'Not found', 'text/plain', head)
+            return
+        index, steamid = int(match.group(1)), int(match.group(2))
+        profile = simulator.profiles[index]
+        self._count(index, 'head' if head else 'get')
+        if profile.latency:
+            time.sleep(profile.latency)
+        if profile.missing or steamid not in simulator.ids:
+            self._count(index, 'missing')
+            self._reply(404, b'Not found', 'text/plain', head)
+            return
+        if simulator.chance(profile.error_rate):
+            self._count(index, 'errors')
+            self._reply(503, b'Service unavailable', 'text/plain', head)
+            return
+        content_type = 'application/zip'
+        if simulator.chance(profile.wrong_type_rate):
+            self._count(index, 'wrong_type')
+            content_type = 'text/html; charset=utf-8'
+        body = simulator.archive(steamid)
+        limit = len(body)
+        if not head and simulator.chance(profile.truncate_rate):
+            self._count(index, 'truncated')
+            limit = len(body) // 2
+        self._reply(200, body, content_type, head, limit, profile.bandwidth)
+
+    def _reply(self, status: int, body: bytes, content_type: str,
+               head: bool, limit: int = -1, bandwidth: int = 0) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if 0 <= limit < len(body):
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        if head:
+            return
+        if limit < 0:
+            limit = len(body)
+        for start in range(0, limit, CHUNK_SIZE):
+            chunk = body[start:min(start + CHUNK_SIZE, limit)]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        if limit < len(body):
+            self.close_connection = True
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self._serve(head=True)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._serve(head=False)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, simulator: 'MirrorSimulator', address) -> None:
+        self.simulator = simulator
+        super().__init__(address, _Handler)
+
+
+class MirrorSimulator:
+    """
+    benchmarks > mirror > `MirrorSimulator`
+    ---------------------------------------
+    Serves archives of items `ids` from mirrors described by `profiles`.
+
+    Parameters
+    ----------
+    -   `profiles` (list): ~benchmarks.mirror.`MirrorProfile` of every mirror.
+    -   `ids` (iterable): Steam IDs of available items.
+    -   `archive_files`, `archive_file_size` (int): the shape of archives.
+    -   `compress` (bool): if `True` members are deflated.
+    -   `seed` (int): the seed of random errors.
+    """
+
+    def __init__(self, profiles: list[MirrorProfile], ids: Iterable[int],
+                 archive_files: int = 20, archive_file_size: int = 64 * 1024,
+                 compress: bool = False, seed: int = 0,
+                 host: str = '127.0.0.1', port: int = 0) -> None:
+        self.profiles = profiles
+        self.ids = set(ids)
+        self.archive_files = archive_files
+        self.archive_file_size = archive_file_size
+        self.compress = compress
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.archives: dict[int, bytes] = {}
+        self.server = _Server(self, (host, port))
+        self.url = 'http://{}:{}'.format(*self.server.server_address[:2])
+        self.mirrors = [f'{self.url}/m{i}/' for i in range(len(profiles))]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='mirror-simulator', daemon=True)
+
+    def chance(self, rate: float) -> bool:
+        """Returns `True` with the probability `rate`."""
+
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def archive(self, steamid: int) -> bytes:
+        """Returns (and caches) the archive of the item."""
+
+        with self.lock:
+            data = self.archives.get(steamid)
+        if data is None:
+            data = make_archive(steamid, self.archive_files,
+                                self.archive_file_size, self.compress)
+            with self.lock:
+                self.archives[steamid] = data
+        return data
+
+    def stats(self) -> list[dict]:
+        """Returns the counters of requests of every mirror."""
+
+        with self.lock:
+            return [dict(profile.stats) for profile in self.profiles]
+
+    def start(self) -> 'MirrorSimulator':
+        """Starts the server."""
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'MirrorSimulator':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
@@ -0,0 +1,95 @@
+"""
+benchmarks > `report`
+=====================
+Writes benchmark reports as JSON and compares two reports of the same
+benchmark. A report looks like:
+
+```json
+{
+    "benchmark": "library",
+    "created": "2023-06-01T12:00:00",
+    "environment": {"python": "3.11.4", "platform": "...", "commit": "..."},
+    "runs": [{"case": "1000", "timings": {"get_assets": 0.01}, ...}]
+}
+```
+
+Timings are in seconds. Runs are matched by `case` when reports are
+compared.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Optional
+
+__all__ = [
+    'compare_reports',
+    'environment',
+    'load_report',
+    'write_report',
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def environment() -> dict:
+    """Returns data about the machine and the revision of the code."""
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def write_report(path: Optional[str], benchmark: str, runs: list[dict]) -> dict:
+    """Builds the report and writes it to `path` (if it is given)."""
+
+    report = {
+        'benchmark': benchmark,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'runs': runs,
+    }
+    if path:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+    return report
+
+
+def load_report(path: str) -> dict:
+    """Reads the report from `path`."""
+
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare_reports(old: dict, new: dict, file=sys.stdout) -> None:
+    """Prints the timings of both reports and the ratio `new / old`."""
+
+    old_runs = {str(run['case']): run for run in old.get('runs', [])}
+    print(f"{'case':>10} {'timing':<32} {'old, s':>10} {'new, s':>10} "
+          f"{'ratio':>7}", file=file)
+    for run in new.get('runs', []):
+        previous = old_runs.get(str(run['case']), {}).get('timings', {})
+        for name, value in run.get('timings', {}).items():
+            before = previous.get(name)
+            if before:
+                ratio = f'{value / before:.2f}'
+                before = f'{before:.4f}'
+            else:
+                ratio, before = '-', '-'
+            print(f"{run['case']:>10} {name:<32} {before:>10} "
+                  f"{value:>10.4f} {ratio:>7}", file=file)
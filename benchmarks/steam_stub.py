@@ -0,0 +1,202 @@
+"""
+benchmarks > `steam_stub`
+=========================
+A local HTTP stand-in for the Steam endpoints used by Swautomatic:
+
+-   `POST /ISteamRemoteStorage/GetPublishedFileDetails/v1`: details of
+    items (see ~benchmarks.workshop.`item_details()`);
+-   `GET /profiles/<steamid>/?xml=1`: the profile XML of an author;
+-   `GET /id/<user>/myworkshopfiles?p=<page>&numperpage=<n>`: the HTML
+    pages of the user's favourites;
+-   `GET /previews/<steamid>.png`: preview images;
+-   `HEAD|GET /mirror/<steamid>.zip`: archives of items.
+
+Example
+-------
+```python
+with SteamStub(ids) as stub:
+    print(stub.url)
+```
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .workshop import item_details, make_archive, make_preview
+
+__all__ = ['SteamStub']
+
+PROFILE_XML = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<profile>
+    <steamID64>{steamid}</steamID64>
+    <steamID><![CDATA[Author {steamid}]]></steamID>
+    <avatarIcon><![CDATA[{url}/avatars/{steamid}.jpg]]></avatarIcon>
+    <avatarMedium><![CDATA[{url}/avatars/{steamid}_medium.jpg]]></avatarMedium>
+    <avatarFull><![CDATA[{url}/avatars/{steamid}_full.jpg]]></avatarFull>
+    <customURL><![CDATA[author{steamid}]]></customURL>
+</profile>
+"""
+
+FAVS_ITEM = """<div class="workshopItem">
+    <a href="{url}/sharedfiles/filedetails/?id={steamid}"
+       data-publishedfileid="{steamid}"><img src=""></a>
+</div>"""
+
+FAVS_EMPTY = """<div class="inventory_msg_content">
+    There are no more items.
+</div>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, body: bytes, content_type: str, status: int = 200,
+              head: bool = False) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _route(self, head: bool = False) -> None:
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        path = parts.path
+        with stub.lock:
+            stub.requests[path.split('/')[1]] = \
+                stub.requests.get(path.split('/')[1], 0) + 1
+
+        match = re.fullmatch(r'/profiles/(\d+)/?', path)
+        if match:
+            body = PROFILE_XML.format(steamid=match.group(1), url=stub.url)
+            self._send(body.encode(), 'text/xml; charset=utf-8', head=head)
+            return
+        if re.fullmatch(r'/id/[^/]+/myworkshopfiles/?', path):
+            page = int(query.get('p', ['1'])[0])
+            per_page = int(query.get('numperpage', ['30'])[0])
+            ids = stub.ids[(page - 1) * per_page:page * per_page]
+            if ids:
+                body = '\n'.join(FAVS_ITEM.format(url=stub.url, steamid=i)
+                                 for i in ids)
+            else:
+                body = FAVS_EMPTY
+            html = f'<html><body>{body}</body></html>'
+            self._send(html.encode(), 'text/html; charset=utf-8', head=head)
+            return
+        if re.fullmatch(r'/previews/\d+\.png', path):
+            self._send(stub.preview, 'image/png', head=head)
+            return
+        match = re.fullmatch(r'/mirror/(\d+)\.zip', path)
+        if match:
+            steamid = int(match.group(1))
+            if steamid not in stub.id_set:
+                self._send(b'Not found', 'text/plain', status=404, head=head)
+                return
+            self._send(stub.archive(steamid), 'application/zip', head=head)
+            return
+        self._send(b'Not found', 'text/plain', status=404, head=head)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self._route(head=True)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self._route()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if not urlsplit(self.path).path.endswith('GetPublishedFileDetails/v1'):
+            self._send(b'Not found', 'text/plain', status=404)
+            return
+        with stub.lock:
+            stub.requests['api'] = stub.requests.get('api', 0) + 1
+        ids = [int(value[0]) for key, value in form.items()
+               if key.startswith('publishedfileids')]
+        details = [item_details(i, stub.url, i in stub.need_update)
+                   for i in ids if i in stub.id_set]
+        body = json.dumps({'response': {'result': 1,
+                                        'resultcount': len(details),
+                                        'publishedfiledetails': details}})
+        self._send(body.encode(), 'application/json')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, stub: 'SteamStub', address) -> None:
+        self.stub = stub
+        super().__init__(address, _Handler)
+
+
+class SteamStub:
+    """
+    benchmarks > steam_stub > `SteamStub`
+    -------------------------------------
+    The local Steam stand-in running in a background thread.
+
+    Parameters
+    ----------
+    -   `ids` (iterable): Steam IDs of the user's favourites.
+    -   `need_update` (iterable): Steam IDs of items updated after they were
+        installed (optional).
+    -   `archive_files`, `archive_file_size` (int): the shape of archives
+        served by the mirror.
+    -   `host`, `port`: the address to listen, port `0` picks a free port.
+    """
+
+    def __init__(self, ids: Iterable[int],
+                 need_update: Optional[Iterable[int]] = None,
+                 archive_files: int = 3, archive_file_size: int = 4096,
+                 host: str = '127.0.0.1', port: int = 0) -> None:
+        self.ids = list(ids)
+        self.id_set = set(self.ids)
+        self.need_update = set(need_update or [])
+        self.archive_files = archive_files
+        self.archive_file_size = archive_file_size
+        self.preview = make_preview()
+        self.lock = threading.Lock()
+        self.requests: dict[str, int] = {}
+        self.archives: dict[int, bytes] = {}
+        self.server = _Server(self, (host, port))
+        self.url = 'http://{}:{}'.format(*self.server.server_address[:2])
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='steam-stub', daemon=True)
+
+    def archive(self, steamid: int) -> bytes:
+        """Returns (and caches) the archive of the item."""
+
+        with self.lock:
+            data = self.archives.get(steamid)
+        if data is None:
+            data = make_archive(steamid, self.archive_files,
+                                self.archive_file_size)
+            with self.lock:
+                self.archives[steamid] = data
+        return data
+
+    def start(self) -> 'SteamStub':
+        """Starts the server."""
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'SteamStub':
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
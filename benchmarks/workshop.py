@@ -0,0 +1,202 @@
+"""
+benchmarks > `workshop`
+=======================
+Generates a synthetic Steam Workshop library: the details of items, asset
+and mod directories under `Maps`/`Mods`, preview files, zip archives and a
+`settings.json` which points Swautomatic to a local Steam stand-in
+(see ~benchmarks.`steam_stub`) and to an SQLite database.
+
+Every value is derived from the Steam ID, so the same library is generated
+on every run.
+"""
+
+import io
+import json
+import os
+import random
+import time
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+__all__ = [
+    'FIRST_ID',
+    'Workshop',
+    'item_details',
+    'make_archive',
+    'make_preview',
+]
+
+FIRST_ID = 100000000
+'The Steam ID of the first synthetic item.'
+TAGS = ['Building', 'Park', 'Prop', 'Road', 'Vehicle', 'Intersection',
+        'Decal', 'Tree']
+CREATORS = 50
+'The number of distinct authors.'
+FIRST_CREATOR = 76561198000000000
+
+
+def is_mod(steamid: int) -> bool:
+    """Every tenth item is a mod."""
+    return (steamid - FIRST_ID) % 10 == 0
+
+
+def item_details(steamid: int, base_url: str,
+                 need_update: bool = False) -> dict:
+    """
+    benchmarks > workshop > `item_details()`
+    ----------------------------------------
+    Returns the details of the item in the format of the Steam Web API
+    `GetPublishedFileDetails`. If `need_update` is `True` the item is updated
+    after the local files were written.
+    """
+
+    index = steamid - FIRST_ID
+    if is_mod(steamid):
+        tags = ['Mod']
+    else:
+        tags = [TAGS[index % len(TAGS)], TAGS[(index // 3) % len(TAGS)]]
+    time_updated = 1650000000 + index
+    if need_update:
+        time_updated = int(time.time()) + 86400
+    return {
+        'publishedfileid': str(steamid),
+        'result': 1,
+        'creator': str(FIRST_CREATOR + index % CREATORS),
+        'consumer_app_id': 255710,
+        'title': f'Synthetic item {steamid}',
+        'file_size': 10000 + (index % 1000) * 100,
+        'preview_url': f'{base_url}/previews/{steamid}.png',
+        'time_created': 1600000000 + index,
+        'time_updated': time_updated,
+        'tags': [{'tag': tag} for tag in tags],
+    }
+
+
+def make_archive(steamid: int, files: int = 3, file_size: int = 4096,
+                 compress: bool = False) -> bytes:
+    """
+    benchmarks > workshop > `make_archive()`
+    ----------------------------------------
+    Returns a zip archive of the item as the mirrors serve it: every member
+    is stored under the directory `<steamid>/`.
+    """
+
+    rnd = random.Random(steamid)
+    buffer = io.BytesIO()
+    method = ZIP_DEFLATED if compress else ZIP_STORED
+    with ZipFile(buffer, 'w', compression=method) as archive:
+        for i in range(files):
+            if compress:
+                # Half of the data is repeated so it can be compressed.
+                half = rnd.randbytes(file_size // 2)
+                data = half + half[:file_size - len(half)]
+            else:
+                data = rnd.randbytes(file_size)
+            archive.writestr(f'{steamid}/file_{i}.crp', data)
+    return buffer.getvalue()
+
+
+def make_preview(size: int = 64) -> bytes:
+    """Returns a small PNG image."""
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), (240, 128, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Workshop:
+    """
+    benchmarks > workshop > `Workshop`
+    ----------------------------------
+    A synthetic library in the directory `root`.
+
+    Parameters
+    ----------
+    -   `root` (str): a directory of the library, it is the working directory
+        of Swautomatic during the benchmark.
+    -   `count` (int): a number of items in the user's favourites.
+    -   `installed_ratio` (float): a part of items which are installed.
+    -   `update_ratio` (float): a part of installed items which need update.
+    -   `files` (int): a number of files in every installed item.
+    """
+
+    def __init__(self, root: str, count: int, installed_ratio: float = 0.5,
+                 update_ratio: float = 0.1, files: int = 3) -> None:
+        self.root = os.path.abspath(root)
+        self.count = count
+        self.files = files
+        self.ids = list(range(FIRST_ID, FIRST_ID + count))
+        step_installed = max(1, round(1 / installed_ratio)) \
+            if installed_ratio else 0
+        self.installed = set(self.ids[::step_installed]) \
+            if step_installed else set()
+        step_update = max(1, round(1 / update_ratio)) if update_ratio else 0
+        self.need_update = set(sorted(self.installed)[::step_update]) \
+            if step_update else set()
+        self.assets_path = os.path.join(self.root, 'Maps')
+        self.mods_path = os.path.join(self.root, 'Mods')
+        self.previews_path = os.path.join(self.root, 'previews')
+
+    def path(self, steamid: int) -> str:
+        """Returns the directory of the item."""
+        parent = self.mods_path if is_mod(steamid) else self.assets_path
+        return os.path.join(parent, str(steamid))
+
+    def create(self, base_url: str, **settings) -> str:
+        """Writes the library and `settings.json`, returns the path of the
+        settings file. `settings` override the generated settings."""
+
+        for path in (self.assets_path, self.mods_path, self.previews_path,
+                     os.path.join(self.root, 'logs')):
+            os.makedirs(path, exist_ok=True)
+        preview = make_preview()
+        for steamid in sorted(self.installed):
+            path = self.path(steamid)
+            os.makedirs(path, exist_ok=True)
+            rnd = random.Random(steamid)
+            for i in range(self.files):
+                with open(os.path.join(path, f'file_{i}.crp'), 'wb') as file:
+                    file.write(rnd.randbytes(1024 + rnd.randrange(3072)))
+            with open(os.path.join(self.previews_path, f'{steamid}.png'),
+                      'wb') as file:
+                file.write(preview)
+        with open(os.path.join(self.previews_path, 'empty.jpg'), 'wb') as file:
+            file.write(preview)
+        return self.write_settings(base_url, **settings)
+
+    def write_settings(self, base_url: str, **settings) -> str:
+        """Writes `settings.json` pointing to the stand-in at `base_url`."""
+
+        data = {
+            'app_path': self.root,
+            'appid': 255710,
+            'asset_url': f'{base_url}/sharedfiles/filedetails/',
+            'authmechanism': 'DEFAULT',
+            'authsource': 'admin',
+            'common_path': self.root,
+            'database_name': 'benchmark',
+            'longtimeout': 60.0,
+            'per_page': 20,
+            'previews_path': 'previews',
+            'steam_api_url':
+                f'{base_url}/ISteamRemoteStorage/GetPublishedFileDetails/v1',
+            'timeout': 15.0,
+            'user_favs_url': f'{base_url}/id/synthetic/myworkshopfiles',
+            'user_url_id': f'{base_url}/id/',
+            'user_url_profiles': f'{base_url}/profiles/',
+            'storage': 'sqlite',
+            'sqlite_path': os.path.join(self.root, 'swautomatic.sqlite3'),
+            'log_level': 'WARNING',
+            'log_file': os.path.join(self.root, 'logs', 'swautomatic.log'),
+            'mirrors': [f'{base_url}/mirror/'],
+            # Every run requests Steam and computes values again, so
+            # timings do not measure hits of caches.
+            'steam_cache_ttl': 0,
+            'cache_ttl': 0,
+        }
+        data.update(settings)
+        path = os.path.join(self.root, 'settings.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=4)
+        return path
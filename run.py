@@ -1,5 +1,13 @@
-from app import app
+import os
+
+from app import app, start_watcher
+
+DEBUG = True
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # The reloader serves the app from a child process (it sets
+    # `WERKZEUG_RUN_MAIN`), the parent process only restarts it.
+    if not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_watcher()
+    app.run(debug=DEBUG)
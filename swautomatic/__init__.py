@@ -14,6 +14,14 @@ Classes
 - :class:`SWATag`: Simple class storing the ID and name of a tag.
 - :class:`SWAAuthor`: Represents the author of a Steam Workshop asset or mod.
 - :class:`SWAPreview`: Represents a preview image for a Steam Workshop item.
+- :class:`SWAMetrics`: Timers and counters of operations, the instance used
+  by the package is `metrics`.
+- :class:`SWAWatcher`: Keeps the state of installed assets in the database
+  current by watching their directories.
+- :class:`SWACatalog`: Filters, sorts and counts assets in memory, the
+  instance used by the package is `catalog`.
+- :class:`SWASearchIndex`: Finds assets by the name, the instance used by
+  the package is `search_index`.
 
 Usage
 -----
@@ -44,11 +52,15 @@ is_installed = asset.installed()
 
 from .asset import SWAAsset
 from .author import SWAAuthor
+from .catalog import SWACatalog, catalog
+from .metrics import SWAMetrics, metrics
 from .object import SWAObject
 from .preview import SWAPreview
 from .results import CommonResult, StatisticsResult
+from .search import SWASearchIndex, search_index
 from .settings import ASSET, DFLT_DATE, MOD, SWASettings
 from .tag import SWATag
+from .watcher import SWAWatcher
 from .utils import (get_directory_size,
                     get_local_time,
                     get_size_format,
@@ -63,6 +75,8 @@ __all__ = [
     'SWAObject',
     'SWAAsset',
     'SWAAuthor',
+    'SWAMetrics',
+    'metrics',
     'SWAPreview',
     'CommonResult',
     'StatisticsResult',
@@ -71,6 +85,11 @@ __all__ = [
     'MOD',
     'SWASettings',
     'SWATag',
+    'SWAWatcher',
+    'SWACatalog',
+    'catalog',
+    'SWASearchIndex',
+    'search_index',
     'get_directory_size',
     'get_size_format',
     'get_local_time',
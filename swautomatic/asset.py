@@ -5,20 +5,30 @@ Module for class `SWAAsset` and it`s interface - ISWAAssets.
 """
 
 import os
-from typing import Optional
-from zipfile import ZipFile
-
-import requests as rq
-from bs4 import BeautifulSoup as bs
-from pymongo import UpdateOne
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Optional
+from zipfile import BadZipFile
 
 from .author import SWAAuthor
-from .connection import _assets_coll, _logger, _settings
+from .cache import archive_cache
+from .catalog import catalog
+from .connection import _logger, _settings, _storage
+from .dedupe import (HASH_WORKERS, dedupe_install, dedupe_library,
+                     forget_directories)
+from .extract import (extract_archive, staging_directory, swap_directory,
+                      verify_manifest)
+from .metrics import metrics
 from .preview import SWAPreview
-from .results import CommonResult, DeleteResult
-from .settings import ASSET, DFLT_DATE, MOD, BASE_LINKS, FILETYPES
-from .tag import SWATag
-from .utils import (check_datetime, delete_directory, get_directory_size,
+from .progress import progress
+from .results import (AuditResult, CommonResult, DedupeResult, DeleteResult,
+                      DownloadResult, SearchResult)
+from .search import search_index
+from .settings import ASSET, DFLT_DATE, MOD, FILETYPES
+from .tag import SWATag, ensure_tags
+from .trash import move_to_trash
+from .utils import (check_datetime, get_directory_size,
                     get_info, get_local_time, get_size_format, info_steam,
                     steam_api_data)
 
@@ -27,6 +37,57 @@ __all__ = [
     'ISWAAssets'
 ]
 
+AUDIT_WORKERS = 16
+'The number of threads checking directories in ISWAAssets.`audit()`.'
+CHUNK_SIZE = 256 * 1024
+'The size of chunks of downloaded archives.'
+DOWNLOAD_WORKERS = 4
+'The number of assets downloaded at a time by ISWAAssets.`download_batch()`.'
+BATCH_ACTIONS = ('download', 'update', 'refresh', 'delete')
+'Actions of ISWAAssets.`batch()`.'
+
+
+def _filter_args(kwargs: dict) -> dict:
+    """Returns the filter parameters of ISWAAssets.`get_assets()` which
+    have correct types, other parameters are ignored."""
+
+    args = {}
+    if isinstance(kwargs.get('steam_ids'), (list, set)):
+        args['steam_ids'] = list(kwargs['steam_ids'])
+    if isinstance(kwargs.get('tag'), str):
+        args['tag'] = kwargs['tag']
+    for name in ('tags', 'any_tags', 'exclude_tags'):
+        if isinstance(kwargs.get(name), (list, set, tuple)) and kwargs[name]:
+            args[name] = [str(tag) for tag in kwargs[name]]
+    for name in ('need_update', 'is_installed'):
+        if isinstance(kwargs.get(name), bool):
+            args[name] = kwargs[name]
+    return args
+
+
+def _storage_filter(args: dict, other_fltr: Optional[dict] = None) -> dict:
+    """Translates the parameters from `_filter_args()` to a filter of the
+    storage."""
+
+    fltr: dict = {}
+    if 'steam_ids' in args:
+        fltr['steamid'] = {'$in': args['steam_ids']}
+    every = ([args['tag']] if 'tag' in args else []) + args.get('tags', [])
+    if len(every) == 1 and set(args) & {'any_tags', 'exclude_tags'} == set():
+        fltr['tags'] = every[0]
+    else:
+        operators = {'$all': every, '$in': args.get('any_tags'),
+                     '$nin': args.get('exclude_tags')}
+        operators = {key: value for key, value in operators.items() if value}
+        if operators:
+            fltr['tags'] = operators
+    for name in ('need_update', 'is_installed'):
+        if name in args:
+            fltr[name] = args[name]
+    if isinstance(other_fltr, dict):
+        fltr.update(other_fltr)
+    return fltr
+
 
 # region with trying to format the data
 # database_to_asset = {
@@ -166,6 +227,25 @@ __all__ = [
 # endregion
 
 
+def _stored_size(record: dict) -> Optional[int]:
+    """Returns the size of installed files from the record or `None` if the
+    record has neither the manifest nor the size."""
+
+    if record.get('manifest'):
+        return sum(entry.get('size', 0)
+                   for entry in record['manifest'].values())
+    return record.get('size')
+
+
+def _time_local(path: str, stored: Any) -> datetime:
+    """Returns the time of the installed version in `path`: the latest time
+    of modification of its files or the time of the install stored by
+    SWAAsset.`download()` if it is later (a delta install may write no
+    file)."""
+
+    return max(get_local_time(path), check_datetime(stored))
+
+
 class SWAAsset(object):
     """
     swautomatic > asset > `SWAAsset`
@@ -187,6 +267,8 @@ class SWAAsset(object):
     -   `download()`: desc.
     -   `installed()`: desc.
     -   `get_files()`: desc.
+    -   `get_size()`: the size of installed files.
+    -   `check_files()`: checks installed files with the manifest.
 
     Example:
     --------
@@ -241,6 +323,14 @@ class SWAAsset(object):
         self.time_created = check_datetime(info.pop('time_created', None))
         self.time_updated = check_datetime(info.pop('time_updated', None))
         author_data = info.pop('author', {})
+        # Set by check_updates() and audit().
+        flagged = bool(info.pop('need_update', False))
+        # Written by the watcher (see ~watcher.`SWAWatcher`).
+        stored_installed = info.pop('is_installed', None)
+        stored_time_local = info.pop('time_local', None)
+        self.size: Optional[int] = info.pop('size', None)
+        # Written by download(), it is never sent back by send_to_db().
+        self.manifest: dict = info.pop('manifest', None) or {}
         if info:
             _logger.info('Unexpected keys %s', str(info.keys()))
         self.author = SWAAuthor(**author_data)
@@ -249,10 +339,15 @@ class SWAAsset(object):
             tag.tag == 'Mod' for tag in self.tags) else ASSET
 
         self.path = self.__get_path()
-        self.is_installed = os.path.exists(self.path)
-
-        self.time_local = get_local_time(self.path)
-        self.need_update = self.__need_update()
+        if _settings.watch_files and stored_installed is not None:
+            self.is_installed = bool(stored_installed)
+            self.time_local = check_datetime(stored_time_local)
+        else:
+            self.is_installed = os.path.exists(self.path)
+            self.time_local = _time_local(self.path, stored_time_local) \
+                if self.is_installed else get_local_time(self.path)
+        self.need_update = self.__need_update() or (self.is_installed and
+                                                    flagged)
 
     def __need_update(self) -> bool:
         """Checks if the asset needs update."""
@@ -289,7 +384,7 @@ class SWAAsset(object):
                 result.update(value.to_dict())
             elif key == 'tags' and value is not None:
                 result.update({'tags': [tag.tag for tag in value]})
-            elif key == 'swa_object':
+            elif key in ('swa_object', 'manifest', 'size'):
                 pass
             else:
                 result.update({key: value})
@@ -308,11 +403,9 @@ class SWAAsset(object):
         """
 
         data = self.to_dict()
-        count = _assets_coll.update_one(filter={'steamid': data['steamid']},
-                                        update={'$set': data},
-                                        upsert=True,
-                                        session=session,
-                                        ).modified_count
+        ensure_tags(data.get('tags') or ())
+        with metrics.time('db_write'):
+            count = _storage.upsert_asset(data, session=session)
 
         return CommonResult(status='Done' if count != 0 else 'Error',
                             status_bool=count != 0,
@@ -346,7 +439,10 @@ class SWAAsset(object):
 
         return result
 
-    def download(self) -> bool:
+    @metrics.timed('asset_download')
+    @progress.tracked('download', label=lambda asset, *_, **__: asset.steamid)
+    def download(self, time_updated: Optional[datetime] = None,
+                 bulk: Optional[dict[int, dict]] = None) -> bool:
         """
         swautomatic > asset > SWAAsset.`download()`
         -------------------------------------------
@@ -358,57 +454,117 @@ class SWAAsset(object):
         `True`. It returns a boolean indicating whether the download and
         extraction were successful.
 
+        The archive is extracted to a staging directory which is swapped
+        with the installed version at the end (see
+        ~extract.`swap_directory()`), so a failed install leaves the previous
+        version intact. If the installed asset has a manifest (see
+        ~extract.`extract_archive()`), only changed files are written,
+        unchanged files are hardlinked from the installed version.
+
+        Archives are taken from the cache (see ~cache.`SWAArchiveCache`) if
+        the cache has the current version, downloaded archives are added to
+        it. If `time_updated` is given, that cached version is installed
+        (e.g. to roll back an update), mirrors are not used.
+
+        If `bulk` is given, the changed fields of the record are added to it
+        instead of being written, so a batch of downloads is written at once
+        (see ISWAAssets.`download_batch()`).
+
         Return
         ------
         A boolean status.
         """
 
-        if (self.is_installed and not self.need_update):
+        if (self.is_installed and not self.need_update and
+                time_updated is None):
             return True
 
-        status = False
-        path = f'{self.path}.zip'
-
-        for base_link in BASE_LINKS:
-            url = f'{base_link}{self.steamid}.zip'
-            url_headers = rq.head(url,
-                                  timeout=_settings.timeout
-                                  ).headers
-            content_type = url_headers.get('Content-Type')
-            content_length = int(url_headers.get('Content-Length', 0))
-            if (content_type and content_type.split(' ')[0] in FILETYPES and
-                content_length >= 10000):
-                with rq.get(url, stream=True,
-                            timeout=_settings.longtimeout
-                            ) as req:
-                    with open(path, 'wb') as file:
-                        file.write(req.content)
-                status = True
-                break
+        import requests as rq
 
+        start = time.perf_counter()
+        status = False
+        staging = staging_directory(self.steamid)
+        path = os.path.join(staging, 'archive.zip')
+        version = time_updated or self.time_updated
         try:
-            with ZipFile(path, 'r') as file:
+            cached = archive_cache.get(self.steamid, version, path)
+            status = cached
+            mirrors = [] if cached or time_updated else _settings.mirrors
+            for base_link in mirrors:
+                url = f'{base_link}{self.steamid}.zip'
+                with metrics.time('mirror_head'):
+                    url_headers = rq.head(url,
+                                          timeout=_settings.timeout
+                                          ).headers
+                content_type = url_headers.get('Content-Type')
+                content_length = int(url_headers.get('Content-Length', 0))
+                if (content_type and content_type.split(' ')[0] in FILETYPES and
+                    content_length >= 10000):
+                    with metrics.time('mirror_get'), rq.get(
+                            url, stream=True, timeout=_settings.longtimeout
+                            ) as req, open(path, 'wb') as file:
+                        for chunk in req.iter_content(CHUNK_SIZE):
+                            file.write(chunk)
+                            metrics.inc('download_bytes', len(chunk))
+                            progress.add_bytes(len(chunk))
+                    status = True
+                    break
+
+            try:
                 if self.type == MOD:
                     extract_path = _settings.mods_path
                 else:
                     extract_path = _settings.assets_path
-                file.extractall(extract_path)
+                # The archive is extracted to the staging directory,
+                # unchanged files of the installed version are linked there.
+                # The game never sees a half-written asset.
+                manifest = self.manifest if self.is_installed else None
+                files_path = os.path.join(staging, 'files')
+                with metrics.time('extract'):
+                    extracted = extract_archive(path, files_path,
+                                                manifest=manifest,
+                                                source=extract_path)
+                if _settings.dedupe:
+                    with metrics.time('dedupe'):
+                        dedupe_install(files_path, extracted.manifest,
+                                       extract_path)
+                with metrics.time('swap'):
+                    for entry in os.scandir(files_path):
+                        swap_directory(entry.path,
+                                       os.path.join(extract_path, entry.name))
+
+                if not cached:
+                    archive_cache.put(self.steamid, version, path)
 
-            os.remove(path)
-            status = True
-            _assets_coll.update_one(
-                {'steamid': self.steamid},
-                {'$set': {
+                status = True
+                self.manifest = extracted.manifest
+                record = {
                     'is_installed': True,
-                    'time_local': get_local_time(extract_path),
-                    'need_update': False
-                }}
-            )
-            _logger.info('Asset with ID %s was installed', self.steamid)
-        except OSError:
-            status = False
-            _logger.critical(
-                'Asset with ID %s cannot be installed', self.steamid)
+                    # Unchanged files keep their times, the record keeps
+                    # the time of the install (see `_time_local()`).
+                    'time_local': datetime.now(),
+                    'need_update': version < self.time_updated,
+                    'manifest': extracted.manifest,
+                }
+                if bulk is None:
+                    _storage.update_asset(self.steamid, record)
+                else:
+                    bulk[self.steamid] = record
+                _logger.info('Asset with ID %s was installed (%s files '
+                             'written, %s unchanged, %s deleted)', self.steamid,
+                             extracted.files, extracted.unchanged,
+                             extracted.deleted,
+                             extra={'asset_id': self.steamid,
+                                    'bytes': extracted.size,
+                                    'duration': round(
+                                        time.perf_counter() - start, 3)})
+            except (OSError, BadZipFile) as error:
+                status = False
+                _logger.critical(
+                    'Asset with ID %s cannot be installed: %s', self.steamid,
+                    error, extra={'asset_id': self.steamid})
+        finally:
+            move_to_trash(staging)
 
         return status
 
@@ -416,23 +572,67 @@ class SWAAsset(object):
         """
         swautomatic > asset > SWAAsset.`get_files()`
         --------------------------------------------
-        Searches the files of the asset.
+        Lists the files of the asset. The manifest written by `download()`
+        is used, the directory is walked only for assets installed without
+        it.
 
         Return
         ------
-        A dictionary `{file name: file size}`.
+        A dictionary `{file path: file size}`, paths are relative to the
+        asset's directory.
         """
 
         data = {}
-        if os.path.exists(self.path):
-            files = os.listdir(self.path)
-            for file in files:
-                full_path = os.path.join(self.path, file)
-                data.update({file: os.stat(full_path).st_size})
-        else:
+        if self.manifest:
+            prefix = f'{self.steamid}/'
+            for member, entry in self.manifest.items():
+                name = member[len(prefix):] if member.startswith(prefix) \
+                    else member
+                data.update({name: entry.get('size', 0)})
+        elif os.path.exists(self.path):
+            for directory, _, files in os.walk(self.path):
+                for file in files:
+                    full_path = os.path.join(directory, file)
+                    name = os.path.relpath(full_path, self.path)
+                    data.update({name.replace(os.sep, '/'):
+                                 os.stat(full_path).st_size})
+        if not data:
             data.update({'No files': 0})
         return data
 
+    def get_size(self) -> int:
+        """
+        swautomatic > asset > SWAAsset.`get_size()`
+        -------------------------------------------
+        Returns the size of installed files in bytes, from the manifest or
+        from the size written by the watcher if the asset has them.
+        """
+
+        size = _stored_size({'manifest': self.manifest, 'size': self.size})
+        if size is not None:
+            return size
+        if self.is_installed:
+            return get_directory_size(self.path)
+        return 0
+
+    def check_files(self, deep: bool = False) -> dict[str, str]:
+        """
+        swautomatic > asset > SWAAsset.`check_files()`
+        ----------------------------------------------
+        Compares installed files with the manifest
+        (see ~extract.`verify_manifest()`). Assets without a manifest are
+        not checked.
+
+        Return
+        ------
+        A dictionary `{member path: problem}`, empty if files are intact.
+        """
+
+        if not self.manifest:
+            return {}
+        return verify_manifest(os.path.dirname(self.path), self.manifest,
+                               deep)
+
 
 class ISWAAssets:
     """
@@ -441,7 +641,7 @@ class ISWAAssets:
     Description.
     """
     def __init__(self) -> None:
-        self.coll = _assets_coll
+        self.storage = _storage
 
     def get_asset(self, steam_id: int | str) -> SWAAsset:
         """
@@ -479,77 +679,279 @@ class ISWAAssets:
         ----------
         -   `steam_ids` (optional, default `None`): a list of assets steam ids.
         -   `tag` (optional, default `None`): desc.
+        -   `tags` (optional, default `None`): assets must have every tag.
+        -   `any_tags` (optional, default `None`): assets must have at
+            least one of the tags.
+        -   `exclude_tags` (optional, default `None`): assets must have none
+            of the tags.
         -   `need_update` (optional, default `None`): desc.
         -   `is_installed` (optional, default `None`): desc.
         -   `other_fltr` (optional, default `None`): a dict used as a filter
-            for Mongo request.
+            for the storage (see ~storage.`SWAStorage`).
         -   `skip` (optional, default `0`): a number of records to skip.
         -   `limit` (optional, default `0`): a number of records to show.
+        -   `sort` (optional, default `None`): a field to sort by.
+        -   `reverse` (optional, default `False`): sort in descending order.
+
+        If the setting `catalog` is `True` and `other_fltr` is not given,
+        the page is selected by the in-memory catalog (see
+        ~catalog.`SWACatalog`), only records of the page are read.
         
         Return
         ------
         A list of SWAAsset objects.
         """
-        fltr = {}
-        steam_ids = kwargs.get('steam_ids', None)
-        tag = kwargs.get('tag', None)
-        need_update = kwargs.get('need_update', None)
-        is_installed = kwargs.get('is_installed', None)
+        args = _filter_args(kwargs)
         other_fltr = kwargs.get('other_fltr', None)
         skip = kwargs.get('skip', 0)
         limit = kwargs.get('limit', 0)
-
-        if isinstance(steam_ids, (list, set)):
-            fltr.update({'steamid': {'$in': steam_ids}})
-        if isinstance(tag, str):
-            fltr.update({'tags': tag})
-        if isinstance(need_update, bool):
-            fltr.update({'need_update': need_update})
-        if isinstance(is_installed, bool):
-            fltr.update({'is_installed': is_installed})
-        if isinstance(other_fltr, dict):
-            fltr.update(other_fltr)
-
-        data = self.coll.find(filter=fltr,
-                              skip=skip,
-                              limit=limit,
-                              )
+        sort = kwargs.get('sort', None)
+        reverse = bool(kwargs.get('reverse', False))
+
+        if _settings.catalog and other_fltr is None:
+            _, page = catalog.query(sort=sort, reverse=reverse, skip=skip,
+                                    limit=limit, **args)
+            if not page:
+                return []
+            with metrics.time('db_find'):
+                data = {record['steamid']: record for record in
+                        self.storage.find_assets({'steamid': {'$in': page}})}
+            return [SWAAsset(**data[steamid]) for steamid in page
+                    if steamid in data]
+
+        fltr = _storage_filter(args, other_fltr)
+        with metrics.time('db_find'):
+            data = list(self.storage.find_assets(fltr, skip=skip, limit=limit,
+                                                 sort=sort, reverse=reverse))
         return [SWAAsset(**info) for info in data]
 
-    def check_updates(self):
+    def search(self, query: str, limit: int = 20,
+               after: Optional[str] = None) -> SearchResult:
+        """
+        swautomatic > asset > ISWAAssets.`search()`
+        -------------------------------------------
+        Finds assets by words of the name with the in-memory index (see
+        ~search.`SWASearchIndex`). Results are ranked, the best first.
+
+        Parameters
+        ----------
+        -   `query` (str): words to find.
+        -   `limit` (int): a number of assets on the page.
+        -   `after` (str): the cursor of the page, `SearchResult.next` of
+            the previous page.
+
+        Return
+        ------
+        ~results.`SearchResult`.
+        """
+
+        count, page, next_cursor = search_index.search(query, limit, after)
+        data = {}
+        if page:
+            with metrics.time('db_find'):
+                data = {record['steamid']: record for record in
+                        self.storage.find_assets({'steamid': {'$in': page}})}
+        assets = [SWAAsset(**data[steamid]) for steamid in page
+                  if steamid in data]
+        return SearchResult(message=f'{count} assets were found.',
+                            count=count, assets=assets, next=next_cursor)
+
+    @metrics.timed('check_updates')
+    def check_updates(self, asset_ids: Optional[list[int] | set[int]] = None):
         """
         swautomatic > asset > ISWAAssets.`check_updates()`
         --------------------------------------------------
         Checks for updates of the assets and mods, and updates the database
-        accordingly. It uses the `steam_api_data()` method.
+        accordingly. It uses the `steam_api_data()` method. If `asset_ids`
+        is given only these assets are checked.
         """
 
         count = 0
-        ids = self.list_assets_db()
+        fltr = None
+        if asset_ids:
+            ids = {int(asset_id) for asset_id in asset_ids}
+            fltr = {'steamid': {'$in': list(ids)}}
+        else:
+            ids = self.list_assets_db()
         data_steam = steam_api_data(ids)
 
-        projection = {'_id': False, 'steamid': True,
-                      'time_local': True, 'is_installed': True}
-        asset_times = {asset['steamid']: (asset['time_local'], asset['is_installed'])
-                       for asset in self.coll.find({}, projection=projection)}
+        fields = ['steamid', 'time_local', 'is_installed']
+        with metrics.time('db_find'):
+            asset_times = {asset['steamid']: (asset['time_local'], asset['is_installed'])
+                           for asset in self.storage.find_assets(
+                               fltr, fields=fields)}
 
-        bulk = []
+        bulk = {}
         for key, value in data_steam.items():
             time_updated_local, is_installed = asset_times.get(int(key), (DFLT_DATE, False))
             if time_updated_local is None:
                 time_updated_local = DFLT_DATE
             time_updated_steam = value.get('time_updated', DFLT_DATE)
             need_update = time_updated_local < time_updated_steam and is_installed
-            bulk.append(UpdateOne({'steamid': int(key)},
-                                    {'$set': {
-                                        'time_updated': time_updated_steam,
-                                        'need_update': need_update
-                                    }}))
+            bulk.update({int(key): {
+                'time_updated': time_updated_steam,
+                'need_update': need_update
+            }})
         if bulk:
-            count = self.coll.bulk_write(bulk).modified_count
+            with metrics.time('db_write'), \
+                    progress.task('db_write', total=len(bulk)) as task:
+                count = self.storage.bulk_update_assets(bulk)
+                task.advance(len(bulk))
             _logger.info('Updated %s assets', count)
         return CommonResult(message=f'{count} updates were found.')
 
+    @metrics.timed('audit')
+    def audit(self, deep: bool = False, fix: bool = True,
+              workers: int = AUDIT_WORKERS) -> AuditResult:
+        """
+        swautomatic > asset > ISWAAssets.`audit()`
+        ------------------------------------------
+        Compares the directories of assets and mods with the records in the
+        database without deleting anything. Directories are checked by
+        `workers` threads. Files of assets with a manifest are checked by
+        ~extract.`verify_manifest()`, CRC-32 is computed if `deep` is `True`.
+
+        A changed time of modification alone (e.g. after a restore or a
+        copy) is not damage: such files are reported as `modified`. If
+        `deep` or `fix` is `True`, their CRC-32 is computed before anything
+        is written and only files with a different size or CRC-32 are
+        corrupted. Otherwise their contents are not verified.
+
+        If `fix` is `True`, the flags `is_installed`, `need_update` and
+        `time_local` are corrected in one bulk write. Corrupted assets are
+        marked as needing an update and CRC-32 of their damaged files is
+        cleared in the manifest, so the next `download()` rewrites them.
+        Modified files with the same CRC-32 get their new time of
+        modification in the manifest.
+
+        Return
+        ------
+        ~results.`AuditResult` with lists of Steam IDs:
+        -   `missing`: installed in the database, but there is no directory;
+        -   `orphaned`: directories without records in the database;
+        -   `corrupted`: `{steamid: {member path: problem}}`;
+        -   `modified`: `{steamid: [member paths]}` of files with a changed
+            time of modification, but the same size (and the same CRC-32,
+            unless both `deep` and `fix` are `False`);
+        -   `stale`: installed assets older than their version in Steam.
+        """
+
+        fields = ['steamid', 'tags', 'is_installed', 'need_update',
+                  'time_updated', 'time_local', 'manifest']
+        with metrics.time('db_find'):
+            records = list(self.storage.find_assets(fields=fields))
+
+        def scan(directory: str) -> set[int]:
+            if not os.path.isdir(directory):
+                return set()
+            return {int(entry.name) for entry in os.scandir(directory)
+                    if entry.is_dir() and entry.name.isdigit()}
+
+        def check(record: dict) -> tuple[dict, bool, datetime, dict, list,
+                                         dict]:
+            is_mod = 'Mod' in (record.get('tags') or [])
+            root = _settings.mods_path if is_mod else _settings.assets_path
+            path = os.path.join(root, str(record['steamid']))
+            exists = os.path.isdir(path)
+            time_local = _time_local(path, record.get('time_local')) \
+                if exists else get_local_time(path)
+            problems, touched, refreshed = {}, [], {}
+            if exists and record.get('manifest'):
+                problems = verify_manifest(root, record['manifest'])
+                touched = sorted(member for member, problem in problems.items()
+                                 if problem == 'modified')
+                for member in touched:
+                    del problems[member]
+                if touched and (deep or fix):
+                    # Nothing is marked as damaged by the time alone.
+                    problems.update(verify_manifest(
+                        root, {member: record['manifest'][member]
+                               for member in touched}, deep=True))
+                    touched = [member for member in touched
+                               if member not in problems]
+                if touched and fix:
+                    # Intact files get the new time, so they are not
+                    # checked again by the next audit.
+                    for member in touched:
+                        try:
+                            refreshed[member] = os.stat(os.path.join(
+                                root, *member.split('/'))).st_mtime
+                        except OSError:
+                            pass
+            return record, exists, time_local, problems, touched, refreshed
+
+        with ThreadPoolExecutor(max_workers=max(1, workers),
+                                thread_name_prefix='audit') as executor:
+            local = executor.map(scan, [_settings.assets_path,
+                                        _settings.mods_path])
+            checked = list(executor.map(check, records))
+            ids_local = set().union(*local)
+
+        missing, stale = [], []
+        corrupted: dict[int, dict] = {}
+        modified: dict[int, list] = {}
+        updates: dict[int, dict] = {}
+        for record, exists, time_local, problems, touched, refreshed \
+                in checked:
+            steamid = record['steamid']
+            if touched:
+                modified[steamid] = touched
+            if record.get('is_installed') and not exists:
+                missing.append(steamid)
+            time_updated = check_datetime(record.get('time_updated'))
+            need_update = exists and time_local < time_updated
+            if need_update:
+                stale.append(steamid)
+            fields = {}
+            if problems:
+                corrupted[steamid] = problems
+                need_update = True
+            if problems or refreshed:
+                # An entry without CRC never matches an archive member.
+                manifest = {member: dict(entry, crc=None)
+                            if member in problems else
+                            dict(entry, mtime=refreshed[member])
+                            if member in refreshed else entry
+                            for member, entry in record['manifest'].items()}
+                if manifest != record['manifest']:
+                    fields['manifest'] = manifest
+            if bool(record.get('is_installed')) != exists:
+                fields['is_installed'] = exists
+            if bool(record.get('need_update')) != need_update:
+                fields['need_update'] = need_update
+            if exists and check_datetime(record.get('time_local')) != time_local:
+                fields['time_local'] = time_local
+            if fields:
+                updates[steamid] = fields
+        orphaned = sorted(ids_local - {record['steamid'] for record in records})
+
+        fixed = 0
+        if fix and updates:
+            with metrics.time('db_write'):
+                fixed = self.storage.bulk_update_assets(updates)
+        message = (f'Checked {len(records)} assets: {len(missing)} missing, '
+                   f'{len(orphaned)} orphaned, {len(corrupted)} corrupted, '
+                   f'{len(modified)} modified, {len(stale)} stale, '
+                   f'{fixed} records fixed.')
+        _logger.info(message)
+        return AuditResult(message=message, checked=len(records),
+                           missing=missing, orphaned=orphaned,
+                           corrupted=corrupted, modified=modified,
+                           stale=stale,
+                           fixes=updates, fixed=fixed)
+
+    @metrics.timed('dedupe')
+    def dedupe(self, workers: int = HASH_WORKERS) -> DedupeResult:
+        """
+        swautomatic > asset > ISWAAssets.`dedupe()`
+        -------------------------------------------
+        Replaces identical files of installed assets with hardlinks to one
+        copy, see ~dedupe.`dedupe_library()`. Files are hashed by `workers`
+        threads.
+        """
+
+        return dedupe_library(workers=workers)
+
     def list_assets_db(self) -> set[int]:
         """
         swautomatic > asset > ISWAAssets.`list_assets_db()`
@@ -561,11 +963,10 @@ class ISWAAssets:
         A set of Steam IDs.
         """
 
-        data = self.coll.find({}, projection={'steamid': True})
-        if not data:
-            return set([0])
-        return set(int(asset['steamid']) for asset in data)
+        with metrics.time('db_find'):
+            return self.storage.list_steamids()
 
+    @metrics.timed('steam_favourites')
     def list_assets_remote(self) -> set[int]:
         """
         swautomatic > asset > ISWAAssets.`list_assets_remote()`
@@ -578,6 +979,9 @@ class ISWAAssets:
         A set of Steam IDs.
         """
 
+        import requests as rq
+        from bs4 import BeautifulSoup as bs
+
         i = 1
         msg = 'None'
         items = []
@@ -588,7 +992,8 @@ class ISWAAssets:
                   'p': 1,
                   'numperpage': 30}
 
-        with rq.Session() as session:
+        with rq.Session() as session, \
+                progress.task('steam_favourites') as task:
             while str(msg) == 'None':
                 params.update({'p': i})
                 try:
@@ -600,17 +1005,20 @@ class ISWAAssets:
                 except rq.exceptions.RequestException as error:
                     _logger.error(str(error))
                     return set()
+                progress.add_bytes(len(req.content))
                 soup = bs(req.content, 'html.parser')
                 msg = soup.find('div', 'inventory_msg_content')
                 divs = soup.find_all('div', 'workshopItem')
                 items.extend([int(
                     div.find('a').attrs['data-publishedfileid']
                 ) for div in divs])
+                task.advance(len(divs))
                 i += 1
 
         asset_ids = set(items)
         return asset_ids
 
+    @metrics.timed('fs_list_local')
     def list_assets_local(self) -> set[int]:
         """
         swautomatic > asset > ISWAAssets.`list_assets_local()`
@@ -636,6 +1044,7 @@ class ISWAAssets:
 
         return asset_ids.union(mod_ids)
 
+    @metrics.timed('delete_assets')
     def delete_assets(self, asset_ids: Optional[list[int]| set[int]] = None,
                       session = None):
         """
@@ -646,6 +1055,11 @@ class ISWAAssets:
         deleted assets. If `asset_ids` is None then all assets will be
         deleted.
 
+        Directories are moved to the trash and removed from the disk in the
+        background (see ~trash.`move_to_trash()`). Sizes are taken from the
+        records (the manifest or the size written by the watcher), only
+        directories of assets without them are measured.
+
         Return
         ------
         ~results.`DeleteResult`.
@@ -654,26 +1068,36 @@ class ISWAAssets:
         size = 0
         if not asset_ids:
             asset_ids = self.list_assets_local()
+        asset_ids = set(asset_ids)
+        fields = ['steamid', 'manifest', 'size']
+        with metrics.time('db_find'):
+            sizes = {record['steamid']: _stored_size(record)
+                     for record in self.storage.find_assets(
+                         {'steamid': {'$in': list(asset_ids)}}, fields=fields)}
         # Deleting records
-        count = self.coll.delete_many(
-            {'steamid': {'$in': list(asset_ids)}},
-            session=session
-        ).deleted_count
+        with metrics.time('db_write'):
+            count = self.storage.delete_assets(asset_ids, session=session)
         # Deleting files & previews
-        if count:
-            self.remove_previews(asset_ids)
-            for asset_id in asset_ids:
-                asset_path = os.path.join(_settings.assets_path, str(asset_id))
-                mod_path = os.path.join(_settings.mods_path, str(asset_id))
-                if os.path.exists(asset_path):
-                    size += get_directory_size(asset_path)
-                    delete_directory(asset_path)
-                    _logger.info('Asset %s removed. Path: %s', asset_id, asset_path)
-                elif os.path.exists(mod_path):
-                    delete_directory(mod_path)
-                    size += get_directory_size(mod_path)
-                    _logger.info('Asset %s removed. Path: %s', asset_id, asset_path)
-            _logger.info('Total size of deleted assets: %s', size)
+        self.remove_previews(asset_ids)
+        deleted = []
+        for asset_id in asset_ids:
+            for root in (_settings.assets_path, _settings.mods_path):
+                path = os.path.join(root, str(asset_id))
+                if not os.path.isdir(path):
+                    continue
+                asset_size = sizes.get(asset_id)
+                if asset_size is None:
+                    asset_size = get_directory_size(path)
+                if move_to_trash(path):
+                    size += asset_size
+                    deleted.append(path)
+                    _logger.debug('Asset %s removed. Path: %s', asset_id,
+                                  path, extra={'asset_id': asset_id})
+                break
+        # Deleted files cannot be the source of hardlinks of new installs.
+        forget_directories(deleted)
+        _logger.info('Total size of deleted assets: %s', size,
+                     extra={'bytes': size})
         result = DeleteResult(
             message=f'Deleted {count} assets, with total size {get_size_format(size)}',
             count=count,
@@ -681,6 +1105,7 @@ class ISWAAssets:
         _logger.info(result.message)
         return result
 
+    @metrics.timed('update_assets')
     def update_assets(self, asset_ids: Optional[list[int]| set[int]] = None,
                       session = None):
         """
@@ -704,19 +1129,25 @@ class ISWAAssets:
         updated_count = 0
         if asset_ids:
             data = info_steam(list(asset_ids))
-            for item in data.values():
-                asset = SWAAsset(**item)
-                asset.send_to_db(session=session)
-                _logger.info('Updated asset: %s', asset)
-
-                if not asset.preview.downloaded():
-                    _logger.info('Downloading preview for asset: %s', asset)
-                    asset.preview.download()
-                updated_count += 1
+            with progress.task('update_assets', total=len(data)) as task:
+                for item in data.values():
+                    asset = SWAAsset(**item)
+                    asset.send_to_db(session=session)
+                    _logger.debug('Updated asset: %s', asset.steamid,
+                                  extra={'asset_id': asset.steamid})
+
+                    if not asset.preview.downloaded():
+                        _logger.debug('Downloading preview for asset: %s',
+                                      asset.steamid,
+                                      extra={'asset_id': asset.steamid})
+                        asset.preview.download()
+                    updated_count += 1
+                    task.advance()
 
         _logger.info('Updated %s assets in the database', updated_count)
         return updated_count
 
+    @metrics.timed('insert_assets')
     def insert_assets(self,
                       asset_ids: Optional[list[int]| set[int]] = None,
                       session=None):
@@ -731,12 +1162,17 @@ class ISWAAssets:
         inserted_count = 0
         if asset_ids:
             new_data = info_steam(list(asset_ids))
-            inserted_count = len(self.coll.insert_many(
-                list(new_data.values()), session=session).inserted_ids)
-            for item in new_data.values():
-                item.pop('steamid')
-                asset = SWAAsset(**item)
-                asset.preview.download()
+            ensure_tags(tag for item in new_data.values()
+                        for tag in item.get('tags') or ())
+            with progress.task('insert_assets', total=len(new_data)) as task:
+                with metrics.time('db_write'):
+                    inserted_count = self.storage.insert_assets(
+                        list(new_data.values()), session=session)
+                for item in new_data.values():
+                    preview = SWAPreview(steam_id=item['steamid'],
+                                         preview_url=item['preview_url'])
+                    preview.download()
+                    task.advance()
         _logger.info('Inserted %s assets to database', inserted_count)
         return inserted_count
 
@@ -757,8 +1193,10 @@ class ISWAAssets:
                      for file in previews_dir if str(asset_id) in file]
             for file in files:
                 os.remove(file)
-            _logger.info('Deleted assets ID %s to database', asset_id)
+            _logger.debug('Deleted previews of asset %s', asset_id,
+                          extra={'asset_id': asset_id})
 
+    @metrics.timed('download_assets')
     def download_assets(self,
                         asset_ids: list[int] | set[int],
                         skip: int = 0,
@@ -781,19 +1219,156 @@ class ISWAAssets:
 
         errors = []
         assets = self.get_assets(steam_ids=asset_ids, skip=skip, limit=limit)
-        for asset in assets:
-            if not asset.preview.downloaded():
-                asset.preview.download()
-            if asset.need_update:
-                status = asset.download()
-                if status:
-                    _logger.info('Installed asset with ID %s', asset.steamid)
-                else:
-                    errors.append(asset.steamid)
-                    _logger.warning('Asset with ID %s cannot be intalled',
-                                    asset.steamid)
+        with progress.task('download_assets', total=len(assets)) as task:
+            for asset in assets:
+                if not asset.preview.downloaded():
+                    asset.preview.download()
+                if asset.need_update:
+                    status = asset.download()
+                    if status:
+                        _logger.debug('Installed asset with ID %s',
+                                      asset.steamid,
+                                      extra={'asset_id': asset.steamid})
+                    else:
+                        errors.append(asset.steamid)
+                        _logger.warning('Asset with ID %s cannot be intalled',
+                                        asset.steamid,
+                                        extra={'asset_id': asset.steamid})
+                task.advance()
         return errors
 
+    @metrics.timed('download_batch')
+    def download_batch(self, asset_ids: list[int] | set[int],
+                       workers: int = DOWNLOAD_WORKERS) -> DownloadResult:
+        """
+        swautomatic > asset > ISWAAssets.`download_batch()`
+        ---------------------------------------------------
+        Installs assets with `asset_ids` which are not installed or need
+        update, `workers` assets at a time, and downloads their missing
+        previews. Records are read by one query and written by one bulk
+        write.
+
+        Return
+        ------
+        ~results.`DownloadResult` with `count` (a number of installed
+        assets) and `errors` (a list of Steam IDs which were not installed).
+        """
+
+        assets = self.get_assets(steam_ids=list(asset_ids)) if asset_ids \
+            else []
+        bulk: dict[int, dict] = {}
+        errors = []
+        try:
+            with progress.task('download_batch',
+                               total=len(assets)) as batch:
+                def install(asset: SWAAsset) -> bool:
+                    # Tasks of the pool are parts of the batch. An error of
+                    # one asset (e.g. of its mirror) does not stop the
+                    # others.
+                    with progress.within(batch):
+                        try:
+                            if not asset.preview.downloaded():
+                                asset.preview.download()
+                            return asset.download(bulk=bulk)
+                        except Exception as error:  # pylint: disable=broad-except
+                            _logger.error(
+                                'Asset with ID %s cannot be installed: %s',
+                                asset.steamid, error,
+                                extra={'asset_id': asset.steamid})
+                            return False
+
+                with ThreadPoolExecutor(
+                        max_workers=max(1, workers),
+                        thread_name_prefix='download') as executor:
+                    for asset, status in zip(assets,
+                                             executor.map(install, assets)):
+                        if not status:
+                            errors.append(asset.steamid)
+                            _logger.warning(
+                                'Asset with ID %s cannot be intalled',
+                                asset.steamid,
+                                extra={'asset_id': asset.steamid})
+                        batch.advance()
+        finally:
+            # Assets already swapped into place are recorded even if the
+            # batch is interrupted.
+            if bulk:
+                with metrics.time('db_write'):
+                    self.storage.bulk_update_assets(bulk)
+        message = f'Installed {len(bulk)} assets, {len(errors)} errors.'
+        _logger.info(message)
+        return DownloadResult(status='Done' if not errors else 'Error',
+                              status_bool=not errors, message=message,
+                              count=len(bulk), errors=errors)
+
+    @metrics.timed('refresh_assets')
+    def refresh_assets(self, asset_ids: list[int] | set[int],
+                       workers: int = DOWNLOAD_WORKERS) -> CommonResult:
+        """
+        swautomatic > asset > ISWAAssets.`refresh_assets()`
+        ---------------------------------------------------
+        Reads data of assets with `asset_ids` from Steam by one request
+        (cached responses are not used) and writes it to the database by
+        one bulk write (like SWAAsset.`update_record()` for every asset).
+        Missing previews are downloaded by `workers` threads.
+        """
+
+        data = info_steam(list(asset_ids), fresh=True)
+        count = 0
+        if data:
+            ensure_tags(tag for item in data.values()
+                        for tag in item.get('tags') or ())
+            with metrics.time('db_write'), \
+                    progress.task('db_write', total=len(data)) as task:
+                count = self.storage.bulk_update_assets(data)
+                task.advance(len(data))
+            previews = [SWAPreview(steam_id=item['steamid'],
+                                   preview_url=item['preview_url'])
+                        for item in data.values()]
+            previews = [preview for preview in previews
+                        if preview.url and not preview.downloaded()]
+            with ThreadPoolExecutor(max_workers=max(1, workers),
+                                    thread_name_prefix='preview') as executor:
+                list(executor.map(SWAPreview.download, previews))
+        message = f'Refreshed {count} assets.'
+        _logger.info(message)
+        return CommonResult(message=message, count=count)
+
+    def batch(self, action: str,
+              asset_ids: list[int] | set[int]) -> CommonResult:
+        """
+        swautomatic > asset > ISWAAssets.`batch()`
+        ------------------------------------------
+        Runs `action` (one of `BATCH_ACTIONS`) for the selected assets:
+
+        -   `'download'`: installs assets, see `download_batch()`;
+        -   `'update'`: checks updates of assets and installs new versions;
+        -   `'refresh'`: reads data of assets from Steam, see
+            `refresh_assets()`;
+        -   `'delete'`: deletes assets, see `delete_assets()`.
+        """
+
+        if action not in BATCH_ACTIONS:
+            raise ValueError(f'Unknown batch action: {action}')
+        asset_ids = {int(asset_id) for asset_id in asset_ids}
+        # `delete_assets()` deletes every asset if no IDs are given.
+        if not asset_ids:
+            return CommonResult(status='Error', status_bool=False,
+                                message='No assets are selected.')
+        if action == 'download':
+            return self.download_batch(asset_ids)
+        if action == 'refresh':
+            return self.refresh_assets(asset_ids)
+        if action == 'delete':
+            return self.delete_assets(asset_ids)
+        self.check_updates(asset_ids)
+        with metrics.time('db_find'):
+            outdated = [record['steamid'] for record in
+                        self.storage.find_assets(
+                            {'steamid': {'$in': list(asset_ids)},
+                             'need_update': True}, fields=['steamid'])]
+        return self.download_batch(outdated)
+
     def count_assets(self, **kwargs) -> int:
         """
         swautomatic > asset > ISWAAssets.`count_assets()`
@@ -804,31 +1379,52 @@ class ISWAAssets:
         ----------
         -   `steam_ids` (optional, default `None`): a list of assets steam ids.
         -   `tag` (optional, default `None`): desc.
+        -   `tags`, `any_tags`, `exclude_tags` (optional, default `None`):
+            every, any and none of the tags, see `get_assets()`.
         -   `need_update` (optional, default `None`): desc.
         -   `is_installed` (optional, default `None`): desc.
         -   `other_fltr` (optional, default `None`): a dict used as a filter
-            for Mongo request.
+            for the storage (see ~storage.`SWAStorage`).
+
+        Assets are counted by the catalog if the setting `catalog` is `True`
+        and `other_fltr` is not given.
 
         Return
         ------
         -   `int`: Number of assets in the database.
         """
 
-        fltr = {}
-        steam_ids = kwargs.get('steam_ids', None)
-        tag = kwargs.get('tag', None)
-        need_update = kwargs.get('need_update', None)
-        is_installed = kwargs.get('is_installed', None)
+        args = _filter_args(kwargs)
         other_fltr = kwargs.get('other_fltr', None)
+        if _settings.catalog and other_fltr is None:
+            return catalog.count(**args)
+        with metrics.time('db_count'):
+            return self.storage.count_assets(_storage_filter(args, other_fltr))
+
+    def count_by_tag(self, **kwargs) -> dict[str, int]:
+        """
+        swautomatic > asset > ISWAAssets.`count_by_tag()`
+        -------------------------------------------------
+        Counts assets matching the filter (the parameters of
+        `count_assets()`) by tag, e.g. to show how many assets are left if a
+        tag is added to the filter. Tags without matching assets are
+        omitted.
+
+        The counts are intersections of bitsets of the catalog if the
+        setting `catalog` is `True`, otherwise every tag is counted by the
+        storage.
+        """
 
-        if isinstance(steam_ids, (list, set)):
-            fltr.update({'steamid': {'$in': steam_ids}})
-        if isinstance(tag, str):
-            fltr.update({'tags': tag})
-        if isinstance(need_update, bool):
-            fltr.update({'need_update': need_update})
-        if isinstance(is_installed, bool):
-            fltr.update({'is_installed': is_installed})
-        if isinstance(other_fltr, dict):
-            fltr.update(other_fltr)
-        return self.coll.count_documents(fltr)
+        args = _filter_args(kwargs)
+        other_fltr = kwargs.get('other_fltr', None)
+        if _settings.catalog and other_fltr is None:
+            return catalog.facets(**args)
+        counts = {}
+        with metrics.time('db_count'):
+            for tag in self.storage.list_tags():
+                fltr = _storage_filter(
+                    dict(args, tags=args.get('tags', []) + [tag]), other_fltr)
+                count = self.storage.count_assets(fltr)
+                if count:
+                    counts[tag] = count
+        return counts
@@ -3,12 +3,8 @@
 Module for class `SWAAuthor`.
 """
 
-import logging
-
-import requests as rq
-from bs4 import BeautifulSoup as bs
-
-from .connection import _settings
+from .connection import _logger, _settings
+from .metrics import metrics
 
 __all__ = [
     'SWAAuthor',
@@ -32,7 +28,7 @@ class SWAAuthor:
         if not steamid:
             steamid = int(kwargs.pop('steam_id64', 0))
         if not steamid:
-            logging.error('SteamID of the author was not received.')
+            _logger.error('SteamID of the author was not received.')
         else:
             self.steam_id64 = steamid
             data = kwargs or self.get_author_data()
@@ -78,14 +74,17 @@ class SWAAuthor:
         ------
         A dictionary with a data about the author.
         """
+        import requests as rq
+        from bs4 import BeautifulSoup as bs
+
         soup = None
         try:
-            with rq.get(
-                f'https://steamcommunity.com/profiles/{self.steam_id64}/?xml=1',
+            with metrics.time('author_fetch'), rq.get(
+                f'{_settings.user_url_profiles}{self.steam_id64}/?xml=1',
                     timeout=_settings.timeout) as req:
                 soup = bs(req.content, 'xml')
         except rq.RequestException as error:
-            logging.error(
+            _logger.error(
                 'An error occured for %s: %s',
                 self.steam_id64, str(error))
         data = {}
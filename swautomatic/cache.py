@@ -0,0 +1,158 @@
+"""
+swautomatic > `cache`
+=====================
+Module for class `SWAArchiveCache`, a local cache of downloaded archives.
+Archives are kept by Steam ID and `time_updated` of the asset, so
+reinstalling an asset (or installing its previous version) does not download
+it again. The size of the cache is limited by the setting
+`archive_cache_size`, the least recently used archives are evicted first.
+
+The time of modification of an archive is the time it was used last, so the
+state of the cache is kept by the filesystem only. The instance used by the
+package is `archive_cache`.
+"""
+
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+from .connection import _logger, _settings
+from .metrics import metrics
+
+__all__ = [
+    'SWAArchiveCache',
+    'archive_cache',
+]
+
+CACHE_NAME = '.swa_archives'
+_TIME_FORMAT = '%Y%m%d%H%M%S'
+
+
+def _copy(source: str, target: str) -> None:
+    """Hardlinks `source` as `target`, copies it if links are not
+    supported."""
+
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class SWAArchiveCache:
+    """
+    swautomatic > cache > `SWAArchiveCache`
+    ---------------------------------------
+    A size-capped LRU cache of archives in the directory `archive_cache_path`
+    (`<common_path>/.swa_archives` by default). It is disabled if the setting
+    `archive_cache_size` is `0`.
+
+    Methods
+    -------
+    -   `get()`: copies the cached archive to the given path.
+    -   `put()`: adds the archive to the cache and evicts old archives.
+    -   `evict()`: removes the least recently used archives over the limit.
+    -   `clear()`: removes every archive.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """`True` if the size of the cache is set."""
+        return self.max_size > 0
+
+    @property
+    def max_size(self) -> int:
+        """The limit of the cache in bytes."""
+        return int(_settings.archive_cache_size or 0)
+
+    @property
+    def path(self) -> str:
+        """The directory of the cache."""
+        return _settings.archive_cache_path or os.path.join(
+            _settings.common_path, CACHE_NAME)
+
+    def _file(self, steamid: int, time_updated: datetime) -> str:
+        return os.path.join(
+            self.path, f'{steamid}-{time_updated.strftime(_TIME_FORMAT)}.zip')
+
+    def get(self, steamid: int, time_updated: datetime, target: str) -> bool:
+        """
+        swautomatic > cache > SWAArchiveCache.`get()`
+        ---------------------------------------------
+        Copies (hardlinks) the archive of the asset version to `target`.
+        Returns `False` if it is not cached.
+        """
+
+        if not self.enabled:
+            return False
+        path = self._file(steamid, time_updated)
+        try:
+            _copy(path, target)
+            os.utime(path)
+        except FileNotFoundError:
+            metrics.inc('archive_cache_misses')
+            return False
+        metrics.inc('archive_cache_hits')
+        _logger.debug('Archive of asset %s is taken from the cache', steamid,
+                      extra={'asset_id': steamid})
+        return True
+
+    def put(self, steamid: int, time_updated: datetime, source: str) -> bool:
+        """
+        swautomatic > cache > SWAArchiveCache.`put()`
+        ---------------------------------------------
+        Adds the archive `source` of the asset version to the cache and
+        evicts the least recently used archives. Archives larger than the
+        limit are not cached.
+        """
+
+        if not self.enabled or os.path.getsize(source) > self.max_size:
+            return False
+        path = self._file(steamid, time_updated)
+        temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            _copy(source, temporary)
+            os.replace(temporary, path)
+        except OSError as error:
+            _logger.warning('Cannot cache the archive of asset %s: %s',
+                            steamid, error, extra={'asset_id': steamid})
+            return False
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Removes the least recently used archives until the cache fits the
+        limit. Returns a number of removed archives."""
+
+        removed = 0
+        with self.lock:
+            try:
+                entries = [(entry.stat().st_mtime, entry.stat().st_size,
+                            entry.path) for entry in os.scandir(self.path)
+                           if entry.name.endswith('.zip')]
+            except OSError:
+                return removed
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        metrics.inc('archive_cache_evictions', removed)
+        return removed
+
+    def clear(self) -> None:
+        """Removes every archive."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+archive_cache = SWAArchiveCache()
@@ -0,0 +1,410 @@
+"""
+swautomatic > `catalog`
+=======================
+Module for class `SWACatalog`, an in-process catalog of assets which answers
+filter, sort, count and page queries of the library without the database.
+
+The catalog keeps the fields used by queries in columns backed by
+`array.array` (one machine value per asset), tags are stored as integer
+codes. It is loaded from the storage once and refreshed incrementally: the
+storage calls the catalog after every write (see
+~storage.SWAStorage.`add_listener()`) and changed records are read again on
+the next query. Writes of other processes are found by the counter of writes
+of the storage (see ~storage.`SWARevision`), then the catalog is loaded
+again. Deleted assets are marked in the column `alive` and removed
+when the columns are compacted.
+
+Filters are computed with bitsets: every tag and every flag has a Python
+integer whose bit `i` is set if the asset in row `i` has the tag (the flag),
+so a boolean expression of tags is a few bitwise operations and the counts
+of tags among matching assets (facets) are `int.bit_count()` of their
+intersections.
+
+The catalog is used by ISWAAssets.`get_assets()` and
+ISWAAssets.`count_assets()` if the setting `catalog` is `True`. The instance
+used by the package is `catalog`.
+"""
+
+import threading
+from array import array
+from datetime import datetime
+from itertools import compress
+from typing import Iterable, Optional
+
+from .connection import _logger, _storage
+from .metrics import metrics
+from .storage import ASSETS, SWARevision
+
+__all__ = [
+    'SWACatalog',
+    'catalog',
+    'SORT_FIELDS',
+]
+
+_EPOCH = datetime(1970, 1, 1)
+_INT_COLUMNS = ('steamid', 'file_size', 'size')
+_TIME_COLUMNS = ('time_created', 'time_updated', 'time_local')
+_FLAG_COLUMNS = ('is_installed', 'need_update')
+FIELDS = ('steamid', 'file_size', 'size', 'time_created', 'time_updated',
+          'time_local', 'is_installed', 'need_update', 'tags')
+'Fields of records read by the catalog.'
+SORT_FIELDS = _INT_COLUMNS + _TIME_COLUMNS
+'Fields the catalog can sort by.'
+COMPACT_RATIO = 0.25
+'Columns are compacted when this part of rows is deleted.'
+
+
+def _to_bits(positions: Iterable[Optional[int]], length: int) -> int:
+    """Returns the bitset of `positions`, `None` is skipped."""
+
+    data = bytearray(length // 8 + 1)
+    for position in positions:
+        if position is not None:
+            data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(data, 'little')
+
+
+def _from_bits(bits: int) -> list[int]:
+    """Returns the positions of set bits in ascending order."""
+
+    text = bin(bits)[:1:-1]
+    positions = []
+    position = text.find('1')
+    while position >= 0:
+        positions.append(position)
+        position = text.find('1', position + 1)
+    return positions
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, datetime):
+        return (value.replace(tzinfo=None) - _EPOCH).total_seconds()
+    return 0.0
+
+
+class SWACatalog:
+    """
+    swautomatic > catalog > `SWACatalog`
+    ------------------------------------
+    Columns of assets in memory. Every row is an asset, `positions[steamid]`
+    is the row of the asset.
+
+    Columns
+    -------
+    -   `steamid`, `file_size`, `size`: `array('q')`;
+    -   `time_created`, `time_updated`, `time_local`: `array('d')` of
+        seconds since the epoch;
+    -   `is_installed`, `need_update`, `alive`: `array('b')`;
+    -   `tags`: a list of tuples of tag codes, `tag_names[code]` is the name
+        of the tag.
+
+    Bitsets
+    -------
+    -   `tag_bits[code]`: rows of assets with the tag;
+    -   `flag_bits['alive' | 'is_installed' | 'need_update']`: rows with the
+        flag set.
+
+    Methods
+    -------
+    -   `query()`: returns the count and a page of Steam IDs by the filter.
+    -   `count()`: counts assets by the filter.
+    -   `facets()`: counts assets matching the filter by tag.
+    -   `refresh()`: reads changed records from the storage.
+    -   `invalidate()`: marks records (or the whole catalog) as changed.
+    -   `clear()`: unloads the catalog.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.listening = False
+        self.dirty: set[int] = set()
+        self.stale = False
+        self.revision = SWARevision(_storage)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.columns: dict[str, array] = {}
+        for name in _INT_COLUMNS:
+            self.columns[name] = array('q')
+        for name in _TIME_COLUMNS:
+            self.columns[name] = array('d')
+        for name in _FLAG_COLUMNS + ('alive',):
+            self.columns[name] = array('b')
+        self.tags: list[tuple[int, ...]] = []
+        self.tag_names: list[str] = []
+        self.tag_codes: dict[str, int] = {}
+        self.tag_bits: list[int] = []
+        self.flag_bits: dict[str, int] = dict.fromkeys(
+            _FLAG_COLUMNS + ('alive',), 0)
+        self.positions: dict[int, int] = {}
+        self.deleted = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    # region loading
+    def _tag_code(self, name: str) -> int:
+        code = self.tag_codes.get(name)
+        if code is None:
+            code = len(self.tag_names)
+            self.tag_codes[name] = code
+            self.tag_names.append(name)
+            self.tag_bits.append(0)
+        return code
+
+    def _set_bits(self, position: int, tags: tuple[int, ...],
+                  flags: dict[str, int]) -> None:
+        bit = 1 << position
+        for code in self.tags[position]:
+            self.tag_bits[code] &= ~bit
+        for code in tags:
+            self.tag_bits[code] |= bit
+        for name, value in flags.items():
+            if value:
+                self.flag_bits[name] |= bit
+            else:
+                self.flag_bits[name] &= ~bit
+
+    def _values(self, record: dict) -> dict:
+        values = {name: int(record.get(name) or 0) for name in _INT_COLUMNS}
+        values.update({name: _timestamp(record.get(name))
+                       for name in _TIME_COLUMNS})
+        values.update({name: int(bool(record.get(name)))
+                       for name in _FLAG_COLUMNS})
+        values['alive'] = 1
+        return values
+
+    def _set(self, record: dict, bits: bool = True) -> None:
+        values = self._values(record)
+        tags = tuple(sorted({self._tag_code(tag)
+                             for tag in record.get('tags') or []}))
+        position = self.positions.get(values['steamid'])
+        if position is None:
+            position = len(self.tags)
+            self.positions[values['steamid']] = position
+            for name, column in self.columns.items():
+                column.append(values[name])
+            self.tags.append(())
+        else:
+            for name, column in self.columns.items():
+                column[position] = values[name]
+        if bits:
+            self._set_bits(position, tags, {name: values[name] for name in
+                                            self.flag_bits})
+        self.tags[position] = tags
+
+    def _delete(self, steamid: int) -> None:
+        position = self.positions.pop(steamid, None)
+        if position is not None:
+            self.columns['alive'][position] = 0
+            self._set_bits(position, (), dict.fromkeys(self.flag_bits, 0))
+            self.tags[position] = ()
+            self.deleted += 1
+
+    def _compact(self) -> None:
+        alive = self.columns['alive']
+        for name, column in self.columns.items():
+            self.columns[name] = array(column.typecode,
+                                       compress(column, alive))
+        self.tags = list(compress(self.tags, alive))
+        self.positions = {steamid: position for position, steamid in
+                          enumerate(self.columns['steamid'])}
+        self._build_bits()
+        self.deleted = 0
+
+    def _build_bits(self) -> None:
+        """Builds every bitset from the columns at once, setting bits one
+        by one is quadratic."""
+
+        length = len(self.tags)
+        rows: list[list[int]] = [[] for _ in self.tag_names]
+        for position, tags in enumerate(self.tags):
+            for code in tags:
+                rows[code].append(position)
+        self.tag_bits = [_to_bits(positions, length) for positions in rows]
+        for name in self.flag_bits:
+            self.flag_bits[name] = _to_bits(
+                compress(range(length), self.columns[name]), length)
+
+    def _listen(self, kind: str, steamids: Optional[set[int]]) -> None:
+        self.revision.local()
+        if kind != ASSETS:
+            return
+        with self.lock:
+            if steamids is None:
+                self.stale = True
+            else:
+                self.dirty |= steamids
+
+    def load(self) -> 'SWACatalog':
+        """Reads every record from the storage."""
+
+        with self.lock, metrics.time('catalog_load'):
+            if not self.listening:
+                _storage.add_listener(self._listen)
+                self.listening = True
+            self._reset()
+            self.dirty.clear()
+            self.stale = False
+            self.revision.reset()
+            for record in _storage.find_assets(fields=FIELDS):
+                self._set(record, bits=False)
+            self._build_bits()
+            self.loaded = True
+        _logger.debug('Catalog loaded %s assets', len(self))
+        return self
+
+    def refresh(self) -> int:
+        """
+        swautomatic > catalog > SWACatalog.`refresh()`
+        ----------------------------------------------
+        Loads the catalog on the first call, later reads only records
+        changed since the last refresh.
+
+        Return
+        ------
+        A number of read records.
+        """
+
+        with self.lock:
+            if self.loaded and self.revision.changed():
+                self.stale = True
+            if not self.loaded or self.stale:
+                self.load()
+                return len(self)
+            if not self.dirty:
+                return 0
+            steamids, self.dirty = self.dirty, set()
+            with metrics.time('catalog_refresh'):
+                found = set()
+                for record in _storage.find_assets(
+                        {'steamid': {'$in': list(steamids)}}, fields=FIELDS):
+                    self._set(record)
+                    found.add(int(record['steamid']))
+                for steamid in steamids - found:
+                    self._delete(steamid)
+                if self.deleted > COMPACT_RATIO * len(self.tags):
+                    self._compact()
+            metrics.inc('catalog_refreshed', len(steamids))
+            return len(steamids)
+
+    def invalidate(self, steamids: Optional[Iterable[int]] = None) -> None:
+        """Marks records with `steamids` (every record if `None`) as changed,
+        they are read again by the next query."""
+
+        self._listen(ASSETS, None if steamids is None else
+                     {int(steamid) for steamid in steamids})
+
+    def clear(self) -> None:
+        """Unloads the catalog and stops listening to the storage."""
+
+        with self.lock:
+            if self.listening:
+                _storage.remove_listener(self._listen)
+                self.listening = False
+            self._reset()
+            self.loaded = False
+    # endregion
+
+    def _bits(self, name: str) -> int:
+        code = self.tag_codes.get(name)
+        return 0 if code is None else self.tag_bits[code]
+
+    def _mask(self, steam_ids: Optional[Iterable[int]] = None,
+              tag: Optional[str] = None,
+              need_update: Optional[bool] = None,
+              is_installed: Optional[bool] = None,
+              tags: Optional[Iterable[str]] = None,
+              any_tags: Optional[Iterable[str]] = None,
+              exclude_tags: Optional[Iterable[str]] = None) -> int:
+        """Returns the bitset of rows matching the filter."""
+
+        mask = self.flag_bits['alive']
+        if steam_ids is not None:
+            mask &= _to_bits((self.positions.get(int(steamid))
+                              for steamid in steam_ids), len(self.tags))
+        for name in ([tag] if tag is not None else []) + list(tags or []):
+            mask &= self._bits(name)
+        if any_tags is not None:
+            union = 0
+            for name in any_tags:
+                union |= self._bits(name)
+            mask &= union
+        for name in exclude_tags or []:
+            mask &= ~self._bits(name)
+        for name, value in (('need_update', need_update),
+                            ('is_installed', is_installed)):
+            if value is not None:
+                bits = self.flag_bits[name]
+                mask &= bits if value else ~bits
+        return mask
+
+    def count(self, **kwargs) -> int:
+        """Counts assets by the filter, see `query()`."""
+
+        with self.lock:
+            self.refresh()
+            return self._mask(**kwargs).bit_count()
+
+    def facets(self, **kwargs) -> dict[str, int]:
+        """
+        swautomatic > catalog > SWACatalog.`facets()`
+        ---------------------------------------------
+        Counts assets matching the filter (see `query()`) by tag. Tags
+        without matching assets are omitted.
+        """
+
+        with self.lock, metrics.time('catalog_facets'):
+            self.refresh()
+            mask = self._mask(**kwargs)
+            counts = {name: (mask & bits).bit_count() for name, bits in
+                      zip(self.tag_names, self.tag_bits)}
+        return {name: count for name, count in counts.items() if count}
+
+    def query(self, steam_ids: Optional[Iterable[int]] = None,
+              tag: Optional[str] = None,
+              need_update: Optional[bool] = None,
+              is_installed: Optional[bool] = None,
+              sort: Optional[str] = None, reverse: bool = False,
+              skip: int = 0, limit: int = 0,
+              tags: Optional[Iterable[str]] = None,
+              any_tags: Optional[Iterable[str]] = None,
+              exclude_tags: Optional[Iterable[str]] = None
+              ) -> tuple[int, list[int]]:
+        """
+        swautomatic > catalog > SWACatalog.`query()`
+        --------------------------------------------
+        Filters assets like ISWAAssets.`get_assets()`, sorts them by the
+        field `sort` (one of `SORT_FIELDS`, Steam ID by default) and returns
+        a page. Assets must have `tag` and every tag of `tags`, at least one
+        tag of `any_tags` and none of `exclude_tags`.
+
+        Return
+        ------
+        A tuple of the number of matching assets and a list of Steam IDs of
+        the page.
+
+        Raises
+        ------
+        -   `ValueError`: If the field cannot be sorted by.
+        """
+
+        if sort is not None and sort not in SORT_FIELDS:
+            raise ValueError(f'Unsupported sort field: {sort}')
+        with self.lock, metrics.time('catalog_query'):
+            self.refresh()
+            rows = _from_bits(self._mask(steam_ids, tag, need_update,
+                                         is_installed, tags, any_tags,
+                                         exclude_tags))
+            steamid = self.columns['steamid']
+            # Sorts are stable, the second one keeps the order by Steam ID
+            # among equal values.
+            rows.sort(key=steamid.__getitem__, reverse=reverse)
+            if sort not in (None, 'steamid'):
+                rows.sort(key=self.columns[sort].__getitem__, reverse=reverse)
+            page = rows[skip:skip + limit] if limit else rows[skip:]
+            return len(rows), [steamid[row] for row in page]
+
+
+catalog = SWACatalog()
@@ -1,38 +1,111 @@
 """
 swautomatic > `connection`
 ==========================
-Let you connect to MongoDB databases of Swautomatic project.
+Let you connect to the storage (MongoDB or SQLite) of Swautomatic project.
+
+The objects of this module are created lazily, on the first use, so
+importing the package does not read the settings, open a log file or
+connect to the database.
+
+Log records are put into a queue and written to the rotating log file by a
+listener thread, so code logging in loops does not wait for the disk.
 """
 
+import atexit
 import logging
-from datetime import datetime
-
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable
 
 from .settings import SWASettings, UTF8
+from .storage import SWAStorage, create_storage
 
 
 __all__ = ['_settings',
-           '_client',
-           '_db',
-           '_assets_coll',
-           '_tags_coll',
+           '_storage',
            '_logger'
            ]
 
-date = datetime.today().isoformat(sep='_', timespec='minutes')
-log_filename = f"logs/{date}.log".replace(':', '-')
-_logger = logging.getLogger('swautomatic')
-_logger.setLevel(logging.INFO)
-handler = logging.FileHandler(log_filename, mode='w', encoding=UTF8)
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-handler.setFormatter(formatter)
-_logger.addHandler(handler)
-
-_settings = SWASettings('settings.json')
-_client = MongoClient(_settings.uri)
-_db: Database = _client.get_database(_settings.database_name)
-_assets_coll: Collection = _db.get_collection('assets')
-_tags_coll: Collection = _db.get_collection('tags')
+
+class _Lazy:
+    """
+    swautomatic > connection > `_Lazy`
+    ----------------------------------
+    A proxy which creates the object with `factory` on the first attribute
+    access and forwards every attribute to it.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_obj', None)
+
+    def _get(self) -> Any:
+        obj = object.__getattribute__(self, '_obj')
+        if obj is None:
+            with object.__getattribute__(self, '_lock'):
+                obj = object.__getattribute__(self, '_obj')
+                if obj is None:
+                    obj = object.__getattribute__(self, '_factory')()
+                    object.__setattr__(self, '_obj', obj)
+        return obj
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._get(), name, value)
+
+    def __repr__(self) -> str:
+        if object.__getattribute__(self, '_obj') is None:
+            return '<lazy object, not created yet>'
+        return repr(self._get())
+
+
+STRUCTURED_FIELDS = ('asset_id', 'duration', 'bytes')
+'''Fields which can be passed to the logger with `extra`, for example
+`_logger.info('Installed', extra={'asset_id': 123, 'bytes': 4096})`.'''
+
+
+class _StructuredFormatter(logging.Formatter):
+    """Appends the structured fields of the record as `key=value`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = [f'{field}={getattr(record, field)}'
+                  for field in STRUCTURED_FIELDS if hasattr(record, field)]
+        if fields:
+            message = f"{message} [{' '.join(fields)}]"
+        return message
+
+
+def _create_logger() -> logging.Logger:
+    log_file = _settings.log_file
+    directory = os.path.dirname(log_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    handler = RotatingFileHandler(log_file,
+                                  maxBytes=_settings.log_max_bytes,
+                                  backupCount=_settings.log_backup_count,
+                                  encoding=UTF8)
+    handler.setFormatter(
+        _StructuredFormatter("%(asctime)s %(levelname)s %(message)s"))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger('swautomatic')
+    logger.setLevel(_settings.log_level)
+    logger.addHandler(QueueHandler(log_queue))
+    return logger
+
+
+_logger: logging.Logger = _Lazy(_create_logger)  # type: ignore
+_settings: SWASettings = _Lazy(
+    lambda: SWASettings('settings.json'))  # type: ignore
+_storage: SWAStorage = _Lazy(
+    lambda: create_storage(_settings))  # type: ignore
@@ -0,0 +1,273 @@
+"""
+swautomatic > `dedupe`
+======================
+Module for content-addressed deduplication of installed files. Identical
+files of different assets are replaced with hardlinks to one copy, so they
+use the disk once.
+
+Candidates are found by the size and CRC-32 from manifests (see
+~extract.`extract_archive()`), then SHA-256 of candidates is computed by a
+pool of threads and stored in the manifest entries (`'sha256'`). The hash
+index `{(size, crc): path}` is built from the manifests once per
+process and kept current by installs and deletes: entries of deleted
+directories are dropped (see `forget_directories()`) and an entry whose file
+is gone is replaced by the next install of the same content.
+
+Deleting a deduplicated asset is safe: removing a hardlink does not remove
+the files of other assets. Installs never write into existing files (see
+~extract.`swap_directory()`), so a shared file is never modified in place.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .connection import _logger, _settings, _storage
+from .metrics import metrics
+from .results import DedupeResult
+
+__all__ = [
+    'dedupe_install',
+    'dedupe_library',
+    'forget_directories',
+]
+
+MIN_SIZE = 4096
+'Files smaller than this are not deduplicated.'
+HASH_WORKERS = 8
+'The number of threads computing hashes.'
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_index: Optional[dict[tuple[int, int], str]] = None
+
+
+def _sha256(path: str) -> Optional[str]:
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            while chunk := file.read(CHUNK_SIZE):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _root(record: dict) -> str:
+    is_mod = 'Mod' in (record.get('tags') or [])
+    return _settings.mods_path if is_mod else _settings.assets_path
+
+
+def _records() -> list[dict]:
+    fields = ['steamid', 'tags', 'manifest']
+    with metrics.time('db_find'):
+        return [record for record in _storage.find_assets(fields=fields)
+                if record.get('manifest')]
+
+
+def _load_index() -> dict:
+    global _index  # pylint: disable=global-statement
+
+    with _lock:
+        if _index is None:
+            index = {}
+            for record in _records():
+                root = _root(record)
+                for member, entry in record['manifest'].items():
+                    if entry.get('size', 0) >= MIN_SIZE and \
+                            entry.get('crc') is not None:
+                        index.setdefault(
+                            (entry['size'], entry['crc']),
+                            os.path.join(root, *member.split('/')))
+            _index = index
+        return _index
+
+
+def _replace(key: tuple[int, int], old: Optional[str], new: str) -> None:
+    """Indexes `new` for `key` if the entry is still `old`."""
+
+    with _lock:
+        if _index is not None and _index.get(key) == old:
+            _index[key] = new
+
+
+def forget_directories(paths: list[str]) -> int:
+    """
+    swautomatic > dedupe > `forget_directories()`
+    ---------------------------------------------
+    Drops entries of the hash index pointing to files in the directories
+    `paths`, e.g. of deleted assets.
+
+    Return
+    ------
+    A number of dropped entries.
+    """
+
+    prefixes = tuple(os.path.join(path, '') for path in paths)
+    if not prefixes:
+        return 0
+    with _lock:
+        if _index is None:
+            return 0
+        stale = [key for key, path in _index.items()
+                 if path.startswith(prefixes)]
+        for key in stale:
+            del _index[key]
+    return len(stale)
+
+
+def _link(source: str, target: str) -> bool:
+    """Atomically replaces `target` with a hardlink to `source`."""
+
+    temporary = f'{target}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.link(source, temporary)
+        os.replace(temporary, target)
+    except OSError as error:
+        _logger.debug('Cannot link %s to %s: %s', target, source, error)
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def _same_file(first: str, second: str) -> bool:
+    try:
+        return os.path.samefile(first, second)
+    except OSError:
+        return False
+
+
+def dedupe_install(files_path: str, manifest: dict, root: str,
+                   workers: int = HASH_WORKERS) -> int:
+    """
+    swautomatic > dedupe > `dedupe_install()`
+    -----------------------------------------
+    Links files of a new install in `files_path` (a staging directory) to
+    identical files of the library. `manifest` is the manifest of the
+    install, its entries get `'sha256'` and the `mtime` of the shared file;
+    `root` is the directory the install is moved to. New files are added
+    to the hash index.
+
+    Return
+    ------
+    A number of saved bytes.
+    """
+
+    index = _load_index()
+    candidates = []
+    for member, entry in manifest.items():
+        if entry.get('size', 0) < MIN_SIZE or entry.get('crc') is None:
+            continue
+        path = os.path.join(files_path, *member.split('/'))
+        key = (entry['size'], entry['crc'])
+        installed = os.path.join(root, *member.split('/'))
+        known = index.get(key)
+        if known is None or not os.path.isfile(known):
+            # The indexed file was removed, the new copy replaces it.
+            _replace(key, known, installed)
+            continue
+        if _same_file(known, path):
+            continue
+        candidates.append((entry, path, known, installed))
+    if not candidates:
+        return 0
+
+    def check(item) -> Optional[tuple[dict, str, str, str]]:
+        entry, path, known_path, installed = item
+        sha = _sha256(path)
+        # The indexed file is hashed every time, it may have been replaced
+        # or removed since it was indexed.
+        known_sha = _sha256(known_path)
+        if known_sha is None:
+            _replace((entry['size'], entry['crc']), known_path, installed)
+        if sha is None or sha != known_sha:
+            return None
+        return entry, path, known_path, sha
+
+    saved = 0
+    with metrics.time('dedupe_hash'), \
+            ThreadPoolExecutor(max_workers=max(1, workers),
+                               thread_name_prefix='dedupe') as executor:
+        matches = [item for item in executor.map(check, candidates) if item]
+    for entry, path, known_path, sha in matches:
+        if _link(known_path, path):
+            entry['sha256'] = sha
+            entry['mtime'] = os.stat(path).st_mtime
+            saved += entry['size']
+    metrics.inc('dedupe_bytes', saved)
+    return saved
+
+
+def dedupe_library(workers: int = HASH_WORKERS) -> DedupeResult:
+    """
+    swautomatic > dedupe > `dedupe_library()`
+    -----------------------------------------
+    Deduplicates every installed asset with a manifest: files with the same
+    size and CRC-32 are hashed by `workers` threads, identical files are
+    replaced with hardlinks to the first copy, and manifests are updated in
+    one bulk write. The hash index is rebuilt.
+
+    Return
+    ------
+    ~results.`DedupeResult`.
+    """
+
+    global _index  # pylint: disable=global-statement
+
+    records = _records()
+    groups: dict[tuple[int, int], list[tuple[int, dict, str]]] = {}
+    for record in records:
+        root = _root(record)
+        for member, entry in record['manifest'].items():
+            if entry.get('size', 0) >= MIN_SIZE and \
+                    entry.get('crc') is not None:
+                groups.setdefault((entry['size'], entry['crc']), []).append(
+                    (record['steamid'], entry,
+                     os.path.join(root, *member.split('/'))))
+    candidates = [item for group in groups.values() if len(group) > 1
+                  for item in group]
+
+    def digest(item) -> Optional[str]:
+        return _sha256(item[2])
+
+    with metrics.time('dedupe_hash'), \
+            ThreadPoolExecutor(max_workers=max(1, workers),
+                               thread_name_prefix='dedupe') as executor:
+        hashes = list(executor.map(digest, candidates))
+
+    first: dict[str, str] = {}
+    changed: set[int] = set()
+    linked, saved = 0, 0
+    for (steamid, entry, path), sha in zip(candidates, hashes):
+        if sha is None:
+            continue
+        if entry.get('sha256') != sha:
+            entry['sha256'] = sha
+            changed.add(steamid)
+        source = first.setdefault(sha, path)
+        if source == path or _same_file(source, path):
+            continue
+        if _link(source, path):
+            entry['mtime'] = os.stat(path).st_mtime
+            changed.add(steamid)
+            linked += 1
+            saved += entry['size']
+
+    updates = {record['steamid']: {'manifest': record['manifest']}
+               for record in records if record['steamid'] in changed}
+    if updates:
+        with metrics.time('db_write'):
+            _storage.bulk_update_assets(updates)
+    with _lock:
+        _index = None
+    metrics.inc('dedupe_bytes', saved)
+    message = f'Linked {linked} files, saved {saved} bytes.'
+    _logger.info(message, extra={'bytes': saved})
+    return DedupeResult(message=message, files=linked, size=saved,
+                        hashed=len(candidates))
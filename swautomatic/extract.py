@@ -0,0 +1,348 @@
+"""
+swautomatic > `extract`
+=======================
+Module for extracting archives of assets and mods. Members are written in
+parallel by a pool of threads (`zlib` releases the GIL while inflating), every
+member is copied through a buffer of `CHUNK_SIZE` bytes, so the memory used
+does not depend on the size of the archive.
+
+Every extraction returns a manifest of the installed files,
+`{member path: {'size': int, 'crc': int, 'mtime': float}}`. Sizes and CRC-32
+come from the central directory of the zip file, `mtime` is the time of
+modification of the written file. Member paths are relative to the
+destination, e.g. `'123456/file.crp'`. If the manifest of the installed
+version is given, only changed members are written and files absent from the
+new archive are deleted (a delta install).
+
+The manifest is stored with the asset record, so file listings and sizes do
+not touch the disk and `verify_manifest()` checks files by `os.stat()` only
+(or by CRC-32 if `deep` is `True`).
+
+Installs are staged: the archive is extracted to a new directory in
+`<common_path>/.swa_staging` and `swap_directory()` puts it in place of the
+installed version, which is kept until the swap succeeds.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from zipfile import ZipFile, ZipInfo
+
+from .connection import _logger, _settings
+from .metrics import metrics
+from .results import ExtractResult
+from .trash import move_to_trash
+
+__all__ = [
+    'extract_archive',
+    'staging_directory',
+    'swap_directory',
+    'verify_manifest',
+]
+
+CHUNK_SIZE = 1024 * 1024
+'The size of the buffer used to copy a member.'
+MAX_WORKERS = 8
+'The number of threads used if the setting `extract_workers` is `0`.'
+MTIME_TOLERANCE = 0.001
+'The difference of `mtime` (seconds) which is not treated as a modification.'
+STAGING_NAME = '.swa_staging'
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+
+def _workers() -> int:
+    workers = int(_settings.extract_workers or 0)
+    if workers <= 0:
+        workers = min(MAX_WORKERS, os.cpu_count() or 1)
+    return workers
+
+
+def _member_path(name: str) -> str | None:
+    """Returns the normalized path of the member `name` or `None` if the
+    member points outside of the destination."""
+
+    parts = [part for part in name.replace('\\', '/').split('/')
+             if part not in ('', '.')]
+    if not parts or '..' in parts or os.path.splitdrive(parts[0])[0]:
+        return None
+    return '/'.join(parts)
+
+
+def _unchanged(info: ZipInfo, target: str, entry: dict | None) -> bool:
+    """Checks if the installed file `target` is the member `info`."""
+
+    if not entry or entry.get('crc') != info.CRC or \
+            entry.get('size') != info.file_size:
+        return False
+    try:
+        return os.path.getsize(target) == info.file_size
+    except OSError:
+        return False
+
+
+def _link(source: str, target: str) -> None:
+    """Hardlinks `source` as `target`, copies it if links are not
+    supported."""
+
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _delete_stale(destination: str, paths: list[str]) -> int:
+    """Deletes files `paths` (member paths) and directories left empty."""
+
+    count = 0
+    directories = set()
+    for path in paths:
+        target = os.path.join(destination, *path.split('/'))
+        try:
+            os.remove(target)
+            count += 1
+        except FileNotFoundError:
+            pass
+        parent = os.path.dirname(path)
+        while parent:
+            directories.add(parent)
+            parent = os.path.dirname(parent)
+    # The deepest directories go first, the destination is never removed.
+    for directory in sorted(directories, key=len, reverse=True):
+        try:
+            os.rmdir(os.path.join(destination, *directory.split('/')))
+        except OSError:
+            pass
+    return count
+
+
+def extract_archive(path: str, destination: str, workers: int = 0,
+                    manifest: Optional[dict] = None,
+                    source: Optional[str] = None) -> ExtractResult:
+    """
+    swautomatic > extract > `extract_archive()`
+    -------------------------------------------
+    Extracts the zip archive `path` to the directory `destination`.
+    Directories are created once before members are written, then members
+    are written by `workers` threads (the setting `extract_workers` is used
+    if it is `0`). Members pointing outside of `destination` are skipped.
+
+    If `manifest` (the manifest of the installed version) is given, members
+    with the same CRC-32 and size whose files exist are not written, and
+    files of `manifest` absent from the archive are deleted.
+
+    If `source` is given, the installed version is in `source` and
+    `destination` is a new (staging) directory: unchanged files are
+    hardlinked (or copied) from `source` and nothing is deleted.
+
+    Return
+    ------
+    ~results.`ExtractResult` with the numbers of written, unchanged and
+    deleted files, written bytes and the manifest of the archive. Errors of
+    reading or writing are raised as `OSError` or `zipfile.BadZipFile`.
+    """
+
+    destination = os.path.abspath(destination)
+    installed = os.path.abspath(source) if source else destination
+    workers = workers or _workers()
+    local = threading.local()
+    archives: list[ZipFile] = []
+    lock = threading.Lock()
+
+    def archive() -> ZipFile:
+        # ZipFile objects share one file position, so every thread reads
+        # through its own handle.
+        if not hasattr(local, 'archive'):
+            local.archive = ZipFile(path, 'r')
+            with lock:
+                archives.append(local.archive)
+        return local.archive
+
+    def write(item: tuple[ZipInfo, str]) -> float:
+        info, target = item
+        with archive().open(info) as source, open(target, 'wb') as file:
+            shutil.copyfileobj(source, file, CHUNK_SIZE)
+        # Some filesystems (e.g. NTFS) update the time when the file is
+        # closed, so it is read afterwards.
+        return os.stat(target).st_mtime
+
+    with ZipFile(path, 'r') as zip_file:
+        infos = zip_file.infolist()
+    directories = set()
+    members = []
+    new_manifest = {}
+    unchanged = 0
+    links = []
+    for info in infos:
+        member = _member_path(info.filename)
+        if member is None:
+            _logger.warning('Skipped unsafe member %s of %s',
+                            info.filename, path)
+            continue
+        target = os.path.join(destination, *member.split('/'))
+        if info.is_dir():
+            directories.add(target)
+            continue
+        entry = manifest.get(member) if manifest else None
+        current = os.path.join(installed, *member.split('/'))
+        if _unchanged(info, current, entry):
+            new_manifest[member] = dict(entry)
+            unchanged += 1
+            if current != target:
+                directories.add(os.path.dirname(target))
+                links.append((current, target))
+            continue
+        new_manifest[member] = {'size': info.file_size, 'crc': info.CRC}
+        directories.add(os.path.dirname(target))
+        members.append((member, info, target))
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+    for current, target in links:
+        _link(current, target)
+    # The largest members go first, so the threads finish together.
+    members.sort(key=lambda item: item[1].file_size, reverse=True)
+    items = [(info, target) for _, info, target in members]
+
+    try:
+        if workers == 1 or len(members) < 2:
+            mtimes = [write(item) for item in items]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(members)),
+                                    thread_name_prefix='extract') as executor:
+                mtimes = list(executor.map(write, items))
+    finally:
+        for zip_file in archives:
+            zip_file.close()
+    for (member, _, _), mtime in zip(members, mtimes):
+        new_manifest[member]['mtime'] = mtime
+
+    deleted = 0
+    if manifest:
+        stale = [member for member in manifest
+                 if member not in new_manifest and
+                 _member_path(member) == member]
+        # Files of a staged install are dropped with the installed version.
+        deleted = len(stale) if installed != destination else \
+            _delete_stale(destination, stale)
+
+    size = sum(info.file_size for _, info, _ in members)
+    metrics.inc('extract_files', len(members))
+    metrics.inc('extract_bytes', size)
+    metrics.inc('extract_unchanged', unchanged)
+    metrics.inc('extract_deleted', deleted)
+    return ExtractResult(message=f'Extracted {len(members)} files',
+                         files=len(members), size=size, unchanged=unchanged,
+                         deleted=deleted, manifest=new_manifest)
+
+
+def _crc32(path: str) -> int:
+    crc = 0
+    with open(path, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def verify_manifest(root: str, manifest: dict,
+                    deep: bool = False) -> dict[str, str]:
+    """
+    swautomatic > extract > `verify_manifest()`
+    -------------------------------------------
+    Compares files in the directory `root` with `manifest` (see
+    ~extract.`extract_archive()`). By default only `os.stat()` is used: the
+    size and the time of modification. If `deep` is `True` CRC-32 of files
+    with a changed time of modification is computed, so files which were
+    only touched are treated as intact.
+
+    Return
+    ------
+    A dictionary `{member path: problem}` of damaged files, where `problem`
+    is `'missing'`, `'size'`, `'modified'` (the time of modification
+    differs, `deep` is `False`) or `'crc'`. An empty dictionary means the
+    files are intact.
+    """
+
+    problems = {}
+    for member, entry in manifest.items():
+        path = os.path.join(root, *member.split('/'))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            problems[member] = 'missing'
+            continue
+        if entry.get('crc') is None:
+            # Marked as damaged by ISWAAssets.`audit()`.
+            problems[member] = 'crc'
+        elif stat.st_size != entry.get('size'):
+            problems[member] = 'size'
+        elif abs(stat.st_mtime - entry.get('mtime', 0)) > MTIME_TOLERANCE:
+            if not deep:
+                problems[member] = 'modified'
+            elif _crc32(path) != entry.get('crc'):
+                problems[member] = 'crc'
+    return problems
+
+
+def staging_directory(steamid: int | str) -> str:
+    """
+    swautomatic > extract > `staging_directory()`
+    ---------------------------------------------
+    Creates and returns a new directory for the install of the asset in
+    `<common_path>/.swa_staging`. It is on the same filesystem as the
+    assets, so `swap_directory()` can rename it.
+    """
+
+    root = os.path.join(_settings.common_path, STAGING_NAME)
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f'{steamid}-', dir=root)
+
+
+def _exchange(first: str, second: str) -> bool:
+    """Atomically exchanges two paths by `renameat2()` (Linux)."""
+
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    return renameat2(_AT_FDCWD, os.fsencode(first), _AT_FDCWD,
+                     os.fsencode(second), _RENAME_EXCHANGE) == 0
+
+
+def swap_directory(new: str, target: str) -> None:
+    """
+    swautomatic > extract > `swap_directory()`
+    ------------------------------------------
+    Puts the directory (or the file) `new` in place of `target`. The old
+    version of `target` is moved to the trash after the swap succeeded.
+    On Linux both paths are exchanged atomically, on other systems `target`
+    is renamed aside and restored if `new` cannot be renamed.
+    """
+
+    if not os.path.lexists(target):
+        os.rename(new, target)
+        return
+    if _exchange(new, target):
+        old = new
+    else:
+        old = f'{target}.swa-old-{uuid.uuid4().hex}'
+        os.rename(target, old)
+        try:
+            os.rename(new, target)
+        except OSError:
+            os.rename(old, target)
+            raise
+    if os.path.isdir(old):
+        move_to_trash(old)
+    else:
+        os.remove(old)
@@ -0,0 +1,128 @@
+"""
+swautomatic > `memo`
+====================
+Module for class `SWAMemo`, a small in-process cache of values which are
+expensive to compute and rarely change, e.g. the list of tags and the
+statistics of the library.
+
+Every value depends on kinds of data (`ASSETS`, `TAGS`, see
+~storage.SWAStorage.`add_listener()`). The memo keeps a version counter of
+every kind which is bumped by writes of the storage, so `update_tags()`,
+`update_database()`, `check_updates()`, `delete_assets()`, `download()` and
+the watcher invalidate cached values by writing. Writes of other processes
+are found by the counter of writes of the storage (see
+~storage.`SWARevision`, it is read at most once a second), they invalidate
+every value. Values also
+expire after `cache_ttl` seconds, because the disk can be changed without
+the database. At most `MAX_VALUES` values are kept, the oldest ones are
+removed first.
+
+The instance used by the package is `memo`.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from .connection import _settings, _storage
+from .metrics import metrics
+from .storage import ASSETS, TAGS, SWARevision
+
+__all__ = [
+    'SWAMemo',
+    'memo',
+]
+
+MAX_VALUES = 1024
+'The largest number of cached values, e.g. pages of filtered libraries.'
+
+
+class SWAMemo:
+    """
+    swautomatic > memo > `SWAMemo`
+    ------------------------------
+    A cache of values by key with TTL and versions of data.
+
+    Methods
+    -------
+    -   `get()`: returns the cached value or computes and caches it.
+    -   `version()`: returns current versions of kinds of data.
+    -   `bump()`: invalidates values depending on kinds of data.
+    -   `clear()`: removes every value.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.listening = False
+        self.versions: dict[str, int] = {ASSETS: 0, TAGS: 0}
+        self.revision = SWARevision(_storage)
+        self.values: dict[str, tuple[tuple[int, ...], float, Any]] = {}
+
+    def _listen(self) -> None:
+        if not self.listening:
+            with self.lock:
+                if not self.listening:
+                    _storage.add_listener(self._changed)
+                    self.listening = True
+
+    def _changed(self, kind: str, _steamids: Optional[set[int]]) -> None:
+        self.revision.local()
+        self.bump(kind)
+
+    def bump(self, *kinds: str) -> None:
+        """Increments versions of `kinds` (every kind if none is given)."""
+
+        with self.lock:
+            for kind in kinds or tuple(self.versions):
+                self.versions[kind] = self.versions.get(kind, 0) + 1
+
+    def version(self,
+                kinds: Iterable[str] = (ASSETS, TAGS)) -> tuple[int, ...]:
+        """Returns versions of `kinds` of data."""
+
+        self._listen()
+        if self.revision.changed():
+            # Written by another process, what changed is unknown.
+            self.bump()
+        with self.lock:
+            return tuple(self.versions.get(kind, 0) for kind in kinds)
+
+    def get(self, key: str, factory: Callable[[], Any],
+            kinds: Iterable[str] = (ASSETS, TAGS),
+            ttl: Optional[float] = None) -> Any:
+        """
+        swautomatic > memo > SWAMemo.`get()`
+        ------------------------------------
+        Returns the value of `key` if it was computed after the last change
+        of `kinds` of data and less than `ttl` seconds ago (the setting
+        `cache_ttl` by default), otherwise calls `factory()` and caches its
+        result. The TTL `0` disables caching.
+        """
+
+        kinds = tuple(kinds)
+        ttl = float(_settings.cache_ttl if ttl is None else ttl)
+        version = self.version(kinds)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.values.get(key)
+        if cached is not None and cached[0] == version and cached[1] > now:
+            metrics.inc('memo_hits')
+            return cached[2]
+        metrics.inc('memo_misses')
+        value = factory()
+        if ttl > 0:
+            with self.lock:
+                self.values.pop(key, None)
+                while len(self.values) >= MAX_VALUES:
+                    del self.values[next(iter(self.values))]
+                self.values[key] = (version, now + ttl, value)
+        return value
+
+    def clear(self) -> None:
+        """Removes every value."""
+
+        with self.lock:
+            self.values.clear()
+
+
+memo = SWAMemo()
@@ -0,0 +1,235 @@
+"""
+swautomatic > `metrics`
+=======================
+Module for lightweight instrumentation of Swautomatic project: timers
+(histograms of durations) and counters. The data is kept in memory and can be
+exported in the Prometheus text format or as a short summary.
+
+Example
+-------
+```python
+from swautomatic.metrics import metrics
+
+with metrics.time('steam_api'):
+    ...
+metrics.inc('download_bytes', 4096)
+
+@metrics.timed('update_database')
+def update_database():
+    ...
+```
+
+Every timer is also a scope: the timers and counters recorded inside it (in
+the same thread) are collected into a summary, which is added to the results
+created inside the scope (see ~results.`CommonResult`).
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+__all__ = [
+    'SWAMetrics',
+    'metrics',
+]
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           30.0, 60.0)
+'Upper bounds of histogram buckets in seconds.'
+PREFIX = 'swautomatic'
+
+
+class _Histogram:
+    """Counts observations in buckets and keeps their sum and maximum."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+class _Scope:
+    """Collects timers and counters recorded while it is active."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.start = time.perf_counter()
+        self.timers: dict[str, list[float]] = {}
+        self.counters: dict[str, float] = {}
+
+    def summary(self) -> dict:
+        return {
+            'operation': self.name,
+            'elapsed': round(time.perf_counter() - self.start, 6),
+            'timers': {name: {'count': int(value[0]),
+                              'total': round(value[1], 6),
+                              'max': round(value[2], 6)}
+                       for name, value in self.timers.items()},
+            'counters': dict(self.counters),
+        }
+
+
+class SWAMetrics:
+    """
+    swautomatic > metrics > `SWAMetrics`
+    ------------------------------------
+    A thread-safe registry of timers and counters.
+
+    Methods
+    -------
+    -   `observe()`: Records a duration of the operation.
+    -   `inc()`: Increases the counter.
+    -   `time()`: A context manager measuring the block.
+    -   `timed()`: A decorator measuring the function.
+    -   `summary()`: Returns the summary of the current scope.
+    -   `totals()`: Returns the totals of every metric.
+    -   `to_prometheus()`: Returns every metric in the Prometheus text format.
+    -   `reset()`: Removes every metric.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.histograms: dict[str, _Histogram] = {}
+        self.counters: dict[str, float] = {}
+        self.local = threading.local()
+
+    def _scopes(self) -> list[_Scope]:
+        scopes = getattr(self.local, 'scopes', None)
+        if scopes is None:
+            scopes = self.local.scopes = []
+        return scopes
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Records the duration `seconds` of the operation `name`."""
+
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = _Histogram()
+            histogram.observe(seconds)
+        for scope in self._scopes():
+            value = scope.timers.setdefault(name, [0, 0.0, 0.0])
+            value[0] += 1
+            value[1] += seconds
+            value[2] = max(value[2], seconds)
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Increases the counter `name` by `value`."""
+
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for scope in self._scopes():
+            scope.counters[name] = scope.counters.get(name, 0) + value
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """Measures the block and records it as the operation `name`. If the
+        block raises an exception the counter `<name>_errors` is increased."""
+
+        scopes = self._scopes()
+        scope = _Scope(name)
+        scopes.append(scope)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(f'{name}_errors')
+            raise
+        finally:
+            scopes.remove(scope)
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """Returns a decorator measuring every call of the function. The
+        name of the function is used if `name` is not given."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self) -> dict:
+        """Returns the summary of the innermost active scope in this thread
+        or an empty dictionary if there is no active scope."""
+
+        scopes = self._scopes()
+        if not scopes:
+            return {}
+        return scopes[-1].summary()
+
+    def totals(self) -> dict:
+        """Returns the count, the sum and the maximum of every timer and
+        the value of every counter."""
+
+        with self.lock:
+            return {
+                'timers': {name: {'count': hist.count,
+                                  'total': round(hist.total, 6),
+                                  'max': round(hist.max, 6)}
+                           for name, hist in self.histograms.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+
+        lines = []
+        with self.lock:
+            histograms = {name: (list(hist.buckets), hist.count, hist.total,
+                                 hist.max)
+                          for name, hist in self.histograms.items()}
+            counters = dict(self.counters)
+
+        metric = f'{PREFIX}_operation_seconds'
+        lines.append(f'# HELP {metric} Duration of operations.')
+        lines.append(f'# TYPE {metric} histogram')
+        for name, (buckets, count, total, _) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, value in zip(BUCKETS, buckets):
+                cumulative += value
+                lines.append(f'{metric}_bucket{{operation="{name}",'
+                             f'le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{operation="{name}",le="+Inf"}} '
+                         f'{count}')
+            lines.append(f'{metric}_sum{{operation="{name}"}} {total}')
+            lines.append(f'{metric}_count{{operation="{name}"}} {count}')
+
+        metric = f'{PREFIX}_operation_max_seconds'
+        lines.append(f'# HELP {metric} The longest duration of operations.')
+        lines.append(f'# TYPE {metric} gauge')
+        for name, (_, _, _, maximum) in sorted(histograms.items()):
+            lines.append(f'{metric}{{operation="{name}"}} {maximum}')
+
+        for name, value in sorted(counters.items()):
+            metric = f'{PREFIX}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """Removes every metric."""
+
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+metrics = SWAMetrics()
+'The registry used by Swautomatic.'
@@ -5,10 +5,13 @@ Module for class `SWAObject`.
 """
 
 from .asset import ISWAAssets
-from .connection import _client, _logger, _settings
+from .connection import _logger, _settings, _storage
+from .memo import memo
+from .metrics import metrics
+from .progress import progress
 from .results import CommonResult, StatisticsResult
 from .tag import ISWATags
-from .utils import get_directory_size, get_size_format
+from .utils import get_disk_usage, get_size_format
 
 __all__ = ['SWAObject']
 
@@ -21,7 +24,9 @@ class SWAObject:
 
     Attributes
     ----------
-    - `client` (pymongo.MongoClient): A MongoDB client object.
+    - `client` (pymongo.MongoClient): A MongoDB client object or `None` if
+      the storage is not MongoDB.
+    - `storage` (SWAStorage): The storage backend (MongoDB or SQLite).
     - `settings` (SWASettings): An object representing Swautomatic settings.
 
     Methods
@@ -34,29 +39,32 @@ class SWAObject:
     """
 
     def __init__(self):
-        self.client = _client
+        self.storage = _storage
         self.settings = _settings
         self.tags = ISWATags()
         self.assets = ISWAAssets()
 
+    @property
+    def client(self):
+        """The MongoDB client or `None` if the storage is not MongoDB."""
+        return getattr(self.storage, 'client', None)
+
+    @metrics.timed('get_statistics')
     def get_statistics(self):
         """
         swautomatic > object > SWAObject.`get_statistics()`
         ---------------------------------------------------
         Retrieves statistics about the database and returns a StatisticsResult
-        object.
+        object. The result is cached until the storage is written or for
+        `cache_ttl` seconds (see ~memo.`SWAMemo`).
 
         Return
         ------
         - `StatisticsResult`: The retrieved statistics including the
             following attributes:
             - `count` (int): The total number of assets in the database.
-            - `count_by_tag` (list): A list of dictionaries containing
-                information about the count of assets by tag. Each dictionary
-                has the following attributes:
-                - `tag_id` (str): The unique identifier of the tag.
-                - `tag_name` (str): The name of the tag.
-                - `count` (int): The count of assets that have the tag.
+            - `count_by_tag` (dict): The count of assets by the name of the
+                tag, for every tag in the database.
             - `installed` (int): The count of installed assets.
             - `not_installed` (int): The count of not installed assets.
             - `assets_size` (str): The size of the assets directory in
@@ -65,23 +73,29 @@ class SWAObject:
                 human-readable format.
             - `total_size` (str): The total size of assets and mods
                 directories combined in human-readable format.
+            - `physical_size` (str): The size of assets and mods on the disk,
+                files hardlinked by ~dedupe are counted once.
         """
 
-        # Add an aggregation here, now it has a loop with a lot of tags
-        # count = self.assets_coll.count_documents({})
+        return memo.get('statistics', self._get_statistics)
+
+    def _get_statistics(self) -> StatisticsResult:
         count = self.assets.count_assets()
         tags = self.tags.list_tags()
 
-        stats = {}
-        for tag in tags:
-            stats.update({tag: self.assets.count_assets(tags=tag)})
+        counts = self.assets.count_by_tag()
+        stats = {tag: counts.get(tag, 0) for tag in tags}
 
         installed = self.assets.count_assets(is_installed=True)
         not_installed = self.assets.count_assets(is_installed=False)
 
-        assets_size = get_directory_size(self.settings.assets_path)
-        mods_size = get_directory_size(self.settings.mods_path)
+        seen = set()
+        assets_size, assets_physical = get_disk_usage(
+            self.settings.assets_path, seen)
+        mods_size, mods_physical = get_disk_usage(self.settings.mods_path,
+                                                  seen)
         total_size = assets_size + mods_size
+        physical_size = assets_physical + mods_physical
 
         return StatisticsResult(count=count,
                                 count_by_tag=stats,
@@ -89,8 +103,10 @@ class SWAObject:
                                 not_installed=not_installed,
                                 assets_size=get_size_format(assets_size),
                                 mods_size=get_size_format(mods_size),
-                                total_size=get_size_format(total_size))
+                                total_size=get_size_format(total_size),
+                                physical_size=get_size_format(physical_size))
 
+    @metrics.timed('total_reset')
     def total_reset(self):
         """
         swautomatic > object > SWAObject.`total_reset()`
@@ -108,6 +124,7 @@ class SWAObject:
 
         return self.assets.delete_assets()
 
+    @metrics.timed('update_database')
     def update_database(self):
         """
         swautomatic > object > SWAObject.`update_database()`
@@ -119,16 +136,25 @@ class SWAObject:
         """
 
         try:
-            ids_steam = self.assets.list_assets_remote()
-            ids_database = self.assets.list_assets_db()
-            ids_local = self.assets.list_assets_local()
-            ids_to_delete = (ids_local | ids_database) - ids_steam
-            ids_to_insert = ids_steam - ids_database
-            ids_to_update = ids_database
-
-            deleted_count = self.assets.delete_assets(ids_to_delete)
-            updated_count = self.assets.update_assets(ids_to_update)
-            inserted_count = self.assets.insert_assets(ids_to_insert)
+            with progress.task('update_database', total=4) as task:
+                ids_steam = self.assets.list_assets_remote()
+                ids_database = self.assets.list_assets_db()
+                ids_local = self.assets.list_assets_local()
+                ids_to_delete = (ids_local | ids_database) - ids_steam
+                ids_to_insert = ids_steam - ids_database
+                ids_to_update = ids_database
+                task.advance()
+
+                # `delete_assets()` deletes every asset if no IDs are given.
+                deleted_count = 0
+                if ids_to_delete:
+                    deleted_count = self.assets.delete_assets(
+                        ids_to_delete).count
+                task.advance()
+                updated_count = self.assets.update_assets(ids_to_update)
+                task.advance()
+                inserted_count = self.assets.insert_assets(ids_to_insert)
+                task.advance()
 
             message = f'The database updated, deleted: {deleted_count}, \
                 updated: {updated_count}, inserted: {inserted_count}.'
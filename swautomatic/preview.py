@@ -3,13 +3,10 @@
 Module for class `SWAPreview`.
 """
 
-import logging
 import os
-from urllib.request import urlopen
 
-from PIL import Image, UnidentifiedImageError
-
-from .connection import _settings
+from .connection import _logger, _settings
+from .metrics import metrics
 
 __all__ = ['SWAPreview']
 
@@ -58,6 +55,7 @@ class SWAPreview:
         - `dict` desc."""
         return {'preview_url': self.url}
 
+    @metrics.timed('preview_download')
     def download(self) -> int:
         """### swautomatic > preview > SWAPreview.`download()`
 
@@ -81,6 +79,10 @@ class SWAPreview:
         # images, using asynchronous I/O could be more efficient than using a
         # thread pool. You could use a library like asyncio to implement this.
 
+        from urllib.request import urlopen
+
+        from PIL import Image, UnidentifiedImageError
+
         try:
             with Image.open(urlopen(self.url, timeout=_settings.timeout)) as img:
 
@@ -106,6 +108,7 @@ class SWAPreview:
 
         except (FileNotFoundError, ValueError, TypeError,
                 UnidentifiedImageError, AttributeError) as error:
-            logging.error(
-                'The error occured. SteamID: %s. %s', self.steam_id, repr(error))
+            _logger.error(
+                'The error occured. SteamID: %s. %s', self.steam_id, repr(error),
+                extra={'asset_id': self.steam_id})
         return 0
@@ -0,0 +1,286 @@
+"""
+swautomatic > `progress`
+========================
+Module for class `SWAProgress`, a bus of progress events of long operations
+(downloads, requests to Steam, writes to the database).
+
+An operation is a task: it knows its total (if it is known), counts done
+items and transferred bytes and computes the rate and the ETA. Tasks are
+nested like timers of ~metrics.`SWAMetrics`: bytes added in a thread count
+for every active task of the thread, e.g. a download of an asset and the
+batch of downloads it belongs to.
+
+Subscribers (e.g. the Server-Sent Events endpoint of the app) get events as
+dictionaries from a queue. Events of a task are sent at most every
+`INTERVAL` seconds, a slow subscriber loses the oldest progress events
+instead of slowing the operation down. The last event of a task (`status`
+is `'done'` or `'error'`) is never lost.
+
+Example
+-------
+```python
+from swautomatic.progress import progress
+
+with progress.task('download_assets', total=len(ids)) as task:
+    for steamid in ids:
+        ...
+        progress.add_bytes(len(chunk))
+        task.advance()
+```
+"""
+
+import functools
+import itertools
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+__all__ = [
+    'SWAProgress',
+    'SWATask',
+    'progress',
+]
+
+INTERVAL = 0.25
+'The least number of seconds between progress events of a task.'
+QUEUE_SIZE = 256
+'The number of events waiting for a subscriber over which events are lost.'
+_KEPT = ('done', 'error')
+
+
+class SWATask:
+    """
+    swautomatic > progress > `SWATask`
+    ----------------------------------
+    A running operation.
+
+    Attributes
+    ----------
+    -   `id` (int): the number of the task in the process.
+    -   `name` (str): the name of the operation, e.g. `'download_assets'`.
+    -   `label` (str): a description shown to the user, e.g. a Steam ID.
+    -   `total` (int or None): the number of items if it is known.
+    -   `done` (int): the number of done items.
+    -   `bytes` (int): the number of transferred bytes.
+    """
+
+    def __init__(self, bus: 'SWAProgress', task_id: int, name: str,
+                 total: Optional[int] = None, label: str = '',
+                 parent: Optional['SWATask'] = None) -> None:
+        self.bus = bus
+        self.id = task_id
+        self.name = name
+        self.label = label
+        self.total = total
+        self.parent = parent
+        # Tasks advance from pools of threads.
+        self.lock = threading.Lock()
+        self.done = 0
+        self.bytes = 0
+        self.status = 'start'
+        self.start = time.monotonic()
+        self.sent = 0.0
+
+    def advance(self, items: int = 1) -> None:
+        """Counts `items` done items."""
+
+        with self.lock:
+            self.done += items
+        self._changed()
+
+    def add_total(self, items: int) -> None:
+        """Adds `items` to the total, e.g. when the next page is listed."""
+
+        with self.lock:
+            self.total = (self.total or 0) + items
+        self._changed()
+
+    def _changed(self) -> None:
+        now = time.monotonic()
+        if now - self.sent >= INTERVAL:
+            self.sent = now
+            self.bus.publish(self.to_dict())
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the event of the current state of the task."""
+
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = round(max(self.total - self.done, 0) / rate, 1)
+        return {
+            'id': self.id,
+            'parent': self.parent.id if self.parent else None,
+            'name': self.name,
+            'label': self.label,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'bytes': self.bytes,
+            'rate': round(rate, 3),
+            'bytes_rate': round(self.bytes / elapsed, 1) if elapsed > 0
+            else 0.0,
+            'eta': eta,
+            'elapsed': round(elapsed, 3),
+        }
+
+
+class _Events(queue.Queue):
+    """A queue of events of a subscriber. If it holds over `QUEUE_SIZE`
+    events the oldest progress event is dropped."""
+
+    def _put(self, item: dict[str, Any]) -> None:
+        super()._put(item)
+        if len(self.queue) > QUEUE_SIZE:
+            for index, event in enumerate(self.queue):
+                if event.get('status') not in _KEPT:
+                    del self.queue[index]
+                    break
+
+
+class SWAProgress:
+    """
+    swautomatic > progress > `SWAProgress`
+    --------------------------------------
+    The bus of progress events.
+
+    Methods
+    -------
+    -   `task()`: a context manager running a task.
+    -   `tracked()`: a decorator running a function as a task.
+    -   `within()`: a context manager making a task current in the thread.
+    -   `add_bytes()`: counts transferred bytes of tasks of the thread.
+    -   `current()`: the innermost task of the thread.
+    -   `active()`: events of running tasks.
+    -   `subscribe()`, `unsubscribe()`: queues of events.
+    -   `publish()`: sends an event to subscribers.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.ids = itertools.count(1)
+        self.tasks: dict[int, SWATask] = {}
+        self.subscribers: list[queue.Queue] = []
+
+    def _stack(self) -> list[SWATask]:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current(self) -> Optional[SWATask]:
+        """Returns the innermost task of the thread or `None`."""
+
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def task(self, name: str, total: Optional[int] = None, label: str = '',
+             parent: Optional[SWATask] = None) -> Iterator[SWATask]:
+        """
+        swautomatic > progress > SWAProgress.`task()`
+        ---------------------------------------------
+        Runs the task `name` with `total` items. The parent is the current
+        task of the thread, a task running in a pool of threads gets its
+        `parent` explicitly. Events are sent when the task starts, when it
+        advances and when it is done (`status` is `'done'` or `'error'`).
+        """
+
+        stack = self._stack()
+        if parent is None and stack:
+            parent = stack[-1]
+        task = SWATask(self, next(self.ids), name, total, label, parent)
+        with self.lock:
+            self.tasks[task.id] = task
+        stack.append(task)
+        self.publish(task.to_dict())
+        task.status = 'progress'
+        try:
+            yield task
+            task.status = 'done'
+        except BaseException:
+            task.status = 'error'
+            raise
+        finally:
+            stack.remove(task)
+            with self.lock:
+                self.tasks.pop(task.id, None)
+            self.publish(task.to_dict())
+
+    @contextmanager
+    def within(self, task: SWATask) -> Iterator[SWATask]:
+        """Makes `task` the current task of the thread, e.g. for a pool of
+        threads working for the task."""
+
+        stack = self._stack()
+        stack.append(task)
+        try:
+            yield task
+        finally:
+            stack.remove(task)
+
+    def tracked(self, name: str,
+                label: Optional[Callable[..., Any]] = None) -> Callable:
+        """Returns a decorator running the function as the task `name` with
+        one item. `label` gets the arguments of the function and returns
+        the label of the task."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                text = str(label(*args, **kwargs)) if label else ''
+                with self.task(name, total=1, label=text) as task:
+                    result = func(*args, **kwargs)
+                    task.advance()
+                    return result
+            return wrapper
+        return decorator
+
+    def add_bytes(self, size: int) -> None:
+        """Counts `size` transferred bytes for the tasks of the thread and
+        their parents."""
+
+        stack = self._stack()
+        task = stack[-1] if stack else None
+        while task is not None:
+            with task.lock:
+                task.bytes += size
+            task._changed()  # pylint: disable=protected-access
+            task = task.parent
+
+    def active(self) -> list[dict[str, Any]]:
+        """Returns events of the current state of running tasks."""
+
+        with self.lock:
+            tasks = list(self.tasks.values())
+        return [task.to_dict() for task in tasks]
+
+    def subscribe(self) -> queue.Queue:
+        """Returns a new queue of events."""
+
+        events: queue.Queue = _Events()
+        with self.lock:
+            self.subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events: queue.Queue) -> None:
+        """Stops sending events to the queue."""
+
+        with self.lock:
+            if events in self.subscribers:
+                self.subscribers.remove(events)
+
+    def publish(self, event: dict[str, Any]) -> None:
+        """Sends `event` to every subscriber."""
+
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for events in subscribers:
+            events.put_nowait(event)
+
+
+progress = SWAProgress()
@@ -5,13 +5,18 @@ Module for results classes.
 """
 
 from dataclasses import dataclass
-from typing import Any
+
+from .metrics import metrics
 
 __all__ = [
     'CommonResult',
     'StatisticsResult',
     'DeleteResult',
     'DownloadResult',
+    'ExtractResult',
+    'AuditResult',
+    'DedupeResult',
+    'SearchResult',
 ]
 
 
@@ -26,6 +31,8 @@ class CommonResult(object):
     - `status` (str): A string representating a status of running.
     - `status_bool` (bool): Boolean variant of status.
     - `message` (str): A string which will be shown to the user.
+    - `metrics` (dict): The summary of timers and counters of the operation
+      which created the result (see ~metrics.`SWAMetrics.summary()`).
     """
 
     def __init__(
@@ -38,11 +45,10 @@ class CommonResult(object):
         self.status = status
         self.status_bool = status_bool
         self.message = message
+        self.metrics = metrics.summary()
         for key, value in kwargs.items():
             setattr(self, key, value)
 
-    def __setattr__(self, __name: str, __value: Any) -> None: ...
-
 
 @dataclass
 class StatisticsResult:
@@ -58,6 +64,7 @@ class StatisticsResult:
     assets_size: str
     mods_size: str
     total_size: str
+    physical_size: str
 
 
 class DeleteResult(CommonResult):
@@ -90,3 +97,107 @@ class DownloadResult(CommonResult):
                  message: str = '', **kwargs):
         super().__init__(status, status_bool, message, **kwargs)
         self.size = kwargs.get('size', 0)
+
+
+class ExtractResult(CommonResult):
+    """
+    swautomatic > results > `ExtractResult`
+    ---------------------------------------
+    Describes a result of extract.`extract_archive()`.
+
+    Parameters
+    ----------
+    -   `~results.CommonResult` parameters;
+    -   `files` (integer): a number of written files;
+    -   `size` (integer): a number of written bytes;
+    -   `unchanged` (integer): a number of files which were not rewritten;
+    -   `deleted` (integer): a number of files deleted as absent from the
+        archive;
+    -   `manifest` (dict): the manifest of the archive.
+    """
+
+    def __init__(self, status: str = 'Done', status_bool: bool = True,
+                 message: str = '', **kwargs):
+        super().__init__(status, status_bool, message, **kwargs)
+        self.files = int(kwargs.get('files', 0))
+        self.size = int(kwargs.get('size', 0))
+        self.unchanged = int(kwargs.get('unchanged', 0))
+        self.deleted = int(kwargs.get('deleted', 0))
+        self.manifest = kwargs.get('manifest') or {}
+
+
+class AuditResult(CommonResult):
+    """
+    swautomatic > results > `AuditResult`
+    -------------------------------------
+    Describes a result of ISWAAssets.`audit()`.
+
+    Parameters
+    ----------
+    -   `~results.CommonResult` parameters;
+    -   `checked` (integer): a number of checked records;
+    -   `missing` (list): Steam IDs of installed assets without directories;
+    -   `orphaned` (list): Steam IDs of directories without records;
+    -   `corrupted` (dict): `{steamid: {member path: problem}}`;
+    -   `modified` (dict): `{steamid: [member paths]}` of files with a
+        changed time of modification and the same contents;
+    -   `stale` (list): Steam IDs of installed assets which need update;
+    -   `fixes` (dict): `{steamid: fields}` of wrong records;
+    -   `fixed` (integer): a number of fixed records.
+    """
+
+    def __init__(self, status: str = 'Done', status_bool: bool = True,
+                 message: str = '', **kwargs):
+        super().__init__(status, status_bool, message, **kwargs)
+        self.checked = int(kwargs.get('checked', 0))
+        self.missing = list(kwargs.get('missing', []))
+        self.orphaned = list(kwargs.get('orphaned', []))
+        self.corrupted = dict(kwargs.get('corrupted', {}))
+        self.modified = dict(kwargs.get('modified', {}))
+        self.stale = list(kwargs.get('stale', []))
+        self.fixes = dict(kwargs.get('fixes', {}))
+        self.fixed = int(kwargs.get('fixed', 0))
+
+
+class DedupeResult(CommonResult):
+    """
+    swautomatic > results > `DedupeResult`
+    --------------------------------------
+    Describes a result of dedupe.`dedupe_library()`.
+
+    Parameters
+    ----------
+    -   `~results.CommonResult` parameters;
+    -   `files` (integer): a number of files replaced with hardlinks;
+    -   `size` (integer): a number of saved bytes;
+    -   `hashed` (integer): a number of hashed files.
+    """
+
+    def __init__(self, status: str = 'Done', status_bool: bool = True,
+                 message: str = '', **kwargs):
+        super().__init__(status, status_bool, message, **kwargs)
+        self.files = int(kwargs.get('files', 0))
+        self.size = int(kwargs.get('size', 0))
+        self.hashed = int(kwargs.get('hashed', 0))
+
+
+class SearchResult(CommonResult):
+    """
+    swautomatic > results > `SearchResult`
+    --------------------------------------
+    Describes a result of ISWAAssets.`search()`.
+
+    Parameters
+    ----------
+    -   `~results.CommonResult` parameters;
+    -   `count` (integer): a number of found assets;
+    -   `assets` (list): `SWAAsset` objects of the page, the best first;
+    -   `next` (str): the cursor of the next page or `None`.
+    """
+
+    def __init__(self, status: str = 'Done', status_bool: bool = True,
+                 message: str = '', **kwargs):
+        super().__init__(status, status_bool, message, **kwargs)
+        self.count = int(kwargs.get('count', 0))
+        self.assets = list(kwargs.get('assets', []))
+        self.next = kwargs.get('next')
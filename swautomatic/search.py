@@ -0,0 +1,294 @@
+"""
+swautomatic > `search`
+======================
+Module for class `SWASearchIndex`, an in-process full-text index of names of
+assets. It works with every storage backend.
+
+Names are split into tokens (lowercase words without accents). The index
+keeps postings `{token: steamids}`, a sorted list of tokens for prefix
+matching and trigrams of tokens for misspelled and partial words. A query
+matches an asset if every token of the query matches a token of the name:
+
+-   an equal token scores `3`;
+-   a token starting with the query token scores `2`;
+-   a token with similar trigrams scores their similarity (up to `1`).
+
+A name starting with the whole query gets `1` more. Results are ordered by
+the score (descending) and Steam ID, pages are selected by a cursor (the key
+of the last result of the previous page), so paging stays cheap on large
+libraries.
+
+Like ~catalog.`SWACatalog`, the index is loaded on the first query and
+refreshed after writes of the storage, it is loaded again after writes of
+other processes (see ~storage.`SWARevision`). The instance used by the package is
+`search_index`.
+"""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Optional
+
+from .connection import _logger, _storage
+from .metrics import metrics
+from .storage import ASSETS, SWARevision
+
+__all__ = [
+    'SWASearchIndex',
+    'search_index',
+]
+
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+START_BONUS = 1.0
+MIN_SIMILARITY = 0.4
+'The least trigram similarity of a matching token.'
+_WORD = re.compile(r'\w+')
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFKD', str(text or '')).casefold()
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> list[str]:
+    """Returns lowercase words of `text` without accents."""
+    return _WORD.findall(_normalize(text))
+
+
+def _trigrams(token: str) -> set[str]:
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def encode_cursor(score: float, steamid: int) -> str:
+    """Returns the cursor of the result, see SWASearchIndex.`search()`."""
+    return f'{score:.3f}:{steamid}'
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple[float, int]]:
+    """Returns the sort key of the cursor or `None` if it is not valid."""
+
+    try:
+        score, steamid = str(cursor).split(':')
+        return -float(score), int(steamid)
+    except ValueError:
+        return None
+
+
+class SWASearchIndex:
+    """
+    swautomatic > search > `SWASearchIndex`
+    ---------------------------------------
+    An inverted index of names of assets.
+
+    Methods
+    -------
+    -   `search()`: returns ranked Steam IDs matching the query.
+    -   `refresh()`: reads changed names from the storage.
+    -   `invalidate()`: marks names (or every name) as changed.
+    -   `clear()`: unloads the index.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.listening = False
+        self.dirty: set[int] = set()
+        self.stale = False
+        self.revision = SWARevision(_storage)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.names: dict[int, str] = {}
+        self.tokens: dict[int, tuple[str, ...]] = {}
+        self.postings: dict[str, set[int]] = {}
+        self.trigrams: dict[str, set[str]] = {}
+        self.sorted_tokens: Optional[list[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    # region loading
+    def _remove(self, steamid: int) -> None:
+        self.names.pop(steamid, None)
+        for token in self.tokens.pop(steamid, ()):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.discard(steamid)
+            if not postings:
+                del self.postings[token]
+                for trigram in _trigrams(token):
+                    self.trigrams[trigram].discard(token)
+                self.sorted_tokens = None
+
+    def _add(self, steamid: int, name: str) -> None:
+        self._remove(steamid)
+        tokens = tuple(dict.fromkeys(tokenize(name)))
+        self.names[steamid] = _normalize(name)
+        self.tokens[steamid] = tokens
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = set()
+                for trigram in _trigrams(token):
+                    self.trigrams.setdefault(trigram, set()).add(token)
+                self.sorted_tokens = None
+            postings.add(steamid)
+
+    def _listen(self, kind: str, steamids: Optional[set[int]]) -> None:
+        self.revision.local()
+        if kind != ASSETS:
+            return
+        with self.lock:
+            if steamids is None:
+                self.stale = True
+            else:
+                self.dirty |= steamids
+
+    def load(self) -> 'SWASearchIndex':
+        """Reads names of every asset from the storage."""
+
+        with self.lock, metrics.time('search_load'):
+            if not self.listening:
+                _storage.add_listener(self._listen)
+                self.listening = True
+            self._reset()
+            self.dirty.clear()
+            self.stale = False
+            self.revision.reset()
+            for record in _storage.find_assets(fields=['steamid', 'name']):
+                self._add(int(record['steamid']), record.get('name') or '')
+            self.loaded = True
+        _logger.debug('Search index loaded %s names', len(self))
+        return self
+
+    def refresh(self) -> int:
+        """Loads the index on the first call, later reads only names changed
+        since the last refresh. Returns a number of read records."""
+
+        with self.lock:
+            if self.loaded and self.revision.changed():
+                self.stale = True
+            if not self.loaded or self.stale:
+                self.load()
+                return len(self)
+            if not self.dirty:
+                return 0
+            steamids, self.dirty = self.dirty, set()
+            for steamid in steamids:
+                self._remove(steamid)
+            for record in _storage.find_assets(
+                    {'steamid': {'$in': list(steamids)}},
+                    fields=['steamid', 'name']):
+                self._add(int(record['steamid']), record.get('name') or '')
+            return len(steamids)
+
+    def invalidate(self, steamids=None) -> None:
+        """Marks names of `steamids` (every name if `None`) as changed."""
+
+        self._listen(ASSETS, None if steamids is None else
+                     {int(steamid) for steamid in steamids})
+
+    def clear(self) -> None:
+        """Unloads the index and stops listening to the storage."""
+
+        with self.lock:
+            if self.listening:
+                _storage.remove_listener(self._listen)
+                self.listening = False
+            self._reset()
+            self.loaded = False
+    # endregion
+
+    def _matches(self, query_token: str) -> dict[str, float]:
+        """Returns tokens of the index matching `query_token` and their
+        scores."""
+
+        matches: dict[str, float] = {}
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.postings)
+        tokens = self.sorted_tokens
+        position = bisect_left(tokens, query_token)
+        while position < len(tokens) and \
+                tokens[position].startswith(query_token):
+            token = tokens[position]
+            matches[token] = EXACT_SCORE if token == query_token else \
+                PREFIX_SCORE
+            position += 1
+        query_trigrams = _trigrams(query_token)
+        shared: dict[str, int] = {}
+        for trigram in query_trigrams:
+            for token in self.trigrams.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            similarity = count / len(query_trigrams | _trigrams(token))
+            if similarity >= MIN_SIMILARITY:
+                matches[token] = similarity
+        return matches
+
+    def search(self, query: str, limit: int = 20,
+               after: Optional[str] = None) -> tuple[int, list[int],
+                                                      Optional[str]]:
+        """
+        swautomatic > search > SWASearchIndex.`search()`
+        ------------------------------------------------
+        Finds assets by the name.
+
+        Parameters
+        ----------
+        -   `query` (str): words to find, every word must match.
+        -   `limit` (int): the size of the page, `0` means every result.
+        -   `after` (str): the cursor returned with the previous page.
+
+        Return
+        ------
+        A tuple of the number of found assets, Steam IDs of the page and the
+        cursor of the next page (`None` if it is the last page).
+        """
+
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return 0, [], None
+        with self.lock, metrics.time('search_query'):
+            self.refresh()
+            scores: Optional[dict[int, float]] = None
+            for query_token in query_tokens:
+                token_scores: dict[int, float] = {}
+                for token, score in self._matches(query_token).items():
+                    for steamid in self.postings[token]:
+                        if score > token_scores.get(steamid, 0.0):
+                            token_scores[steamid] = score
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {steamid: score + token_scores[steamid]
+                              for steamid, score in scores.items()
+                              if steamid in token_scores}
+                if not scores:
+                    return 0, [], None
+            phrase = ' '.join(query_tokens)
+            keys = []
+            for steamid, score in scores.items():
+                if self.names[steamid].startswith(phrase):
+                    score += START_BONUS
+                keys.append((-round(score, 3), steamid))
+        keys.sort()
+        start = 0
+        cursor = decode_cursor(after) if after else None
+        if cursor is not None:
+            start = bisect_left(keys, cursor)
+            if start < len(keys) and keys[start] == cursor:
+                start += 1
+        page = keys[start:start + limit] if limit else keys[start:]
+        next_cursor = None
+        if page and start + len(page) < len(keys):
+            next_cursor = encode_cursor(-page[-1][0], page[-1][1])
+        return len(keys), [steamid for _, steamid in page], next_cursor
+
+
+search_index = SWASearchIndex()
@@ -12,8 +12,6 @@ from datetime import datetime
 from typing import Any
 from urllib.parse import quote_plus
 
-import dotenv
-
 # from jsonschema import ValidationError, validate
 
 
@@ -56,7 +54,26 @@ BASE_LINKS = [f'https://cdn.ggntw.com/{i}/' for i in url_parts] + [
 
 FILETYPES = ['application/zip', 'application/octet-stream']
 
-dotenv.load_dotenv()
+OPTIONAL_VARIABLES = {'storage': 'mongo',
+                      'sqlite_path': 'swautomatic.sqlite3',
+                      'log_level': 'INFO',
+                      'log_file': 'logs/swautomatic.log',
+                      'log_max_bytes': 5 * 1024 * 1024,
+                      'log_backup_count': 5,
+                      'mirrors': BASE_LINKS,
+                      'extract_workers': 0,
+                      'watch_files': False,
+                      'watch_interval': 2.0,
+                      'archive_cache_size': 0,
+                      'archive_cache_path': '',
+                      'dedupe': False,
+                      'catalog': False,
+                      'cache_ttl': 60.0,
+                      'steam_cache_ttl': 600.0,
+                      'steam_cache_stale': 0.0,
+                      'steam_cache_size': 100000,
+                      'steam_cache_path': ''}
+'Variables which may be absent in the settings file and their defaults.'
 
 
 class SWASettings:
@@ -96,7 +113,54 @@ class SWASettings:
     -   `user_url_id`: (string) - representing the URL of the user's Steam ID.
     -   `user_url_profiles`: (string) - representing the URL of the user's Steam
         profile page.
+    -   `storage`: (string) - the name of the storage backend, `'mongo'` or
+        `'sqlite'` (optional, default `'mongo'`).
+    -   `sqlite_path`: (string) - a path to the SQLite database file
+        (optional, default `'swautomatic.sqlite3'`).
+    -   `log_level`: (string) - the level of the logger (optional, default
+        `'INFO'`).
+    -   `log_file`: (string) - a path to the log file (optional, default
+        `'logs/swautomatic.log'`).
+    -   `log_max_bytes`: (integer) - the size of the log file when it is
+        rotated (optional, default 5 MB).
+    -   `log_backup_count`: (integer) - a number of rotated log files to keep
+        (optional, default `5`).
+    -   `mirrors`: (list) - base URLs of mirrors the archives of assets are
+        downloaded from (optional, default `BASE_LINKS`).
+    -   `extract_workers`: (integer) - a number of threads extracting an
+        archive, `0` means the number of CPUs up to 8 (optional, default `0`).
+    -   `watch_files`: (bool) - if `True` the directories of assets and mods
+        are watched (see ~watcher.`SWAWatcher`) and the state of installed
+        assets is read from the database (optional, default `False`).
+    -   `watch_interval`: (float) - seconds between writes of the watcher
+        (optional, default `2.0`).
+    -   `archive_cache_size`: (integer) - the limit of the cache of
+        downloaded archives in bytes, `0` disables it (optional, default
+        `0`).
+    -   `archive_cache_path`: (string) - the directory of the cache of
+        archives (optional, default `'<common_path>/.swa_archives'`).
+    -   `dedupe`: (bool) - if `True` files of installed assets are
+        hardlinked to identical files of the library (see ~dedupe, optional,
+        default `False`).
+    -   `catalog`: (bool) - if `True` the library is filtered, sorted and
+        counted by the in-memory catalog (see ~catalog.`SWACatalog`,
+        optional, default `False`).
+    -   `cache_ttl`: (float) - seconds the list of tags and the statistics
+        are cached, `0` disables caching (see ~memo.`SWAMemo`, optional,
+        default `60.0`).
+    -   `steam_cache_ttl`: (float) - seconds responses of Steam API are
+        cached, `0` disables the cache (see ~steamcache.`SWASteamCache`,
+        optional, default `600.0`).
+    -   `steam_cache_stale`: (float) - seconds an expired response is still
+        used while it is requested in the background (optional, default
+        `0.0`).
+    -   `steam_cache_size`: (integer) - the largest number of cached
+        responses (optional, default `100000`).
+    -   `steam_cache_path`: (string) - the file of the cache of responses
+        (optional, default `'<common_path>/.swa_steam.sqlite3'`).
     -   `uri`: (string) - representing the connection URI for the MongoDB database.
+    -   `secret_key`: (string) - the secret key of the Flask app (from the
+        environment variable `SECRET_KEY`).
     -   `needed_fields`: (list) - of strings representing the fields that are
         required for a document.
     -   `author_needed_fields`: (list) - a list of fields for `SWAAuthor`.
@@ -106,11 +170,13 @@ class SWASettings:
         Swautomatic fields.
     """
 
-    secret_key = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
-
     # Write an intruction to store the instance of this class
     # It must be a single
     def __init__(self, file_path: str):
+        import dotenv
+
+        dotenv.load_dotenv()
+        self.secret_key = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
         self.file_path = file_path
         if not os.path.exists(file_path):
             error = OSError()
@@ -140,6 +206,44 @@ class SWASettings:
         self.user_favs_url:     str | None = data.get('user_favs_url')
         self.user_url_id:       str | None = data.get('user_url_id')
         self.user_url_profiles: str | None = data.get('user_url_profiles')
+        self.storage:           str = data.get(
+            'storage', OPTIONAL_VARIABLES['storage'])
+        self.sqlite_path:       str = data.get(
+            'sqlite_path', OPTIONAL_VARIABLES['sqlite_path'])
+        self.log_level:         str = data.get(
+            'log_level', OPTIONAL_VARIABLES['log_level'])
+        self.log_file:          str = data.get(
+            'log_file', OPTIONAL_VARIABLES['log_file'])
+        self.log_max_bytes:     int = data.get(
+            'log_max_bytes', OPTIONAL_VARIABLES['log_max_bytes'])
+        self.log_backup_count:  int = data.get(
+            'log_backup_count', OPTIONAL_VARIABLES['log_backup_count'])
+        self.mirrors:          list = list(data.get(
+            'mirrors', OPTIONAL_VARIABLES['mirrors']))
+        self.extract_workers:   int = data.get(
+            'extract_workers', OPTIONAL_VARIABLES['extract_workers'])
+        self.watch_files:      bool = data.get(
+            'watch_files', OPTIONAL_VARIABLES['watch_files'])
+        self.watch_interval:  float = data.get(
+            'watch_interval', OPTIONAL_VARIABLES['watch_interval'])
+        self.archive_cache_size: int = data.get(
+            'archive_cache_size', OPTIONAL_VARIABLES['archive_cache_size'])
+        self.archive_cache_path: str = data.get(
+            'archive_cache_path', OPTIONAL_VARIABLES['archive_cache_path'])
+        self.dedupe:           bool = data.get(
+            'dedupe', OPTIONAL_VARIABLES['dedupe'])
+        self.catalog:          bool = data.get(
+            'catalog', OPTIONAL_VARIABLES['catalog'])
+        self.cache_ttl:       float = data.get(
+            'cache_ttl', OPTIONAL_VARIABLES['cache_ttl'])
+        self.steam_cache_ttl: float = data.get(
+            'steam_cache_ttl', OPTIONAL_VARIABLES['steam_cache_ttl'])
+        self.steam_cache_stale: float = data.get(
+            'steam_cache_stale', OPTIONAL_VARIABLES['steam_cache_stale'])
+        self.steam_cache_size:  int = data.get(
+            'steam_cache_size', OPTIONAL_VARIABLES['steam_cache_size'])
+        self.steam_cache_path:  str = data.get(
+            'steam_cache_path', OPTIONAL_VARIABLES['steam_cache_path'])
         self.uri = self.__build_uri()
         if not self.common_path:
             self.common_path = os.path.abspath(os.path.curdir)
@@ -164,13 +268,15 @@ class SWASettings:
         """Updates an attribute and dumps it to the settings file."""
 
         self.__dict__[name] = value
-        if name in VARIABLES:
+        if name in VARIABLES or name in OPTIONAL_VARIABLES:
             self.__save_settings()
 
     def __save_settings(self) -> None:
         """Dumps the data to json file."""
 
         data = {field: getattr(self, field) for field in VARIABLES}
+        data.update({field: getattr(self, field)
+                     for field in OPTIONAL_VARIABLES})
         with open(self.file_path, 'w', encoding=UTF8) as file:
             json.dump(data, file, indent=4)
 
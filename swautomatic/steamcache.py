@@ -0,0 +1,224 @@
+"""
+swautomatic > `steamcache`
+==========================
+Module for class `SWASteamCache`, a persistent cache of responses of the
+Steam Web API. Details of published files are kept by `publishedfileid` in a
+SQLite file, so repeated operations and restarts of the app do not request
+the same data again.
+
+A response is fresh for `steam_cache_ttl` seconds. If the setting
+`steam_cache_stale` is set, an older response (up to `steam_cache_stale`
+seconds after it expired) is returned at once and requested again in the
+background ("stale-while-revalidate"). At most `steam_cache_size` responses
+are kept, the oldest ones are removed first.
+
+The cache is used by ~utils.`steam_api_data()`, so by `info_steam()`,
+`get_info()`, SWAAsset.`update_record()` and ISWAAssets.`check_updates()`.
+The instance used by the package is `steam_cache`.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from .connection import _logger, _settings
+from .metrics import metrics
+
+__all__ = [
+    'SWASteamCache',
+    'steam_cache',
+]
+
+CACHE_NAME = '.swa_steam.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    steamid INTEGER PRIMARY KEY,
+    fetched REAL NOT NULL,
+    data    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_fetched ON responses (fetched);
+"""
+
+
+class SWASteamCache:
+    """
+    swautomatic > steamcache > `SWASteamCache`
+    ------------------------------------------
+    A cache of details of published files in the file `steam_cache_path`
+    (`<common_path>/.swa_steam.sqlite3` by default). It is disabled if the
+    setting `steam_cache_ttl` is `0`.
+
+    Methods
+    -------
+    -   `lookup()`: returns cached responses and IDs to request.
+    -   `store()`: adds responses and evicts old ones.
+    -   `revalidate()`: requests stale responses in the background.
+    -   `invalidate()`: removes responses of IDs (or every response).
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.conn: Optional[sqlite3.Connection] = None
+        self.conn_path: Optional[str] = None
+        self.pending: set[int] = set()
+
+    @property
+    def enabled(self) -> bool:
+        """`True` if the TTL of the cache is set."""
+        return self.ttl > 0
+
+    @property
+    def ttl(self) -> float:
+        """Seconds a response is fresh."""
+        return float(_settings.steam_cache_ttl or 0)
+
+    @property
+    def stale(self) -> float:
+        """Seconds an expired response is still returned while it is
+        requested again."""
+        return float(_settings.steam_cache_stale or 0)
+
+    @property
+    def max_size(self) -> int:
+        """The largest number of responses."""
+        return int(_settings.steam_cache_size or 0)
+
+    @property
+    def path(self) -> str:
+        """The file of the cache."""
+        return _settings.steam_cache_path or os.path.join(
+            _settings.common_path, CACHE_NAME)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the file of the cache, the caller holds the lock."""
+
+        path = self.path
+        if self.conn is None or self.conn_path != path:
+            if self.conn is not None:
+                self.conn.close()
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False,
+                                        isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript(_SCHEMA)
+            self.conn_path = path
+        return self.conn
+
+    def lookup(self, steamids: Iterable[int]) -> tuple[dict[int, dict],
+                                                      list[int], list[int]]:
+        """
+        swautomatic > steamcache > SWASteamCache.`lookup()`
+        ---------------------------------------------------
+        Reads cached responses of `steamids`.
+
+        Return
+        ------
+        A tuple of responses to use `{steamid: data}`, IDs which must be
+        requested and IDs of stale responses which should be requested in
+        the background.
+        """
+
+        steamids = [int(steamid) for steamid in steamids]
+        if not self.enabled or not steamids:
+            return {}, steamids, []
+        rows = []
+        with self.lock, metrics.time('steam_cache_read'):
+            conn = self._connect()
+            # SQLite limits the number of parameters of a query.
+            for start in range(0, len(steamids), 500):
+                part = steamids[start:start + 500]
+                marks = ', '.join('?' * len(part))
+                rows.extend(conn.execute(
+                    'SELECT steamid, fetched, data FROM responses '
+                    f'WHERE steamid IN ({marks})', part).fetchall())
+        now = time.time()
+        found, stale = {}, []
+        for steamid, fetched, data in rows:
+            age = now - fetched
+            if age <= self.ttl:
+                found[steamid] = json.loads(data)
+            elif age <= self.ttl + self.stale:
+                found[steamid] = json.loads(data)
+                stale.append(steamid)
+        missing = [steamid for steamid in steamids if steamid not in found]
+        metrics.inc('steam_cache_hits', len(found) - len(stale))
+        metrics.inc('steam_cache_stale', len(stale))
+        metrics.inc('steam_cache_misses', len(missing))
+        return found, missing, stale
+
+    def store(self, items: Iterable[dict]) -> int:
+        """Adds responses (items of `publishedfiledetails`), removes the
+        oldest responses over the limit. Returns a number of added
+        responses."""
+
+        if not self.enabled:
+            return 0
+        now = time.time()
+        rows = [(int(item['publishedfileid']), now, json.dumps(item))
+                for item in items if item.get('publishedfileid')]
+        if not rows:
+            return 0
+        with self.lock, metrics.time('steam_cache_write'):
+            conn = self._connect()
+            with conn:
+                conn.execute('BEGIN')
+                conn.executemany(
+                    'INSERT OR REPLACE INTO responses (steamid, fetched, '
+                    'data) VALUES (?, ?, ?)', rows)
+                if self.max_size > 0:
+                    conn.execute(
+                        'DELETE FROM responses WHERE steamid IN (SELECT '
+                        'steamid FROM responses ORDER BY fetched DESC '
+                        'LIMIT -1 OFFSET ?)', (self.max_size,))
+        return len(rows)
+
+    def revalidate(self, steamids: Iterable[int],
+                   fetch: Callable[[list[int]], list[dict]]) -> None:
+        """Requests responses of `steamids` by `fetch()` in a background
+        thread and stores them. IDs already being requested are skipped."""
+
+        with self.lock:
+            steamids = [int(steamid) for steamid in steamids
+                        if int(steamid) not in self.pending]
+            self.pending.update(steamids)
+        if not steamids:
+            return
+
+        def run() -> None:
+            try:
+                self.store(fetch(steamids))
+            except Exception as error:  # pylint: disable=broad-except
+                _logger.warning('Revalidation of Steam data failed: %s',
+                                error)
+            finally:
+                with self.lock:
+                    self.pending.difference_update(steamids)
+
+        threading.Thread(target=run, name='steam-cache', daemon=True).start()
+
+    def invalidate(self, steamids: Optional[Iterable[int]] = None) -> None:
+        """Removes responses of `steamids` (every response if `None`)."""
+
+        with self.lock:
+            conn = self._connect()
+            if steamids is None:
+                conn.execute('DELETE FROM responses')
+                return
+            conn.executemany('DELETE FROM responses WHERE steamid = ?',
+                             [(int(steamid),) for steamid in steamids])
+
+    def close(self) -> None:
+        """Closes the file of the cache."""
+
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+steam_cache = SWASteamCache()
@@ -0,0 +1,881 @@
+"""
+swautomatic > `storage`
+=======================
+Module for storage backends of Swautomatic project. The interfaces
+(`ISWAAssets`, `ISWATags`) talk to a `SWAStorage` object instead of pymongo
+collections, so the same code works with MongoDB and with an embedded SQLite
+database.
+
+Filters are given as a small subset of MongoDB queries: equality on a field,
+`{'$in': [...]}`, `{'$gt': value}`, `{'$lt': value}` (the operators can be
+combined) and a tag name for the field `tags`. The field `tags` also
+takes `{'$all': [...], '$in': [...], '$nin': [...]}` (every, any, none of
+the tags). Every backend must support this subset.
+
+Every write calls the listeners of the storage (see
+SWAStorage.`add_listener()`), so in-process caches of records (e.g.
+~catalog.`SWACatalog`) are refreshed after writes. Writes of other processes
+(workers of the app, the command line) are seen by SWAStorage.`revision()`,
+a counter of writes kept in the database, which caches follow by
+`SWARevision`.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+__all__ = [
+    'SWARevision',
+    'SWAStorage',
+    'MongoStorage',
+    'SQLiteStorage',
+    'create_storage',
+]
+
+MONGO = 'mongo'
+'The name of the MongoDB storage backend.'
+SQLITE = 'sqlite'
+'The name of the SQLite storage backend.'
+ASSETS = 'assets'
+'The kind of changes of records of assets, see SWAStorage.`add_listener()`.'
+TAGS = 'tags'
+'The kind of changes of tags, see SWAStorage.`add_listener()`.'
+
+_FIELD_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+REVISION_INTERVAL = 1.0
+'The least number of seconds between reads of the counter of writes.'
+_MAX_PARAMS = 500
+'SQLite limits the number of parameters of a query (999 in old builds).'
+
+
+class SWAStorage(ABC):
+    """
+    swautomatic > storage > `SWAStorage`
+    ------------------------------------
+    The base class of storage backends. It describes every operation which
+    is used by the interfaces. Records of assets are dictionaries with the
+    same fields as the documents in the MongoDB collection `assets`.
+
+    Methods
+    -------
+    -   `find_asset()`: Returns a record of the asset or `None`.
+    -   `find_assets()`: Iterates over records by the filter.
+    -   `count_assets()`: Counts records by the filter.
+    -   `list_steamids()`: Returns a set of Steam IDs in the storage.
+    -   `upsert_asset()`: Updates the record or inserts a new one.
+    -   `insert_assets()`: Inserts new records.
+    -   `update_asset()`: Sets fields of the record.
+    -   `bulk_update_assets()`: Sets fields of many records at once.
+    -   `delete_assets()`: Deletes records.
+    -   `list_tags()`, `ensure_tag()`, `insert_tags()`, `delete_tags()`:
+        operations with tags.
+    -   `revision()`: Returns the counter of writes of every process.
+    -   `last_write()`: Returns the counter before and after the last write
+        of the thread.
+    -   `close()`: Closes the connection.
+    -   `add_listener()`, `remove_listener()`: subscribe to writes.
+    """
+
+    name = ''
+
+    def __init__(self) -> None:
+        self.listeners: list[Callable[[str, Optional[set[int]]], None]] = []
+        self.local = threading.local()
+
+    def add_listener(
+            self, callback: Callable[[str, Optional[set[int]]], None]) -> None:
+        """
+        swautomatic > storage > SWAStorage.`add_listener()`
+        ---------------------------------------------------
+        Calls `callback(kind, steamids)` after every write. `kind` is
+        `ASSETS` or `TAGS`, `steamids` is a set of Steam IDs of changed
+        records or `None` if they are unknown.
+        """
+
+        self.listeners.append(callback)
+
+    def remove_listener(
+            self, callback: Callable[[str, Optional[set[int]]], None]) -> None:
+        """Removes the listener added by `add_listener()`."""
+
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self, kind: str,
+                steamids: Optional[Iterable[int]] = None) -> None:
+        steamids = None if steamids is None else {int(i) for i in steamids}
+        for callback in list(self.listeners):
+            callback(kind, steamids)
+
+    def last_write(self) -> tuple[Optional[int], Optional[int]]:
+        """Returns the counter of writes (see `revision()`) before and after
+        the last write of the thread, `(None, None)` if it is unknown. It is
+        read by listeners, so they can tell writes of the process from
+        writes of other processes."""
+
+        return getattr(self.local, 'write', (None, None))
+
+    @abstractmethod
+    def find_asset(self, steamid: int) -> Optional[dict]:
+        """Returns a record of the asset with `steamid` or `None`."""
+
+    @abstractmethod
+    def find_assets(self, fltr: Optional[dict] = None, skip: int = 0,
+                    limit: int = 0,
+                    fields: Optional[Iterable[str]] = None,
+                    sort: Optional[str] = None,
+                    reverse: bool = False) -> Iterator[dict]:
+        """Iterates over records matching `fltr`. If `fields` is given only
+        these fields are returned. Records are ordered by the field `sort`
+        (by `steamid` in SQLite and in the natural order in MongoDB if it is
+        `None`), descending if `reverse` is `True`."""
+
+    def iter_assets(self, fltr: Optional[dict] = None,
+                    fields: Optional[Iterable[str]] = None,
+                    batch_size: int = 1000) -> Iterator[dict]:
+        """Iterates over every record matching `fltr` ordered by `steamid`,
+        reading `batch_size` records at a time, so the records are never in
+        memory together."""
+
+        fltr = dict(fltr or {})
+        steamid_fltr = fltr.pop('steamid', None)
+        if steamid_fltr is not None and not isinstance(steamid_fltr, dict):
+            steamid_fltr = {'$in': [steamid_fltr]}
+        if fields is not None:
+            fields = list(dict.fromkeys(['steamid', *fields]))
+        last = None
+        while True:
+            page_fltr = dict(fltr)
+            if steamid_fltr is not None or last is not None:
+                page_fltr['steamid'] = dict(steamid_fltr or {})
+                if last is not None:
+                    page_fltr['steamid']['$gt'] = last
+            records = list(self.find_assets(page_fltr, limit=batch_size,
+                                            fields=fields, sort='steamid'))
+            yield from records
+            if len(records) < batch_size:
+                return
+            last = records[-1]['steamid']
+
+    @abstractmethod
+    def count_assets(self, fltr: Optional[dict] = None) -> int:
+        """Counts records matching `fltr`."""
+
+    @abstractmethod
+    def list_steamids(self) -> set[int]:
+        """Returns a set of Steam IDs of every record."""
+
+    @abstractmethod
+    def upsert_asset(self, data: dict, session=None) -> int:
+        """Updates the record with `data['steamid']` or inserts a new one.
+        Returns a number of changed records."""
+
+    @abstractmethod
+    def insert_assets(self, docs: list[dict], session=None) -> int:
+        """Inserts new records. Returns a number of inserted records."""
+
+    @abstractmethod
+    def update_asset(self, steamid: int, fields: dict, session=None) -> int:
+        """Sets `fields` of the record. Returns a number of changed
+        records."""
+
+    @abstractmethod
+    def bulk_update_assets(self, updates: dict[int, dict],
+                           session=None) -> int:
+        """Sets fields of many records, `updates` is a dictionary
+        `{steamid: fields}`. Returns a number of changed records."""
+
+    @abstractmethod
+    def delete_assets(self, steamids: Iterable[int], session=None) -> int:
+        """Deletes records. Returns a number of deleted records."""
+
+    @abstractmethod
+    def list_tags(self) -> set[str]:
+        """Returns a set of tags."""
+
+    @abstractmethod
+    def ensure_tag(self, name: str) -> None:
+        """Inserts the tag if it does not exist."""
+
+    @abstractmethod
+    def insert_tags(self, names: Iterable[str]) -> int:
+        """Inserts tags. Returns a number of inserted tags."""
+
+    @abstractmethod
+    def delete_tags(self, names: Iterable[str]) -> int:
+        """Deletes tags. Returns a number of deleted tags."""
+
+    @abstractmethod
+    def revision(self) -> int:
+        """Returns the counter of writes to the storage. It is stored in the
+        database, so it changes after writes of every process."""
+
+    def close(self) -> None:
+        """Closes the connection."""
+
+
+class SWARevision:
+    """
+    swautomatic > storage > `SWARevision`
+    -------------------------------------
+    Follows the counter of writes of the storage for an in-process cache
+    (e.g. ~memo.`SWAMemo`, ~catalog.`SWACatalog`), so the cache finds writes
+    of other processes. The counter is read at most every `interval`
+    seconds.
+
+    Methods
+    -------
+    -   `reset()`: reads the counter, e.g. before the cache is loaded.
+    -   `local()`: follows a write of the process, it is called by a
+        listener of the storage.
+    -   `changed()`: returns `True` if another process wrote since.
+    """
+
+    def __init__(self, storage: SWAStorage,
+                 interval: float = REVISION_INTERVAL) -> None:
+        self.storage = storage
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.revision: Optional[int] = None
+        self.checked = 0.0
+
+    def reset(self) -> None:
+        """Reads the counter of writes."""
+
+        revision = self.storage.revision()
+        with self.lock:
+            self.revision = revision
+            self.checked = time.monotonic()
+
+    def local(self) -> None:
+        """Moves to the counter after the last write of the thread if no
+        other process wrote before it."""
+
+        before, after = self.storage.last_write()
+        with self.lock:
+            if before is not None and before == self.revision:
+                self.revision = after
+
+    def changed(self) -> bool:
+        """Returns `True` if the counter of writes changed by writes of
+        other processes since the last call."""
+
+        now = time.monotonic()
+        with self.lock:
+            if self.revision is not None and \
+                    now - self.checked < self.interval:
+                return False
+            self.checked = now
+        revision = self.storage.revision()
+        with self.lock:
+            changed = self.revision is not None and revision != self.revision
+            self.revision = revision
+        return changed
+
+
+class MongoStorage(SWAStorage):
+    """
+    swautomatic > storage > `MongoStorage`
+    --------------------------------------
+    The storage backed by MongoDB collections `assets` and `tags`.
+
+    Parameters
+    ----------
+    -   `uri` (str): a connection URI for MongoDB.
+    -   `database_name` (str): a name of the database.
+    """
+
+    name = MONGO
+
+    def __init__(self, uri: str, database_name: str) -> None:
+        # pymongo is imported here, it is slow to import and is not needed
+        # by other backends.
+        from pymongo import MongoClient
+
+        super().__init__()
+        self.client = MongoClient(uri)
+        self.db = self.client.get_database(database_name)
+        self.assets = self.db.get_collection('assets')
+        self.tags = self.db.get_collection('tags')
+        self.meta = self.db.get_collection('meta')
+        self.assets.create_index('steamid')
+        self.assets.create_index('tags')
+        self.assets.create_index([('is_installed', 1), ('need_update', 1)])
+        self.tags.create_index('tag')
+
+    def find_asset(self, steamid: int) -> Optional[dict]:
+        return self.assets.find_one({'steamid': steamid})
+
+    def find_assets(self, fltr: Optional[dict] = None, skip: int = 0,
+                    limit: int = 0,
+                    fields: Optional[Iterable[str]] = None,
+                    sort: Optional[str] = None,
+                    reverse: bool = False) -> Iterator[dict]:
+        projection = None
+        if fields is not None:
+            projection = {field: True for field in fields}
+            projection.update({'_id': False})
+        order = None
+        if sort is not None:
+            direction = -1 if reverse else 1
+            order = [(sort, direction), ('steamid', direction)]
+            if sort == 'steamid':
+                order = order[1:]
+        return self.assets.find(filter=fltr or {}, projection=projection,
+                                skip=skip, limit=limit, sort=order)
+
+    def iter_assets(self, fltr: Optional[dict] = None,
+                    fields: Optional[Iterable[str]] = None,
+                    batch_size: int = 1000) -> Iterator[dict]:
+        # The cursor already reads the records by batches.
+        return self.find_assets(fltr, fields=fields,
+                                sort='steamid').batch_size(batch_size)
+
+    def count_assets(self, fltr: Optional[dict] = None) -> int:
+        return self.assets.count_documents(fltr or {})
+
+    def list_steamids(self) -> set[int]:
+        data = self.assets.find({}, projection={'steamid': True})
+        return set(int(asset['steamid']) for asset in data)
+
+    def upsert_asset(self, data: dict, session=None) -> int:
+        result = self.assets.update_one(filter={'steamid': data['steamid']},
+                                        update={'$set': data},
+                                        upsert=True,
+                                        session=session)
+        self._notify(ASSETS, [data['steamid']])
+        return result.modified_count or int(result.upserted_id is not None)
+
+    def insert_assets(self, docs: list[dict], session=None) -> int:
+        if not docs:
+            return 0
+        count = len(self.assets.insert_many(docs, session=session).inserted_ids)
+        self._notify(ASSETS, [doc['steamid'] for doc in docs])
+        return count
+
+    def update_asset(self, steamid: int, fields: dict, session=None) -> int:
+        count = self.assets.update_one({'steamid': steamid},
+                                       {'$set': fields},
+                                       session=session).modified_count
+        self._notify(ASSETS, [steamid])
+        return count
+
+    def bulk_update_assets(self, updates: dict[int, dict],
+                           session=None) -> int:
+        from pymongo import UpdateOne
+
+        bulk = [UpdateOne({'steamid': steamid}, {'$set': fields})
+                for steamid, fields in updates.items()]
+        if not bulk:
+            return 0
+        count = self.assets.bulk_write(bulk, session=session).modified_count
+        self._notify(ASSETS, updates)
+        return count
+
+    def delete_assets(self, steamids: Iterable[int], session=None) -> int:
+        steamids = list(steamids)
+        count = self.assets.delete_many({'steamid': {'$in': steamids}},
+                                        session=session).deleted_count
+        self._notify(ASSETS, steamids)
+        return count
+
+    def list_tags(self) -> set[str]:
+        return set(tag['tag'] for tag in self.tags.find({}))
+
+    def ensure_tag(self, name: str) -> None:
+        result = self.tags.update_one({'tag': name},
+                                      {'$setOnInsert': {'tag': name}},
+                                      upsert=True)
+        if result.upserted_id is not None:
+            self._notify(TAGS)
+
+    def insert_tags(self, names: Iterable[str]) -> int:
+        tags = [{'tag': name} for name in names]
+        if not tags:
+            return 0
+        count = len(self.tags.insert_many(tags).inserted_ids)
+        self._notify(TAGS)
+        return count
+
+    def delete_tags(self, names: Iterable[str]) -> int:
+        count = self.tags.delete_many(
+            {'tag': {'$in': list(names)}}).deleted_count
+        self._notify(TAGS)
+        return count
+
+    def _notify(self, kind: str,
+                steamids: Optional[Iterable[int]] = None) -> None:
+        from pymongo import ReturnDocument
+
+        document = self.meta.find_one_and_update(
+            {'_id': 'revision'}, {'$inc': {'value': 1}}, upsert=True,
+            return_document=ReturnDocument.AFTER)
+        self.local.write = (document['value'] - 1, document['value'])
+        super()._notify(kind, steamids)
+
+    def revision(self) -> int:
+        document = self.meta.find_one({'_id': 'revision'})
+        return int(document['value']) if document else 0
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# Fields which are stored in their own columns of the table `assets`, other
+# fields are stored as JSON in the column `extra`.
+_COLUMNS = ('steamid', 'name', 'tags', 'preview_url', 'file_size',
+            'time_created', 'time_updated', 'time_local', 'is_installed',
+            'need_update', 'type', 'path', 'author')
+_TIME_COLUMNS = ('time_created', 'time_updated', 'time_local')
+_BOOL_COLUMNS = ('is_installed', 'need_update')
+_JSON_COLUMNS = ('tags', 'author')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    steamid      INTEGER PRIMARY KEY,
+    name         TEXT,
+    tags         TEXT,
+    preview_url  TEXT,
+    file_size    INTEGER NOT NULL DEFAULT 0,
+    time_created TEXT,
+    time_updated TEXT,
+    time_local   TEXT,
+    is_installed INTEGER NOT NULL DEFAULT 0,
+    need_update  INTEGER NOT NULL DEFAULT 0,
+    type         TEXT,
+    path         TEXT,
+    author       TEXT,
+    extra        TEXT
+);
+CREATE TABLE IF NOT EXISTS asset_tags (
+    steamid INTEGER NOT NULL REFERENCES assets (steamid) ON DELETE CASCADE,
+    tag     TEXT NOT NULL,
+    PRIMARY KEY (steamid, tag)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS asset_tags_tag ON asset_tags (tag, steamid);
+CREATE INDEX IF NOT EXISTS assets_status ON assets (is_installed, need_update);
+CREATE INDEX IF NOT EXISTS assets_type ON assets (type);
+CREATE TABLE IF NOT EXISTS revision (
+    id    INTEGER PRIMARY KEY CHECK (id = 0),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO revision (id, value) VALUES (0, 0);
+"""
+
+# Every change of `assets` and `tags` increments the counter of writes, also
+# changes made by other connections.
+_TRIGGERS = ''.join(
+    f'CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_revision '
+    f'AFTER {event} ON {table} BEGIN '
+    'UPDATE revision SET value = value + 1 WHERE id = 0; END;\n'
+    for table in ('assets', 'tags') for event in ('INSERT', 'UPDATE', 'DELETE'))
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    raise TypeError(f'Object of type {type(value).__name__} is not '
+                    'JSON serializable')
+
+
+def _json_hook(value: dict) -> Any:
+    if len(value) == 1 and '$date' in value:
+        return datetime.fromisoformat(value['$date'])
+    return value
+
+
+def _dumps(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, default=_json_default)
+
+
+def _loads(value: Optional[str]) -> Any:
+    if value is None:
+        return None
+    return json.loads(value, object_hook=_json_hook)
+
+
+class SQLiteStorage(SWAStorage):
+    """
+    swautomatic > storage > `SQLiteStorage`
+    ---------------------------------------
+    The embedded storage backed by an SQLite database in WAL mode. Tags of
+    assets are kept in the indexed table `asset_tags`, so filtering by a tag
+    does not scan every record.
+
+    The connection is shared between threads and guarded by a lock.
+
+    Parameters
+    ----------
+    -   `path` (str): a path to the database file or `':memory:'`.
+    """
+
+    name = SQLITE
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(_SCHEMA + _TRIGGERS)
+
+    # region helpers
+    def _transaction(self):
+        return _Transaction(self)
+
+    @staticmethod
+    def _encode(field: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if field in _TIME_COLUMNS:
+            return value.isoformat() if isinstance(value, datetime) else value
+        if field in _BOOL_COLUMNS:
+            return int(bool(value))
+        if field in _JSON_COLUMNS:
+            return _dumps(value)
+        return value
+
+    @staticmethod
+    def _columns(fields: Optional[Iterable[str]]) -> str:
+        """Returns the columns to read for `fields`. The column `extra` is
+        read only if a field is not stored in its own column."""
+
+        if fields is None:
+            return '*'
+        fields = set(fields)
+        columns = [field for field in _COLUMNS if field in fields]
+        if fields - set(_COLUMNS):
+            columns.append('extra')
+        return ', '.join(columns or ['steamid'])
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> dict:
+        data = {}
+        keys = row.keys()
+        for field in _COLUMNS:
+            if field not in keys:
+                continue
+            value = row[field]
+            if value is not None:
+                if field in _TIME_COLUMNS:
+                    value = datetime.fromisoformat(value)
+                elif field in _BOOL_COLUMNS:
+                    value = bool(value)
+                elif field in _JSON_COLUMNS:
+                    value = _loads(value)
+            data[field] = value
+        extra = _loads(row['extra']) if 'extra' in keys else None
+        if extra:
+            data.update(extra)
+        return data
+
+    @staticmethod
+    def _values(values: list, params: list) -> str:
+        """Returns the list of `values` for `IN` and adds its parameters.
+        Lists longer than `_MAX_PARAMS` are passed as one JSON array, so a
+        query is not split and keeps its order and limit."""
+
+        if len(values) <= _MAX_PARAMS:
+            params.extend(values)
+            return '(' + ', '.join('?' * len(values)) + ')'
+        params.append(json.dumps(values))
+        return '(SELECT value FROM json_each(?))'
+
+    def _where(self, fltr: Optional[dict]) -> tuple[str, list]:
+        """Translates the supported subset of MongoDB filters to SQL."""
+
+        clauses = []
+        params: list = []
+        for field, value in (fltr or {}).items():
+            if field == 'tags':
+                operators = value if isinstance(value, dict) else \
+                    {'$all': [value]}
+                if not set(operators) <= {'$all', '$in', '$nin'}:
+                    raise ValueError(f'Unsupported filter for {field}: {value}')
+                for operator, tags in operators.items():
+                    tags = list(tags)
+                    if operator == '$all':
+                        for tag in tags:
+                            clauses.append('steamid IN (SELECT steamid FROM '
+                                           'asset_tags WHERE tag = ?)')
+                            params.append(tag)
+                        continue
+                    negation = 'NOT ' if operator == '$nin' else ''
+                    marks = self._values(tags, params)
+                    clauses.append(f'steamid {negation}IN (SELECT steamid '
+                                   f'FROM asset_tags WHERE tag IN {marks})')
+                continue
+            if field not in _COLUMNS or field in _JSON_COLUMNS:
+                raise ValueError(f'Unsupported filter field: {field}')
+            if not isinstance(value, dict):
+                clauses.append(f'{field} IS ?')
+                params.append(self._encode(field, value))
+                continue
+            if not value or not set(value) <= {'$in', '$gt', '$lt'}:
+                raise ValueError(f'Unsupported filter for {field}: {value}')
+            if '$in' in value:
+                values = [self._encode(field, item) for item in value['$in']]
+                clauses.append(f'{field} IN {self._values(values, params)}')
+            for operator, sign in (('$gt', '>'), ('$lt', '<')):
+                if operator in value:
+                    clauses.append(f'{field} {sign} ?')
+                    params.append(self._encode(field, value[operator]))
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def _set_tags(self, steamid: int, tags: Optional[list]) -> None:
+        self.conn.execute('DELETE FROM asset_tags WHERE steamid = ?',
+                          (steamid,))
+        if tags:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO asset_tags (steamid, tag) VALUES (?, ?)',
+                [(steamid, tag) for tag in tags])
+
+    def _update(self, steamid: int, fields: dict) -> int:
+        fields = {key: value for key, value in fields.items()
+                  if key not in ('steamid', '_id')}
+        columns = {key: value for key, value in fields.items()
+                   if key in _COLUMNS}
+        extra = {key: value for key, value in fields.items()
+                 if key not in _COLUMNS}
+        if extra:
+            row = self.conn.execute(
+                'SELECT extra FROM assets WHERE steamid = ?',
+                (steamid,)).fetchone()
+            if row is None:
+                return 0
+            stored = _loads(row['extra']) or {}
+            stored.update(extra)
+            columns['extra'] = stored
+        if not columns:
+            return 0
+        assignments = ', '.join(f'{key} = ?' for key in columns)
+        params = [_dumps(value) if key == 'extra' else
+                  self._encode(key, value) for key, value in columns.items()]
+        count = self.conn.execute(
+            f'UPDATE assets SET {assignments} WHERE steamid = ?',
+            params + [steamid]).rowcount
+        if count and 'tags' in columns:
+            self._set_tags(steamid, columns['tags'])
+        return count
+
+    def _insert(self, data: dict, replace: bool = False) -> int:
+        steamid = int(data['steamid'])
+        extra = {key: value for key, value in data.items()
+                 if key not in _COLUMNS and key != '_id'}
+        columns = [field for field in _COLUMNS if field in data]
+        values = [steamid if field == 'steamid' else
+                  self._encode(field, data[field]) for field in columns]
+        columns.append('extra')
+        values.append(_dumps(extra) if extra else None)
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        marks = ', '.join('?' * len(columns))
+        self.conn.execute(
+            f'{verb} INTO assets ({", ".join(columns)}) VALUES ({marks})',
+            values)
+        self._set_tags(steamid, data.get('tags'))
+        return 1
+    # endregion
+
+    def find_asset(self, steamid: int) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM assets WHERE steamid = ?',
+                                    (steamid,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def find_assets(self, fltr: Optional[dict] = None, skip: int = 0,
+                    limit: int = 0,
+                    fields: Optional[Iterable[str]] = None,
+                    sort: Optional[str] = None,
+                    reverse: bool = False) -> Iterator[dict]:
+        where, params = self._where(fltr)
+        direction = ' DESC' if reverse else ''
+        order = f'steamid{direction}'
+        if sort is not None and sort != 'steamid':
+            if not _FIELD_NAME.fullmatch(sort) or sort in _JSON_COLUMNS:
+                raise ValueError(f'Unsupported sort field: {sort}')
+            column = sort if sort in _COLUMNS else \
+                f"json_extract(extra, '$.{sort}')"
+            order = f'{column}{direction}, {order}'
+        query = (f'SELECT {self._columns(fields)} FROM assets{where} '
+                 f'ORDER BY {order}')
+        if limit or skip:
+            query += ' LIMIT ? OFFSET ?'
+            params += [limit or -1, skip]
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        for row in rows:
+            data = self._decode(row)
+            if fields is not None:
+                data = {field: data.get(field) for field in fields}
+            yield data
+
+    def count_assets(self, fltr: Optional[dict] = None) -> int:
+        where, params = self._where(fltr)
+        with self.lock:
+            return self.conn.execute(f'SELECT COUNT(*) FROM assets{where}',
+                                     params).fetchone()[0]
+
+    def list_steamids(self) -> set[int]:
+        with self.lock:
+            rows = self.conn.execute('SELECT steamid FROM assets').fetchall()
+        return set(row[0] for row in rows)
+
+    def upsert_asset(self, data: dict, session=None) -> int:
+        with self._transaction():
+            count = self._update(int(data['steamid']), data)
+            if not count:
+                exists = self.conn.execute(
+                    'SELECT 1 FROM assets WHERE steamid = ?',
+                    (int(data['steamid']),)).fetchone()
+                if exists is None:
+                    count = self._insert(data)
+        self._notify(ASSETS, [data['steamid']])
+        return count
+
+    def insert_assets(self, docs: list[dict], session=None) -> int:
+        with self._transaction():
+            for doc in docs:
+                self._insert(doc)
+        self._notify(ASSETS, [doc['steamid'] for doc in docs])
+        return len(docs)
+
+    def update_asset(self, steamid: int, fields: dict, session=None) -> int:
+        with self._transaction():
+            count = self._update(steamid, fields)
+        self._notify(ASSETS, [steamid])
+        return count
+
+    def bulk_update_assets(self, updates: dict[int, dict],
+                           session=None) -> int:
+        count = 0
+        with self._transaction():
+            for steamid, fields in updates.items():
+                count += self._update(steamid, fields)
+        self._notify(ASSETS, updates)
+        return count
+
+    def delete_assets(self, steamids: Iterable[int], session=None) -> int:
+        steamids = list(steamids)
+        if not steamids:
+            return 0
+        count = 0
+        with self._transaction():
+            for i in range(0, len(steamids), _MAX_PARAMS):
+                chunk = steamids[i:i + _MAX_PARAMS]
+                marks = ', '.join('?' * len(chunk))
+                count += self.conn.execute(
+                    f'DELETE FROM assets WHERE steamid IN ({marks})',
+                    chunk).rowcount
+        self._notify(ASSETS, steamids)
+        return count
+
+    def list_tags(self) -> set[str]:
+        with self.lock:
+            rows = self.conn.execute('SELECT tag FROM tags').fetchall()
+        return set(row[0] for row in rows)
+
+    def ensure_tag(self, name: str) -> None:
+        with self._transaction():
+            inserted = self.conn.execute(
+                'INSERT OR IGNORE INTO tags (tag) VALUES (?)',
+                (name,)).rowcount
+        if inserted:
+            self._notify(TAGS)
+
+    def insert_tags(self, names: Iterable[str]) -> int:
+        with self._transaction():
+            count = self.conn.executemany(
+                'INSERT OR IGNORE INTO tags (tag) VALUES (?)',
+                [(name,) for name in names]).rowcount
+        self._notify(TAGS)
+        return count
+
+    def delete_tags(self, names: Iterable[str]) -> int:
+        with self._transaction():
+            count = self.conn.executemany(
+                'DELETE FROM tags WHERE tag = ?',
+                [(name,) for name in names]).rowcount
+        self._notify(TAGS)
+        return count
+
+    def revision(self) -> int:
+        with self.lock:
+            return self.conn.execute(
+                'SELECT value FROM revision WHERE id = 0').fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class _Transaction:
+    """Holds the lock of the storage and wraps the block in a transaction."""
+
+    def __init__(self, storage: SQLiteStorage) -> None:
+        self.storage = storage
+
+    def __enter__(self):
+        self.storage.lock.acquire()
+        try:
+            # The write lock is taken at once, so no other process writes
+            # between the reads of the counter of writes.
+            self.storage.conn.execute('BEGIN IMMEDIATE')
+            self.before = self._revision()
+        except BaseException:
+            self.storage.lock.release()
+            raise
+        return self.storage.conn
+
+    def _revision(self) -> int:
+        return self.storage.conn.execute(
+            'SELECT value FROM revision WHERE id = 0').fetchone()[0]
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None:
+                after = self._revision()
+                self.storage.conn.execute('COMMIT')
+                self.storage.local.write = (self.before, after)
+            else:
+                self.storage.conn.execute('ROLLBACK')
+        finally:
+            self.storage.lock.release()
+        return False
+
+
+def create_storage(settings) -> SWAStorage:
+    """
+    swautomatic > storage > `create_storage()`
+    ------------------------------------------
+    Creates the storage backend chosen in the settings (`storage` field).
+
+    Raises
+    ------
+    -   `ValueError`: If the backend is unknown.
+    """
+
+    if settings.storage == MONGO:
+        return MongoStorage(settings.uri, settings.database_name)
+    if settings.storage == SQLITE:
+        return SQLiteStorage(settings.sqlite_path)
+    raise ValueError(f'Unknown storage backend: {settings.storage}')
@@ -5,24 +5,47 @@ Module for class `SWATag` and its interface `ISWATags`.
 """
 
 import re
+from typing import Iterable
 
-import requests as rq
-from bs4 import BeautifulSoup as bs
-
-from .connection import _logger, _settings, _tags_coll
+from .connection import _logger, _settings, _storage
+from .memo import memo
+from .metrics import metrics
 from .results import CommonResult, DeleteResult
+from .storage import TAGS
 
 __all__ = [
     'SWATag',
-    'ISWATags'
+    'ISWATags',
+    'ensure_tags',
 ]
 
 
+def ensure_tags(names: Iterable[str]) -> int:
+    """
+    swautomatic > tag > `ensure_tags()`
+    -----------------------------------
+    Inserts tags which are not in the database, e.g. new tags of assets
+    written from Steam. The list of tags is cached (see ~memo.`SWAMemo`),
+    so nothing is written if every tag exists.
+
+    Return
+    ------
+    A number of inserted tags.
+    """
+
+    known = memo.get('tags', _storage.list_tags, kinds=(TAGS,))
+    missing = set(names) - set(known)
+    if not missing:
+        return 0
+    return _storage.insert_tags(sorted(missing))
+
+
 class SWATag:
     """
     swautomatic > tag > `SWATag`
     ----------------------------
-    Simple class storing id and name of the tag.
+    Simple class storing id and name of the tag. Tags are added to the
+    database by the writes of assets (see `ensure_tags()`).
 
     Attributes
     ----------
@@ -35,9 +58,6 @@ class SWATag:
 
     def __init__(self, tag: str):
         self.tag = tag
-        data = _tags_coll.find_one({'tag': tag})
-        if not data:
-            _tags_coll.insert_one({'tag': tag})
 
     def __str__(self) -> str:
         return self.tag
@@ -49,7 +69,7 @@ class SWATag:
         Returns a number of assets with the tag.
         """
 
-        return _tags_coll.count_documents({'tags': self.tag})
+        return _storage.count_assets({'tags': self.tag})
 
 
 class ISWATags:
@@ -60,7 +80,7 @@ class ISWATags:
     """
 
     def __init__(self) -> None:
-        self.coll = _tags_coll
+        self.storage = _storage
 
     def get_tag(self, name: str) -> SWATag:
         """
@@ -85,11 +105,13 @@ class ISWATags:
         """
         swautomatic > tag > ISWATags.`list_tags()`
         ------------------------------------------
-        Returns a set of tags in the database.
+        Returns a set of tags in the database. The set is cached until tags
+        are written (see ~memo.`SWAMemo`).
         """
 
-        return set(tag['tag'] for tag in self.coll.find({}))
+        return set(memo.get('tags', self.storage.list_tags, kinds=(TAGS,)))
 
+    @metrics.timed('steam_tags')
     def list_tags_remote(self) -> set[str]:
         """
         swautomatic > tag > ISWATags.`list_tags_remote()`
@@ -101,6 +123,9 @@ class ISWATags:
         -   `set[str]`: set of tags or set with 'No tags' tag.
         """
 
+        import requests as rq
+        from bs4 import BeautifulSoup as bs
+
         tags = set(['No tags'])
         try:
             response = rq.get(
@@ -123,7 +148,7 @@ class ISWATags:
 
         # TODO: add checking if given tags are exist.
         names = list(names)
-        count = self.coll.delete_many({'tag': {'$in': names}}).deleted_count
+        count = self.storage.delete_tags(names)
         return DeleteResult(
             message=f'{count} tags were deleted. Deleted tags: {names}',
             count=count, size=0)
@@ -136,12 +161,12 @@ class ISWATags:
         """
 
         names = list(names)
-        tags = [{'tag': tag} for tag in names]
-        if self.coll.find_one({'tag': 'No tags'}) is None:
-            tags.append({'tag': 'No tags'})
-        self.coll.insert_many(tags)
+        if 'No tags' not in names and 'No tags' not in self.list_tags():
+            names.append('No tags')
+        self.storage.insert_tags(names)
 
     # UPDATE
+    @metrics.timed('update_tags')
     def update_tags(self) -> CommonResult:
         """
         swautomatic > tag > ISWATags.`update_tags()`
@@ -0,0 +1,105 @@
+"""
+swautomatic > `trash`
+=====================
+Module for fast deleting of directories. A directory is renamed into the
+trash directory `<common_path>/.swa_trash` (an atomic operation if both are
+on the same filesystem) and removed from the disk by a pool of background
+threads, so deleting returns at once.
+
+Directories left in the trash by a previous run are purged when the pool is
+started. If the directory cannot be renamed (e.g. it is on another
+filesystem) it is removed synchronously.
+"""
+
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from .connection import _logger, _settings
+from .metrics import metrics
+
+__all__ = [
+    'move_to_trash',
+    'wait_purge',
+]
+
+TRASH_NAME = '.swa_trash'
+PURGE_WORKERS = 4
+'The number of threads removing directories from the trash.'
+
+_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+_pending: set[Future] = set()
+
+
+def _trash_path() -> str:
+    return os.path.join(_settings.common_path, TRASH_NAME)
+
+
+def _purge(path: str) -> None:
+    with metrics.time('trash_purge'):
+        shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(path):
+        _logger.warning('Failed to purge directory: %s', path)
+    else:
+        _logger.debug('Purged directory: %s', path)
+
+
+def _submit(path: str) -> None:
+    global _executor  # pylint: disable=global-statement
+
+    with _lock:
+        leftovers = []
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PURGE_WORKERS,
+                                           thread_name_prefix='swa-purge')
+            trash = _trash_path()
+            leftovers = [entry.path for entry in os.scandir(trash)
+                         if entry.path != path]
+        for item in leftovers + [path]:
+            future = _executor.submit(_purge, item)
+            _pending.add(future)
+            future.add_done_callback(_pending.discard)
+
+
+def move_to_trash(path: str) -> bool:
+    """
+    swautomatic > trash > `move_to_trash()`
+    ---------------------------------------
+    Renames the directory `path` into the trash and schedules removing it.
+
+    Return
+    ------
+    `True` if the directory existed and was moved (or removed).
+    """
+
+    trash = _trash_path()
+    target = os.path.join(trash, f'{os.path.basename(path)}-{uuid.uuid4().hex}')
+    try:
+        os.makedirs(trash, exist_ok=True)
+        os.rename(path, target)
+    except FileNotFoundError:
+        return False
+    except OSError as error:
+        _logger.debug('Cannot move %s to the trash (%s), removing it',
+                      path, error)
+        shutil.rmtree(path, ignore_errors=True)
+        return not os.path.exists(path)
+    _submit(target)
+    return True
+
+
+def wait_purge(timeout: float | None = None) -> bool:
+    """
+    swautomatic > trash > `wait_purge()`
+    ------------------------------------
+    Waits until every scheduled directory is removed. Returns `True` if
+    nothing is left to purge.
+    """
+
+    with _lock:
+        pending = set(_pending)
+    _, not_done = wait(pending, timeout=timeout)
+    return not not_done
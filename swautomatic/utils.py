@@ -9,11 +9,12 @@ import shutil
 from datetime import datetime
 from typing import Any, Optional
 
-import requests as rq
-
 from swautomatic.author import SWAAuthor
 
-from .connection import _assets_coll, _logger, _settings
+from .connection import _logger, _settings, _storage
+from .metrics import metrics
+from .progress import progress
+from .steamcache import steam_cache
 from .settings import DFLT_DATE
 
 __all__ = [
@@ -22,6 +23,7 @@ __all__ = [
     'delete_files_in_dir',
     'find_preview',
     'get_directory_size',
+    'get_disk_usage',
     'get_info',
     'get_local_time',
     'get_size_format',
@@ -55,10 +57,10 @@ def get_size_format(size, factor=1024, suffix='B'):
     return f'{size:.3f} Y{suffix}'
 
 
-def get_directory_size(directory) -> int:
+def __get_directory_size(directory) -> int:
     """
-    swautomatic > utils > `get_directory_size()`
-    --------------------------------------------
+    swautomatic > utils > `__get_directory_size()`
+    ----------------------------------------------
     Returns the `directory` size in bytes.
     """
 
@@ -72,7 +74,7 @@ def get_directory_size(directory) -> int:
             elif entry.is_dir():
                 # if it's a directory, recursively call this function
                 try:
-                    total += get_directory_size(entry.path)
+                    total += __get_directory_size(entry.path)
                 except FileNotFoundError:
                     total += 0
     except NotADirectoryError:
@@ -84,6 +86,57 @@ def get_directory_size(directory) -> int:
     return total
 
 
+def get_directory_size(directory) -> int:
+    """
+    swautomatic > utils > `get_directory_size()`
+    --------------------------------------------
+    Returns the `directory` size in bytes.
+    """
+
+    with metrics.time('fs_directory_size'):
+        return __get_directory_size(directory)
+
+
+def __get_disk_usage(directory: str,
+                     seen: set[tuple[int, int]]) -> tuple[int, int]:
+    size, physical = 0, 0
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return size, physical
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                sub_size, sub_physical = __get_disk_usage(entry.path, seen)
+                size += sub_size
+                physical += sub_physical
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                size += stat.st_size
+                if (stat.st_dev, stat.st_ino) not in seen:
+                    seen.add((stat.st_dev, stat.st_ino))
+                    physical += stat.st_size
+        except OSError:
+            pass
+    return size, physical
+
+
+def get_disk_usage(directory: str,
+                   seen: Optional[set[tuple[int, int]]] = None
+                   ) -> tuple[int, int]:
+    """
+    swautomatic > utils > `get_disk_usage()`
+    ----------------------------------------
+    Returns the size of the `directory` in bytes and its physical size, in
+    one walk. In the physical size files hardlinked several times (see
+    ~dedupe) are counted once. Pass the same `seen` set to count files
+    shared by several directories once.
+    """
+
+    with metrics.time('fs_disk_usage'):
+        return __get_disk_usage(directory, set() if seen is None else seen)
+
+
 def __get_local_time(path: str) -> float:
     """
     swautomatic > utils > `__get_local_time()`
@@ -112,23 +165,33 @@ def get_local_time(path: str) -> datetime:
     Returns the latest time of modification in directory.
     """
 
-    time_local = __get_local_time(path)
+    with metrics.time('fs_local_time'):
+        time_local = __get_local_time(path)
     return datetime.fromtimestamp(time_local)
 
 
+# {directory: (mtime_ns, {steam_id: file})}, see `find_preview()`.
+_previews: dict[str, tuple[int, dict[str, str]]] = {}
+
+
 def find_preview(directory: str, steam_id: str | int) -> str | None:
     """
     swautomatic > utils > `find_preview()`
     --------------------------------------
     Searches a preview for the asset with ID `steam_id` in given directory.
+    Previews are named by the Steam ID (e.g. `123.png`). Files of the
+    directory are listed once and listed again only when the modification
+    time of the directory changes, i.e. when a preview is added or removed.
     """
 
-    path = None
-    steam_id = str(steam_id)
-    for file in os.listdir(directory):
-        if steam_id in file:
-            path = file
-    return path
+    mtime = os.stat(directory).st_mtime_ns
+    cached = _previews.get(directory)
+    if cached is None or cached[0] != mtime:
+        files = {}
+        for file in sorted(os.listdir(directory)):
+            files[file.split('.', 1)[0]] = file
+        cached = _previews[directory] = (mtime, files)
+    return cached[1].get(str(steam_id))
 
 
 def delete_directory(path: str):
@@ -140,23 +203,55 @@ def delete_directory(path: str):
 
     try:
         shutil.rmtree(path)
-        _logger.info('Deleted directory: %s', path)
-        print(f"Deleted directory: {path}")
+        _logger.debug('Deleted directory: %s', path)
     except OSError as error:
         _logger.warning(
             'Failed to delete directory: %s Error: %s',
             path, str(error))
 
 
-def steam_api_data(ids: list[int] | set[int]) -> dict[str, dict]:
+def _request_steam(ids: list[int]) -> list[dict]:
+    """Requests details of published files `ids` from Steam API."""
+
+    import requests as rq
+
+    post_data = {'itemcount': len(ids)}
+    post_data.update(
+        {f'publishedfileids[{i}]': ids[i] for i in range(len(ids))})
+    post_data.update({'format': 'json'})  # type: ignore
+
+    data = []
+    try:
+        if _settings.steam_api_url:
+            with progress.task('steam_api', total=len(ids)) as task, \
+                    metrics.time('steam_api'), rq.post(
+                        _settings.steam_api_url, data=post_data,
+                        timeout=_settings.longtimeout) as req:
+                progress.add_bytes(len(req.content))
+                data = req.json()['response']['publishedfiledetails']
+                task.advance(len(data))
+            metrics.inc('steam_api_items', len(data))
+    except (ValueError, KeyError) as error:
+        _logger.critical('The connection was not established. %s', error)
+    return data
+
+
+def steam_api_data(ids: list[int] | set[int],
+                   fresh: bool = False) -> dict[str, dict]:
     """
     swautomatic > utils > `steam_api_data()`
     ----------------------------------------
     Returns data about assets and mods from Steam API.
 
+    Responses are cached (see ~steamcache.`SWASteamCache`), only IDs
+    without fresh responses are requested. Stale responses are returned and
+    requested again in the background.
+
     Parameters
     ----------
     - `ids` (list): A list of asset IDs.
+    - `fresh` (bool): If `True` every ID is requested, the cache is only
+      updated.
 
     Return
     ------
@@ -164,19 +259,16 @@ def steam_api_data(ids: list[int] | set[int]) -> dict[str, dict]:
     """
 
     ids = list(ids)
-    post_data = {'itemcount': len(ids)}
-    post_data.update(
-        {f'publishedfileids[{i}]': ids[i] for i in range(len(ids))})
-    post_data.update({'format': 'json'})  # type: ignore
-
-    data = []
-    try:
-        if _settings.steam_api_url:
-            with rq.post(_settings.steam_api_url, data=post_data,
-                         timeout=_settings.longtimeout) as req:
-                data = req.json()['response']['publishedfiledetails']
-    except (ValueError, KeyError) as error:
-        _logger.critical('The connection was not established. %s', error)
+    cached, missing, stale = steam_cache.lookup([] if fresh else ids)
+    if fresh:
+        missing = ids
+    data = list(cached.values())
+    if missing:
+        fetched = _request_steam(missing)
+        steam_cache.store(fetched)
+        data.extend(fetched)
+    if stale:
+        steam_cache.revalidate(stale, _request_steam)
 
     result = {
         item['publishedfileid']: {
@@ -219,7 +311,8 @@ def check_datetime(data: Any) -> datetime:
     return data
 
 
-def info_steam(ids: list[int] | set[int]) -> dict[int, dict]:
+def info_steam(ids: list[int] | set[int],
+               fresh: bool = False) -> dict[int, dict]:
     """
     swautomatic > utils > `info_steam()`
     ------------------------------------
@@ -228,6 +321,8 @@ def info_steam(ids: list[int] | set[int]) -> dict[int, dict]:
     Parameters
     ----------
     -   `ids` (list): A list of asset IDs.
+    -   `fresh` (bool): If `True` cached responses are not used, see
+        `steam_api_data()`.
 
     Return
     ------
@@ -235,7 +330,7 @@ def info_steam(ids: list[int] | set[int]) -> dict[int, dict]:
     """
 
     data = {}
-    steam_data = steam_api_data(ids)
+    steam_data = steam_api_data(ids, fresh=fresh)
     for key, value in steam_data.items():
         steam_id = int(key)
         if value.get('publishedfileid', 0):
@@ -306,7 +401,7 @@ def get_info(steamid: int, force_steam: bool = False) -> dict[str, Any] | None:
 
     info = None
     if not force_steam:
-        info = _assets_coll.find_one({'steamid': steamid})
+        info = _storage.find_asset(steamid)
     if not info:
         info = info_steam([steamid]).get(steamid, None)
     return info
@@ -0,0 +1,379 @@
+"""
+swautomatic > `watcher`
+=======================
+Module for class `SWAWatcher`, a background service which watches the
+directories of assets and mods and keeps the fields `is_installed`,
+`time_local` and `size` of records current, so reading assets does not walk
+the disk (see the setting `watch_files`).
+
+On Linux changes are received from inotify, on other systems (or if inotify
+cannot be used) the directories are polled. A poll compares only times of
+modification of the directories of assets and scans the files of assets
+with a changed directory, a number of files, their size and the latest time
+of modification form the signature of an asset. Files changed in place do
+not change their directory, so every `FULL_SCAN_POLLS` polls the signatures
+of every asset are compared. Changed assets are written to the storage in
+batches, one bulk write every `watch_interval` seconds.
+
+Example
+-------
+```python
+watcher = SWAWatcher().start()
+...
+watcher.stop()
+```
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from .connection import _logger, _settings, _storage
+from .metrics import metrics
+
+__all__ = [
+    'SWAWatcher',
+]
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+              IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+              IN_MOVE_SELF)
+_EVENT = struct.Struct('iIII')
+FULL_SCAN_POLLS = 10
+'Every n-th poll of the polling backend scans the files of every asset.'
+
+
+def _scan(path: str, directories: Optional[dict[str, int]] = None
+          ) -> tuple[int, int, float]:
+    """Returns a number of files, their size and the latest time of
+    modification in the directory `path` (recursively). Times of
+    modification of the directories are stored in `directories`."""
+
+    count, size, mtime = 0, 0, 1.0
+    try:
+        if directories is not None:
+            directories[path] = os.stat(path).st_mtime_ns
+        entries = list(os.scandir(path))
+    except OSError:
+        return count, size, mtime
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                sub_count, sub_size, sub_mtime = _scan(entry.path,
+                                                       directories)
+                count += sub_count
+                size += sub_size
+                mtime = max(mtime, sub_mtime)
+            elif entry.is_file():
+                stat = entry.stat()
+                count += 1
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+        except OSError:
+            pass
+    return count, size, mtime
+
+
+def _list_ids(root: str) -> set[int]:
+    try:
+        return {int(entry.name) for entry in os.scandir(root)
+                if entry.name.isdigit() and entry.is_dir()}
+    except OSError:
+        return set()
+
+
+class _PollingBackend:
+    """Finds changed assets by comparing times of modification of their
+    directories and signatures of changed assets."""
+
+    name = 'polling'
+
+    def __init__(self, roots: list[str]) -> None:
+        self.roots = roots
+        self.polls = 0
+        self.signatures: dict[int, tuple] = {}
+        self.directories: dict[int, dict[str, int]] = {}
+        for steamid, root in self._list().items():
+            self._scan(steamid, root)
+
+    def _list(self) -> dict[int, str]:
+        return {steamid: root for root in reversed(self.roots)
+                for steamid in _list_ids(root)}
+
+    def _scan(self, steamid: int, root: str) -> tuple:
+        directories: dict[str, int] = {}
+        signature = (root,) + _scan(os.path.join(root, str(steamid)),
+                                    directories)
+        self.signatures[steamid] = signature
+        self.directories[steamid] = directories
+        return signature
+
+    def _unchanged(self, steamid: int) -> bool:
+        try:
+            return all(os.stat(path).st_mtime_ns == mtime for path, mtime
+                       in self.directories[steamid].items())
+        except OSError:
+            return False
+
+    def wait(self, timeout: float) -> Optional[set[int]]:
+        time.sleep(timeout)
+        self.polls += 1
+        full = self.polls % FULL_SCAN_POLLS == 0
+        local = self._list()
+        changed = set()
+        for steamid in self.signatures.keys() - local.keys():
+            del self.signatures[steamid], self.directories[steamid]
+            changed.add(steamid)
+        for steamid, root in local.items():
+            signature = self.signatures.get(steamid)
+            if not full and signature and signature[0] == root and \
+                    self._unchanged(steamid):
+                continue
+            if self._scan(steamid, root) != signature:
+                changed.add(steamid)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    """Receives changes of assets from inotify (Linux)."""
+
+    name = 'inotify'
+
+    def __init__(self, roots: list[str]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.watches: dict[int, str] = {}
+        self.rescan = False
+        for root in self.roots:
+            self._watch_tree(root)
+
+    def _watch(self, path: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if path in self.roots:
+                raise OSError(error, f'inotify_add_watch failed for {path}')
+            _logger.warning('Cannot watch %s: %s', path, os.strerror(error))
+            return
+        self.watches[wd] = path
+
+    def _watch_tree(self, path: str) -> None:
+        self._watch(path)
+        for directory, subdirectories, _ in os.walk(path):
+            for subdirectory in subdirectories:
+                self._watch(os.path.join(directory, subdirectory))
+
+    def _steamid(self, path: str) -> Optional[int]:
+        for root in self.roots:
+            if path.startswith(root + os.sep):
+                name = path[len(root) + 1:].split(os.sep, 1)[0]
+                return int(name) if name.isdigit() else None
+        return None
+
+    def wait(self, timeout: float) -> Optional[set[int]]:
+        changed: set[int] = set()
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            ready, _, _ = select.select([self.fd], [], [], left)
+            if not ready:
+                break
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    self.rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                parent = self.watches.get(wd)
+                if parent is None:
+                    continue
+                path = os.path.join(parent, name) if name else parent
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                steamid = self._steamid(path)
+                if steamid is not None:
+                    changed.add(steamid)
+        if self.rescan:
+            self.rescan = False
+            return None
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SWAWatcher:
+    """
+    swautomatic > watcher > `SWAWatcher`
+    ------------------------------------
+    Watches the directories of assets and mods in a background thread and
+    writes `is_installed`, `time_local` and `size` of changed assets to the
+    storage.
+
+    Parameters
+    ----------
+    -   `interval` (float): seconds between bulk writes and between scans of
+        the polling backend (the setting `watch_interval` by default).
+    -   `polling` (bool): use the polling backend even if inotify is
+        available.
+
+    Methods
+    -------
+    -   `start()`: starts the thread, it synchronizes every asset once.
+    -   `stop()`: stops the thread.
+    -   `sync()`: writes the state of given (or all) assets to the storage.
+    """
+
+    def __init__(self, interval: Optional[float] = None,
+                 polling: bool = False) -> None:
+        self.interval = float(interval or _settings.watch_interval)
+        self.polling = polling
+        self.roots = [_settings.assets_path, _settings.mods_path]
+        self.backend = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def _create_backend(self):
+        if not self.polling and sys.platform.startswith('linux'):
+            try:
+                return _InotifyBackend(self.roots)
+            except (OSError, AttributeError) as error:
+                _logger.warning('inotify cannot be used, directories are '
+                                'polled: %s', error)
+        return _PollingBackend(self.roots)
+
+    def sync(self, steamids: Optional[set[int]] = None) -> int:
+        """
+        swautomatic > watcher > SWAWatcher.`sync()`
+        -------------------------------------------
+        Scans the directories of `steamids` (every local and installed
+        asset if `None`) and writes their state to the storage in one bulk
+        write.
+
+        Return
+        ------
+        A number of changed records.
+        """
+
+        if steamids is None:
+            steamids = set().union(*(_list_ids(root) for root in self.roots))
+            steamids |= {record['steamid'] for record in _storage.find_assets(
+                {'is_installed': True}, fields=['steamid'])}
+        updates = {}
+        with metrics.time('watch_sync'):
+            # A delta install may write no file, the time of the install
+            # stored by SWAAsset.`download()` is kept if it is later.
+            installed = {record['steamid']: record.get('time_local')
+                         for record in _storage.find_assets(
+                             {'steamid': {'$in': list(steamids)}},
+                             fields=['steamid', 'time_local'])}
+            for steamid in steamids:
+                for root in self.roots:
+                    path = os.path.join(root, str(steamid))
+                    if os.path.isdir(path):
+                        _, size, mtime = _scan(path)
+                        time_local = datetime.fromtimestamp(mtime)
+                        stored = installed.get(steamid)
+                        if isinstance(stored, datetime):
+                            time_local = max(time_local, stored)
+                        updates[steamid] = {
+                            'is_installed': True,
+                            'time_local': time_local,
+                            'size': size,
+                        }
+                        break
+                else:
+                    updates[steamid] = {'is_installed': False,
+                                        'need_update': False,
+                                        'time_local': None,
+                                        'size': 0}
+            count = _storage.bulk_update_assets(updates) if updates else 0
+        metrics.inc('watch_updates', count)
+        _logger.debug('Watcher updated %s of %s assets', count, len(updates))
+        return count
+
+    def _run(self) -> None:
+        dirty: set[int] = set()
+        rescan = False
+        try:
+            self.sync()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            _logger.error('Watcher failed: %s', error)
+            rescan = True
+        last_write = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                changed = self.backend.wait(self.interval)
+                if changed is None:
+                    rescan = True
+                else:
+                    dirty |= changed
+                if (rescan or dirty) and \
+                        time.monotonic() - last_write >= self.interval:
+                    self.sync(None if rescan else dirty)
+                    dirty, rescan = set(), False
+                    last_write = time.monotonic()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                _logger.error('Watcher failed: %s', error)
+                self.stopped.wait(self.interval)
+
+    def start(self) -> 'SWAWatcher':
+        """Starts watching. Every asset is synchronized by the thread
+        first, so the caller does not wait for the scan."""
+
+        if self.thread is not None:
+            return self
+        self.backend = self._create_backend()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, name='swa-watcher',
+                                       daemon=True)
+        self.thread.start()
+        _logger.info('Watching %s with %s', ', '.join(self.roots),
+                     self.backend.name)
+        return self
+
+    def stop(self) -> None:
+        """Stops watching."""
+
+        if self.thread is None:
+            return
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+        self.backend.close()
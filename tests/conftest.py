@@ -0,0 +1,79 @@
+"""
+tests > `conftest`
+==================
+Fixtures shared by the tests. `library` points the settings, the storage and
+the logger of the package at a temporary directory, so tests never read
+`settings.json` of the working directory or touch a real library.
+
+Test modules must not import the lazy objects of ~swautomatic.connection
+(e.g. `_storage`): collecting the module reads their attributes, which
+creates them from `settings.json`. Use the fixtures instead.
+"""
+
+import json
+import logging
+
+import pytest
+
+from swautomatic import connection
+from swautomatic.settings import SWASettings
+from swautomatic.storage import SQLiteStorage
+
+SETTINGS = {
+    'app_path': '',
+    'appid': 255710,
+    'asset_url': 'https://steamcommunity.com/sharedfiles/filedetails/',
+    'authmechanism': 'DEFAULT',
+    'authsource': 'admin',
+    'database_name': 'test',
+    'longtimeout': 1.0,
+    'per_page': 10,
+    'previews_path': 'previews',
+    'steam_api_url': 'http://localhost/',
+    'timeout': 1.0,
+    'user_favs_url': 'http://localhost/',
+    'user_url_id': 'http://localhost/',
+    'user_url_profiles': 'http://localhost/',
+    'storage': 'sqlite',
+    'extract_workers': 4,
+}
+
+
+def _swap(proxy, obj):
+    """Puts `obj` into the lazy proxy of ~swautomatic.connection and returns
+    the previous object."""
+
+    previous = object.__getattribute__(proxy, '_obj')
+    object.__setattr__(proxy, '_obj', obj)
+    return previous
+
+
+@pytest.fixture
+def library(tmp_path):
+    """Returns settings of an empty library in `tmp_path` with a SQLite
+    storage."""
+
+    path = tmp_path / 'settings.json'
+    path.write_text(json.dumps(dict(
+        SETTINGS, common_path=str(tmp_path),
+        sqlite_path=str(tmp_path / 'swautomatic.sqlite3'),
+        log_file=str(tmp_path / 'swautomatic.log'))), encoding='utf-8')
+    settings = SWASettings(str(path))
+    storage = SQLiteStorage(settings.sqlite_path)
+    (tmp_path / 'Maps').mkdir()
+    (tmp_path / 'Mods').mkdir()
+    swapped = [(proxy, _swap(proxy, obj)) for proxy, obj in (
+        (connection._settings, settings),
+        (connection._storage, storage),
+        (connection._logger, logging.getLogger('swautomatic.tests')),
+    )]
+    yield settings
+    for proxy, previous in swapped:
+        _swap(proxy, previous)
+    storage.close()
+
+
+@pytest.fixture
+def storage(library):
+    """Returns the storage of `library`."""
+    return connection._storage
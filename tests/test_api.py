@@ -0,0 +1,63 @@
+"""
+tests > `test_api`
+==================
+Tests of the NDJSON export of the JSON API.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('flask')
+
+RECORDS = [{
+    'steamid': steamid,
+    'name': f'asset {steamid}',
+    'tags': ['Mod'] if steamid % 3 == 0 else ['Map'],
+    'time_updated': datetime(2021, 1, steamid),
+    'is_installed': steamid % 2 == 0,
+    'need_update': False,
+} for steamid in range(1, 11)]
+
+
+@pytest.fixture
+def client(storage, monkeypatch):
+    # The app reads the settings on import, it is imported for the library.
+    from app import api, app  # pylint: disable=import-outside-toplevel
+
+    storage.insert_assets([dict(record) for record in RECORDS])
+    # Several batches are read from the storage.
+    monkeypatch.setattr(api, 'EXPORT_BATCH', 3)
+    return app.test_client()
+
+
+def _lines(response) -> list[dict]:
+    return [json.loads(line) for line in response.get_data(as_text=True)
+            .splitlines()]
+
+
+def test_export(client):
+    response = client.get('/api/assets/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert 'library.ndjson' in response.headers['Content-Disposition']
+    lines = _lines(response)
+    assert [line['steamid'] for line in lines] == \
+        [record['steamid'] for record in RECORDS]
+    assert lines[0]['name'] == 'asset 1'
+    assert lines[0]['time_updated'] == '2021-01-01T00:00:00'
+    assert '_id' not in lines[0]
+
+
+def test_export_filter(client):
+    lines = _lines(client.get('/api/assets/export?all=Mod&installed=1'
+                              '&fields=name,tags'))
+    assert lines == [{'steamid': 6, 'name': 'asset 6', 'tags': ['Mod']}]
+    assert _lines(client.get('/api/assets/export?all=Unknown')) == []
+
+
+def test_export_invalid_field(client):
+    response = client.get('/api/assets/export?fields=name,bad-field')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid field: bad-field'}
@@ -0,0 +1,72 @@
+"""
+tests > `test_cache`
+====================
+Tests of the size-capped LRU cache of archives.
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from swautomatic.cache import SWAArchiveCache
+
+VERSION = datetime(2024, 5, 1, 12, 30)
+
+
+@pytest.fixture
+def cache(library):
+    library.archive_cache_size = 2500
+    return SWAArchiveCache()
+
+
+def _name(steamid: int) -> str:
+    return f'{steamid}-{VERSION:%Y%m%d%H%M%S}.zip'
+
+
+def _archive(tmp_path, name: str, size: int = 1000) -> str:
+    path = tmp_path / f'{name}.zip'
+    path.write_bytes(name.encode() * (size // len(name)))
+    return str(path)
+
+
+def test_disabled(tmp_path, library):
+    library.archive_cache_size = 0
+    cache = SWAArchiveCache()
+    assert not cache.put(1, VERSION, _archive(tmp_path, 'a'))
+    assert not cache.get(1, VERSION, str(tmp_path / 'copy.zip'))
+    assert not os.path.exists(cache.path)
+
+
+def test_put_get(tmp_path, cache):
+    assert cache.put(1, VERSION, _archive(tmp_path, 'a'))
+    target = tmp_path / 'copy.zip'
+    assert cache.get(1, VERSION, str(target))
+    assert target.read_bytes() == (tmp_path / 'a.zip').read_bytes()
+    # Another version of the asset is not cached.
+    assert not cache.get(1, datetime(2024, 6, 1), str(tmp_path / 'x.zip'))
+    assert not cache.get(2, VERSION, str(tmp_path / 'y.zip'))
+
+
+def test_evict(tmp_path, cache):
+    for steamid in (1, 2):
+        assert cache.put(steamid, VERSION, _archive(tmp_path, str(steamid)))
+        os.utime(os.path.join(cache.path, _name(steamid)),
+                 (steamid * 1000, steamid * 1000))
+    # Reading the first archive makes it the most recently used.
+    assert cache.get(1, VERSION, str(tmp_path / 'copy.zip'))
+    assert cache.put(3, VERSION, _archive(tmp_path, '3'))
+    assert sorted(os.listdir(cache.path)) == [_name(1), _name(3)]
+    assert not cache.get(2, VERSION, str(tmp_path / 'copy.zip'))
+
+
+def test_too_large(tmp_path, cache):
+    assert not cache.put(1, VERSION, _archive(tmp_path, 'a', size=3000))
+    assert cache.evict() == 0
+    assert not cache.get(1, VERSION, str(tmp_path / 'copy.zip'))
+
+
+def test_clear(tmp_path, cache):
+    assert cache.put(1, VERSION, _archive(tmp_path, 'a'))
+    cache.clear()
+    assert not cache.get(1, VERSION, str(tmp_path / 'copy.zip'))
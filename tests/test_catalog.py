@@ -0,0 +1,146 @@
+"""
+tests > `test_catalog`
+======================
+Tests of the in-memory catalog of assets: sorting and pages, following
+writes of the storage and of other processes, filters of the bitset index
+of tags and facets.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from swautomatic.catalog import SWACatalog
+from swautomatic.storage import SQLiteStorage
+
+TAG_SETS = [['Mod'], ['Map'], ['Mod', 'Map'], ['Building'], []]
+
+RECORDS = [{
+    'steamid': steamid,
+    'name': f'asset {steamid}',
+    'tags': TAG_SETS[steamid % len(TAG_SETS)],
+    'file_size': (steamid * 37) % 11,
+    'size': steamid * 100,
+    'time_created': datetime(2020, 1, 1 + steamid % 28),
+    'time_updated': datetime(2021, 1 + steamid % 12, 1),
+    'is_installed': steamid % 2 == 0,
+    'need_update': steamid % 6 == 0,
+} for steamid in range(1, 61)]
+
+
+@pytest.fixture
+def catalog(storage):
+    storage.insert_assets([dict(record) for record in RECORDS])
+    catalog = SWACatalog()
+    yield catalog
+    catalog.clear()
+
+
+def _ids(records) -> list[int]:
+    return [record['steamid'] for record in records]
+
+
+def test_query(catalog):
+    assert catalog.query() == (len(RECORDS), _ids(RECORDS))
+    assert catalog.query(skip=10, limit=5) == (len(RECORDS),
+                                                _ids(RECORDS[10:15]))
+    assert catalog.query(skip=100, limit=5) == (len(RECORDS), [])
+    installed = [record for record in RECORDS if record['is_installed']]
+    assert catalog.query(is_installed=True) == (len(installed),
+                                                _ids(installed))
+    assert catalog.query(steam_ids=[5, 3, 1000]) == (2, [3, 5])
+    assert catalog.count(need_update=True) == \
+        sum(record['need_update'] for record in RECORDS)
+
+
+@pytest.mark.parametrize('field', ['file_size', 'time_updated', 'steamid'])
+@pytest.mark.parametrize('reverse', [False, True])
+def test_sort(catalog, field, reverse):
+    # Equal values are ordered by Steam ID in the same direction.
+    expected = sorted(RECORDS, key=lambda record: record['steamid'],
+                      reverse=reverse)
+    expected.sort(key=lambda record: record[field], reverse=reverse)
+    assert catalog.query(sort=field, reverse=reverse, skip=7, limit=20) == \
+        (len(RECORDS), _ids(expected[7:27]))
+
+
+def test_unsupported_sort(catalog):
+    with pytest.raises(ValueError):
+        catalog.query(sort='name')
+
+
+def test_writes(catalog, storage):
+    catalog.query()
+    storage.update_asset(1, {'is_installed': True, 'size': 10 ** 9})
+    storage.delete_assets(range(2, 30))
+    storage.insert_assets([dict(RECORDS[0], steamid=1000)])
+    assert catalog.query(is_installed=True, sort='size', reverse=True)[1][:1] \
+        == [1]
+    assert catalog.query()[0] == len(RECORDS) - 28 + 1
+    assert 1000 in catalog.query()[1]
+    assert 2 not in catalog.query()[1]
+
+
+def test_other_process(catalog, library):
+    catalog.revision.interval = 0
+    catalog.query()
+    other = SQLiteStorage(library.sqlite_path)
+    try:
+        other.delete_assets([1, 2, 3])
+    finally:
+        other.close()
+    assert catalog.query()[0] == len(RECORDS) - 3
+    assert catalog.query(steam_ids=[1, 2, 3, 4]) == (1, [4])
+
+
+FILTERS = [
+    {'tag': 'Mod'},
+    {'tags': ['Mod', 'Map']},
+    {'any_tags': ['Map', 'Building']},
+    {'exclude_tags': ['Mod']},
+    {'any_tags': ['Mod'], 'exclude_tags': ['Map'], 'is_installed': True},
+    {'tag': 'Map', 'need_update': False},
+    {'tags': ['Unknown']},
+    {'exclude_tags': ['Unknown']},
+    {'any_tags': []},
+]
+
+
+def _matches(record: dict, tag=None, tags=(), any_tags=None,
+             exclude_tags=(), is_installed=None, need_update=None) -> bool:
+    """The reference: the filter of SWACatalog.`query()` in Python."""
+
+    record_tags = set(record['tags'])
+    return set(([tag] if tag else []) + list(tags)) <= record_tags and \
+        (any_tags is None or bool(record_tags & set(any_tags))) and \
+        not record_tags & set(exclude_tags) and \
+        is_installed in (None, record['is_installed']) and \
+        need_update in (None, record['need_update'])
+
+
+@pytest.mark.parametrize('fltr', FILTERS)
+def test_tag_filters(catalog, fltr):
+    expected = _ids(record for record in RECORDS if _matches(record, **fltr))
+    assert catalog.query(**fltr) == (len(expected), expected)
+    assert catalog.count(**fltr) == len(expected)
+
+
+@pytest.mark.parametrize('fltr', FILTERS)
+def test_facets(catalog, fltr):
+    counts: dict[str, int] = {}
+    for record in RECORDS:
+        if _matches(record, **fltr):
+            for tag in record['tags']:
+                counts[tag] = counts.get(tag, 0) + 1
+    assert catalog.facets(**fltr) == counts
+
+
+def test_changed_tags(catalog, storage):
+    assert catalog.count(tag='New') == 0
+    storage.update_asset(1, {'tags': ['New', 'Map']})
+    storage.update_asset(3, {'tags': []})
+    assert catalog.query(tag='New') == (1, [1])
+    assert 1 in catalog.query(tag='Map')[1]
+    assert 1 not in catalog.query(tag='Mod')[1]
+    assert 3 in catalog.query(exclude_tags=['Mod', 'Map', 'Building'])[1]
+    assert catalog.facets(steam_ids=[1, 3]) == {'New': 1, 'Map': 1}
@@ -0,0 +1,105 @@
+"""
+tests > `test_dedupe`
+=====================
+Tests of replacing identical installed files with hardlinks.
+"""
+
+import os
+import zlib
+
+import pytest
+
+from swautomatic import dedupe
+from swautomatic.dedupe import MIN_SIZE, dedupe_install, dedupe_library
+
+SHARED = b'shared' * MIN_SIZE
+OTHER = b'xxxxxx' * MIN_SIZE
+SMALL = b'small'
+
+
+def _entry(data: bytes) -> dict:
+    return {'size': len(data), 'crc': zlib.crc32(data), 'mtime': 1.0}
+
+
+def _install(library, storage, steamid: int, files: dict[str, bytes],
+             entries: dict[str, bytes] | None = None) -> None:
+    """Writes the files of the asset and its record, `entries` are the data
+    the manifest was made of (the files by default)."""
+
+    manifest = {}
+    for name, data in files.items():
+        path = os.path.join(library.assets_path, str(steamid), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+        manifest[f'{steamid}/{name}'] = _entry((entries or files)[name])
+    storage.insert_assets([{'steamid': steamid, 'name': str(steamid),
+                            'tags': [], 'is_installed': True,
+                            'manifest': manifest}])
+
+
+def _path(library, steamid: int, name: str) -> str:
+    return os.path.join(library.assets_path, str(steamid), name)
+
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch):
+    monkeypatch.setattr(dedupe, '_index', None)
+
+
+def test_dedupe_library(library, storage):
+    _install(library, storage, 1, {'data.bin': SHARED, 'small.txt': SMALL})
+    _install(library, storage, 2, {'copy.bin': SHARED, 'small.txt': SMALL})
+    # The manifest matches, but the file was changed since.
+    _install(library, storage, 3, {'data.bin': OTHER[:-1] + b'y'},
+             entries={'data.bin': SHARED})
+    result = dedupe_library(workers=2)
+    assert (result.files, result.size, result.hashed) == (1, len(SHARED), 3)
+    assert os.path.samefile(_path(library, 1, 'data.bin'),
+                            _path(library, 2, 'copy.bin'))
+    assert not os.path.samefile(_path(library, 1, 'data.bin'),
+                                _path(library, 3, 'data.bin'))
+    assert not os.path.samefile(_path(library, 1, 'small.txt'),
+                                _path(library, 2, 'small.txt'))
+    with open(_path(library, 3, 'data.bin'), 'rb') as file:
+        assert file.read() == OTHER[:-1] + b'y'
+    entry = storage.find_asset(2)['manifest']['2/copy.bin']
+    assert entry['sha256'] == dedupe._sha256(_path(library, 1, 'data.bin'))
+    assert entry['mtime'] == os.stat(_path(library, 2, 'copy.bin')).st_mtime
+    # Linked files are not linked again.
+    assert dedupe_library(workers=2).files == 0
+
+
+def _staged(tmp_path, files: dict[str, bytes]) -> tuple[str, dict]:
+    manifest = {}
+    for name, data in files.items():
+        path = tmp_path / 'staging' / '4' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        manifest[f'4/{name}'] = _entry(data)
+    return str(tmp_path / 'staging'), manifest
+
+
+def test_dedupe_install(tmp_path, library, storage):
+    _install(library, storage, 1, {'data.bin': SHARED})
+    staging, manifest = _staged(tmp_path, {'data.bin': SHARED,
+                                           'other.bin': OTHER})
+    saved = dedupe_install(staging, manifest, library.assets_path, workers=2)
+    assert saved == len(SHARED)
+    assert os.path.samefile(os.path.join(staging, '4', 'data.bin'),
+                            _path(library, 1, 'data.bin'))
+    assert 'sha256' in manifest['4/data.bin']
+    assert 'sha256' not in manifest['4/other.bin']
+
+
+def test_dedupe_install_removed(tmp_path, library, storage):
+    _install(library, storage, 1, {'data.bin': SHARED})
+    dedupe._load_index()
+    os.remove(_path(library, 1, 'data.bin'))
+    staging, manifest = _staged(tmp_path, {'data.bin': SHARED})
+    assert dedupe_install(staging, manifest, library.assets_path) == 0
+    # The new copy replaces the removed file in the index.
+    key = (len(SHARED), zlib.crc32(SHARED))
+    assert dedupe._index[key] == _path(library, 4, 'data.bin')
+    assert dedupe.forget_directories(
+        [os.path.join(library.assets_path, '4')]) == 1
@@ -0,0 +1,221 @@
+"""
+tests > `test_extract`
+======================
+Tests of installing archives: parallel extraction of members, the manifest
+of installed files, delta installs of a new version and swapping staged
+installs into place.
+"""
+
+import os
+import zipfile
+import zlib
+
+import pytest
+
+from swautomatic import extract
+from swautomatic.extract import (STAGING_NAME, extract_archive,
+                                 staging_directory, swap_directory,
+                                 verify_manifest)
+from swautomatic.trash import wait_purge
+
+FILES = {
+    'data/big.bin': os.urandom(256 * 1024),
+    'data/nested/small.txt': b'small',
+    'preview.png': b'\x89PNG' * 100,
+    'empty.txt': b'',
+}
+
+
+def _archive(path, files: dict, compression=zipfile.ZIP_DEFLATED) -> str:
+    with zipfile.ZipFile(path, 'w', compression) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(name, data)
+    return str(path)
+
+
+def _read(root, member: str) -> bytes:
+    with open(os.path.join(root, *member.split('/')), 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_extract(tmp_path, library, workers):
+    archive = _archive(tmp_path / 'asset.zip', FILES)
+    destination = tmp_path / 'Maps' / '1'
+    result = extract_archive(archive, str(destination), workers=workers)
+    assert result.files == len(FILES)
+    assert result.size == sum(len(data) for data in FILES.values())
+    assert (result.unchanged, result.deleted) == (0, 0)
+    for member, data in FILES.items():
+        assert _read(destination, member) == data
+        entry = result.manifest[member]
+        assert entry['size'] == len(data)
+        assert entry['crc'] == zlib.crc32(data)
+        assert entry['mtime'] == os.stat(
+            os.path.join(destination, *member.split('/'))).st_mtime
+    assert not verify_manifest(str(destination), result.manifest, deep=True)
+
+
+def test_unsafe_members(tmp_path, library):
+    archive = _archive(tmp_path / 'asset.zip', {
+        '../outside.txt': b'x', 'safe/./file.txt': b'y', 'dir/': b''})
+    destination = tmp_path / 'Maps' / '1'
+    result = extract_archive(archive, str(destination), workers=2)
+    assert list(result.manifest) == ['safe/file.txt']
+    assert not (tmp_path / 'Maps' / 'outside.txt').exists()
+    assert (destination / 'dir').is_dir()
+
+
+def test_bad_archive(tmp_path, library):
+    path = tmp_path / 'asset.zip'
+    path.write_bytes(b'not an archive')
+    with pytest.raises(zipfile.BadZipFile):
+        extract_archive(str(path), str(tmp_path / 'Maps' / '1'), workers=2)
+
+
+def test_bad_member(tmp_path, library):
+    archive = _archive(tmp_path / 'asset.zip', FILES, zipfile.ZIP_STORED)
+    data = bytearray((tmp_path / 'asset.zip').read_bytes())
+    position = data.index(FILES['preview.png'])
+    data[position] ^= 0xFF
+    (tmp_path / 'asset.zip').write_bytes(bytes(data))
+    with pytest.raises(zipfile.BadZipFile):
+        extract_archive(archive, str(tmp_path / 'Maps' / '1'), workers=4)
+
+
+def _update(files: dict) -> dict:
+    """The next version of the asset: one file changed, one removed and
+    one added."""
+
+    files = dict(files, **{'data/nested/small.txt': b'changed',
+                           'added.txt': b'added'})
+    del files['preview.png']
+    return files
+
+
+def test_delta_install(tmp_path, library):
+    destination = tmp_path / 'Maps' / '1'
+    installed = extract_archive(_archive(tmp_path / 'v1.zip', FILES),
+                                str(destination), workers=2)
+    big = destination / 'data' / 'big.bin'
+    stat = big.stat()
+    files = _update(FILES)
+    result = extract_archive(_archive(tmp_path / 'v2.zip', files),
+                             str(destination), workers=2,
+                             manifest=installed.manifest)
+    assert (result.files, result.unchanged, result.deleted) == (2, 2, 1)
+    assert result.manifest['data/big.bin'] == \
+        installed.manifest['data/big.bin']
+    assert (big.stat().st_ino, big.stat().st_mtime_ns) == \
+        (stat.st_ino, stat.st_mtime_ns)
+    assert not (destination / 'preview.png').exists()
+    for member, data in files.items():
+        assert _read(destination, member) == data
+    assert not verify_manifest(str(destination), result.manifest, deep=True)
+
+
+def test_delta_install_damaged(tmp_path, library):
+    destination = tmp_path / 'Maps' / '1'
+    installed = extract_archive(_archive(tmp_path / 'v1.zip', FILES),
+                                str(destination), workers=2)
+    # Files with another size or without a file are written again.
+    (destination / 'data' / 'big.bin').write_bytes(b'truncated')
+    (destination / 'empty.txt').unlink()
+    result = extract_archive(str(tmp_path / 'v1.zip'), str(destination),
+                             workers=2, manifest=installed.manifest)
+    assert (result.files, result.unchanged, result.deleted) == (2, 2, 0)
+    for member, data in FILES.items():
+        assert _read(destination, member) == data
+
+
+def test_staged_delta_install(tmp_path, library):
+    installed_path = tmp_path / 'Maps' / '1'
+    installed = extract_archive(_archive(tmp_path / 'v1.zip', FILES),
+                                str(installed_path), workers=2)
+    staging = tmp_path / 'staging'
+    staging.mkdir()
+    files = _update(FILES)
+    result = extract_archive(_archive(tmp_path / 'v2.zip', files),
+                             str(staging), workers=2,
+                             manifest=installed.manifest,
+                             source=str(installed_path))
+    assert (result.files, result.unchanged, result.deleted) == (2, 2, 1)
+    # Unchanged files are linked, the installed version is not modified.
+    assert os.path.samefile(staging / 'data' / 'big.bin',
+                            installed_path / 'data' / 'big.bin')
+    assert not (staging / 'preview.png').exists()
+    for member, data in files.items():
+        assert _read(staging, member) == data
+    for member, data in FILES.items():
+        assert _read(installed_path, member) == data
+
+
+def _staged(library, steamid: int, text: str) -> str:
+    path = staging_directory(steamid)
+    with open(os.path.join(path, 'file.txt'), 'w', encoding='utf-8') as file:
+        file.write(text)
+    return path
+
+
+def _installed(library, steamid: int) -> str:
+    path = os.path.join(library.assets_path, str(steamid))
+    os.makedirs(path)
+    with open(os.path.join(path, 'file.txt'), 'w', encoding='utf-8') as file:
+        file.write('old')
+    return path
+
+
+def _text(path: str) -> str:
+    with open(os.path.join(path, 'file.txt'), encoding='utf-8') as file:
+        return file.read()
+
+
+def test_swap_new(library):
+    staged = _staged(library, 1, 'new')
+    assert os.path.dirname(staged) == os.path.join(library.common_path,
+                                                   STAGING_NAME)
+    target = os.path.join(library.assets_path, '1')
+    swap_directory(staged, target)
+    assert _text(target) == 'new'
+    assert not os.path.exists(staged)
+
+
+@pytest.mark.parametrize('exchange', [True, False])
+def test_swap(library, monkeypatch, exchange):
+    exchanged = []
+
+    def exchange_paths(first, second):
+        exchanged.append(exchange and _exchange(first, second))
+        return exchanged[-1]
+
+    _exchange = extract._exchange
+    monkeypatch.setattr(extract, '_exchange', exchange_paths)
+    target = _installed(library, 1)
+    staged = _staged(library, 1, 'new')
+    swap_directory(staged, target)
+    if exchange and not exchanged[0]:
+        pytest.skip('renameat2() is not available')
+    assert _text(target) == 'new'
+    assert not os.path.exists(staged)
+    assert wait_purge(timeout=10)
+    assert os.listdir(library.assets_path) == ['1']
+
+
+def test_swap_failed(library, monkeypatch):
+    target = _installed(library, 1)
+    staged = _staged(library, 1, 'new')
+    rename = os.rename
+
+    def failing_rename(source, destination):
+        if source == staged:
+            raise OSError('rename failed')
+        rename(source, destination)
+
+    monkeypatch.setattr(extract, '_exchange', lambda first, second: False)
+    monkeypatch.setattr(extract.os, 'rename', failing_rename)
+    with pytest.raises(OSError):
+        swap_directory(staged, target)
+    # The installed version is restored, the staged one is kept.
+    assert _text(target) == 'old'
+    assert _text(staged) == 'new'
+    assert os.listdir(library.assets_path) == ['1']
@@ -0,0 +1,83 @@
+"""
+tests > `test_search`
+=====================
+Tests of the full-text index of names: ranking, pages selected by a cursor
+and following writes of the storage.
+"""
+
+import pytest
+
+from swautomatic.search import SWASearchIndex
+from swautomatic.storage import SQLiteStorage
+
+NAMES = {
+    1: 'Train Station',
+    2: 'Big Train Depot',
+    3: 'Trainyard',
+    4: 'Old Traim Bridge',
+    5: 'Café Européen',
+    6: 'Harbour',
+    7: 'Train',
+}
+
+
+@pytest.fixture
+def index(storage):
+    storage.insert_assets([{'steamid': steamid, 'name': name, 'tags': []}
+                           for steamid, name in NAMES.items()])
+    index = SWASearchIndex()
+    yield index
+    index.clear()
+
+
+def test_ranking(index):
+    # An equal word and the start of the name rank first, then equal words,
+    # prefixes and misspelled words.
+    assert index.search('train') == (5, [1, 7, 2, 3, 4], None)
+    assert index.search('train station') == (1, [1], None)
+    assert index.search('TRAIN stat') == (1, [1], None)
+    assert index.search('cafe europeen') == (1, [5], None)
+
+
+def test_no_results(index):
+    assert index.search('') == (0, [], None)
+    assert index.search('?!') == (0, [], None)
+    assert index.search('airport') == (0, [], None)
+    assert index.search('train airport') == (0, [], None)
+
+
+def test_pages(index):
+    pages, after = [], None
+    while True:
+        count, page, after = index.search('train', limit=2, after=after)
+        assert count == 5
+        pages.append(page)
+        if after is None:
+            break
+    assert pages == [[1, 7], [2, 3], [4]]
+    assert index.search('train', limit=0) == (5, [1, 7, 2, 3, 4], None)
+
+
+def test_invalid_cursor(index):
+    # The first page is returned.
+    assert index.search('train', limit=2, after='invalid')[1] == [1, 7]
+
+
+def test_writes(index, storage):
+    assert index.search('harbour')[1] == [6]
+    storage.update_asset(6, {'name': 'Train Harbour'})
+    storage.delete_assets([7])
+    assert index.search('harbour')[1] == [6]
+    assert index.search('train')[1] == [1, 6, 2, 3, 4]
+
+
+def test_other_process(index, library):
+    index.revision.interval = 0
+    assert index.search('harbour')[1] == [6]
+    other = SQLiteStorage(library.sqlite_path)
+    try:
+        other.update_asset(6, {'name': 'Airport'})
+    finally:
+        other.close()
+    assert index.search('harbour') == (0, [], None)
+    assert index.search('airport')[1] == [6]
@@ -0,0 +1,166 @@
+"""
+tests > `test_storage`
+======================
+Parity tests of storage backends: the same records and filters give the
+same results in every backend as in MongoDB. `SQLiteStorage` runs in memory,
+`MongoStorage` runs only if `SWA_TEST_MONGO_URI` is set.
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+
+from swautomatic.storage import (ASSETS, TAGS, MongoStorage, SQLiteStorage,
+                                 SWAStorage)
+
+TAG_SETS = [['Mod'], ['Map'], ['Mod', 'Map'], ['Building'], []]
+
+RECORDS = [{
+    'steamid': steamid,
+    'name': f'asset {steamid}',
+    'tags': TAG_SETS[steamid % len(TAG_SETS)],
+    'preview_url': '',
+    'file_size': steamid * 10,
+    'time_created': datetime(2020, 1, 1 + steamid % 28),
+    'time_updated': datetime(2021, 1 + steamid % 12, 1),
+    'is_installed': steamid % 2 == 0,
+    'need_update': steamid % 6 == 0,
+    'manifest': {f'{steamid}/file': {'size': steamid, 'crc': 1,
+                                     'mtime': 1.0}},
+} for steamid in range(1, 1201)]
+
+FILTERS = [
+    {},
+    {'steamid': 7},
+    {'steamid': {'$in': [1, 3, 5, 5000]}},
+    {'steamid': {'$in': list(range(0, 1300, 3))}},
+    {'steamid': {'$gt': 100, '$lt': 110}},
+    {'steamid': {'$in': [1, 2, 3, 4], '$gt': 2}},
+    {'is_installed': True},
+    {'is_installed': True, 'need_update': False},
+    {'tags': 'Mod'},
+    {'tags': {'$all': ['Mod', 'Map']}},
+    {'tags': {'$in': ['Map', 'Building']}},
+    {'tags': {'$nin': ['Mod']}},
+    {'tags': {'$in': ['Mod'], '$nin': ['Map']}},
+    {'time_updated': {'$gt': datetime(2021, 6, 1)}},
+    {'name': 'asset 12'},
+]
+
+
+def _matches(record: dict, fltr: dict) -> bool:
+    """The reference: the subset of MongoDB filters in Python."""
+
+    for field, value in fltr.items():
+        stored = record.get(field)
+        if field == 'tags':
+            tags = set(stored or [])
+            operators = value if isinstance(value, dict) else \
+                {'$all': [value]}
+            if not set(operators.get('$all', [])) <= tags:
+                return False
+            if '$in' in operators and not tags & set(operators['$in']):
+                return False
+            if tags & set(operators.get('$nin', [])):
+                return False
+        elif isinstance(value, dict):
+            if '$in' in value and stored not in value['$in']:
+                return False
+            if '$gt' in value and not stored > value['$gt']:
+                return False
+            if '$lt' in value and not stored < value['$lt']:
+                return False
+        elif stored != value:
+            return False
+    return True
+
+
+def _expected(fltr: dict) -> list[int]:
+    return [record['steamid'] for record in RECORDS
+            if _matches(record, fltr)]
+
+
+@pytest.fixture(params=['sqlite', 'mongo'])
+def storage(request):
+    if request.param == 'sqlite':
+        backend: SWAStorage = SQLiteStorage(':memory:')
+    else:
+        uri = os.environ.get('SWA_TEST_MONGO_URI')
+        if not uri:
+            pytest.skip('SWA_TEST_MONGO_URI is not set')
+        backend = MongoStorage(uri, 'swautomatic_test')
+        backend.client.drop_database('swautomatic_test')
+    backend.insert_assets([dict(record) for record in RECORDS])
+    backend.insert_tags(['Mod', 'Map', 'Building'])
+    yield backend
+    if isinstance(backend, MongoStorage):
+        backend.client.drop_database('swautomatic_test')
+    backend.close()
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        SWAStorage()  # pylint: disable=abstract-class-instantiated
+
+
+@pytest.mark.parametrize('fltr', FILTERS, ids=repr)
+def test_filters(storage, fltr):
+    found = [record['steamid'] for record in
+             storage.find_assets(fltr, fields=['steamid'], sort='steamid')]
+    assert found == _expected(fltr)
+    assert storage.count_assets(fltr) == len(found)
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_sort_and_pages(storage, reverse):
+    found = list(storage.find_assets({'tags': 'Mod'}, skip=5, limit=10,
+                                     fields=['steamid', 'file_size'],
+                                     sort='file_size', reverse=reverse))
+    expected = sorted((record for record in RECORDS
+                       if 'Mod' in record['tags']),
+                      key=lambda record: (record['file_size'],
+                                          record['steamid']),
+                      reverse=reverse)[5:15]
+    assert [record['steamid'] for record in found] == \
+        [record['steamid'] for record in expected]
+
+
+def test_fields(storage):
+    record = next(iter(storage.find_assets({'steamid': 2},
+                                           fields=['steamid', 'manifest',
+                                                   'is_installed'])))
+    assert record == {'steamid': 2, 'is_installed': True,
+                      'manifest': RECORDS[1]['manifest']}
+    full = storage.find_asset(2)
+    assert full['time_updated'] == RECORDS[1]['time_updated']
+    assert full['tags'] == RECORDS[1]['tags']
+
+
+def test_iter_assets(storage):
+    fltr = {'steamid': {'$in': list(range(1, 1300, 2))}}
+    found = [record['steamid'] for record in
+             storage.iter_assets(fltr, fields=['name'], batch_size=64)]
+    assert found == _expected(fltr)
+
+
+def test_writes(storage):
+    events = []
+    storage.add_listener(lambda kind, steamids: events.append(
+        (kind, steamids)))
+    revision = storage.revision()
+    storage.update_asset(1, {'need_update': True, 'size': 5})
+    storage.bulk_update_assets({2: {'tags': ['Map']}, 3: {'name': 'x'}})
+    storage.upsert_asset({'steamid': 5000, 'name': 'new', 'tags': ['Mod']})
+    assert storage.delete_assets(range(1000, 1201)) == 201
+    storage.delete_tags(['Building'])
+    assert storage.find_asset(1)['need_update'] is True
+    assert storage.find_asset(1)['size'] == 5
+    assert storage.count_assets({'tags': 'Map', 'steamid': 2}) == 1
+    assert storage.count_assets({'tags': 'Mod', 'steamid': 2}) == 0
+    assert storage.find_asset(5000)['name'] == 'new'
+    assert storage.count_assets() == 1000
+    assert storage.list_tags() == {'Mod', 'Map'}
+    assert storage.revision() > revision
+    assert [kind for kind, _ in events] == [ASSETS] * 4 + [TAGS]
+    assert events[1][1] == {2, 3}
@@ -0,0 +1,48 @@
+"""
+tests > `test_trash`
+====================
+Tests of deleting directories through the trash purged in the background.
+"""
+
+import errno
+import os
+
+import pytest
+
+from swautomatic import trash
+from swautomatic.trash import TRASH_NAME, move_to_trash, wait_purge
+
+
+@pytest.fixture
+def asset(library):
+    path = os.path.join(library.assets_path, '1')
+    os.makedirs(os.path.join(path, 'data'))
+    with open(os.path.join(path, 'data', 'file.bin'), 'wb') as file:
+        file.write(b'x' * 1024)
+    return path
+
+
+def test_move_to_trash(library, asset, monkeypatch):
+    # A new pool purges directories left by a previous run.
+    monkeypatch.setattr(trash, '_executor', None)
+    leftover = os.path.join(library.common_path, TRASH_NAME, 'old')
+    os.makedirs(leftover)
+    assert move_to_trash(asset)
+    assert not os.path.exists(asset)
+    assert wait_purge(timeout=10)
+    assert os.listdir(os.path.join(library.common_path, TRASH_NAME)) == []
+
+
+def test_missing_directory(library):
+    assert not move_to_trash(os.path.join(library.assets_path, '2'))
+    assert wait_purge(timeout=10)
+
+
+def test_other_filesystem(library, asset, monkeypatch):
+    def rename(source, target):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+    monkeypatch.setattr(trash.os, 'rename', rename)
+    assert move_to_trash(asset)
+    # The directory is removed at once.
+    assert not os.path.exists(asset)